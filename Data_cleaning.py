@@ -1,39 +1,73 @@
-import pandas as pd
+import argparse
 
-# 1️⃣ Read CSV file
-file_path = "data/Amazon_Unlocked_Mobile.csv"   # change path if needed
-df = pd.read_csv(file_path)
+from chunked_io import ChunkWriter, read_chunks
+from instrumentation import from_env, stage, timed
 
-print("===== INITIAL DATA INFO =====")
-print("Total Records:", len(df))
-print("\nNull values per column:")
-print(df.isnull().sum())
+parser = argparse.ArgumentParser(description="Drop and fill null values in the Amazon reviews dump")
+parser.add_argument('--input', default="data/Amazon_Unlocked_Mobile.csv")   # change path if needed
+parser.add_argument('--chunksize', type=int, default=None,
+                    help="stream the file in chunks of this many rows (default: load it all at once)")
+parser.add_argument('--output', default="Amazon_Cleaned_Data.csv",
+                    help="CSV, or .parquet/.arrow to hand typed columns to the next stage")
+args = parser.parse_args()
+from_env('clean')  # per-stage metrics when PIPELINE_METRICS is set
 
-# 2️⃣ Drop rows where main columns are null
 main_cols = ['Product Name', 'Brand Name', 'Reviews']
 
-df_before = len(df)
-df = df.dropna(subset=main_cols)
-df_after = len(df)
+# 1️⃣ Read CSV file (one chunk at a time with --chunksize; dtypes are fixed
+# up front so every chunk treats a column as the same text/numeric type)
+# 2️⃣ Drop rows where main columns are null
+# 3️⃣ Fill null values in other columns with suitable defaults
+# Null counts are accumulated per chunk and each cleaned chunk is appended to the output.
+total_records = 0
+total_after_drop = 0
+initial_nulls = None
+final_nulls = None
+writer = ChunkWriter(args.output)
+
+for df in timed('load', read_chunks(args.input, args.chunksize)):
+    with stage('clean', items=len(df)):
+        chunk_nulls = df.isnull().sum()
+        initial_nulls = chunk_nulls if initial_nulls is None else initial_nulls + chunk_nulls
+        total_records += len(df)
 
-print("\n===== AFTER DROPPING MAIN COLUMN NULLS =====")
-print(f"Rows dropped: {df_before - df_after}")
-print("Total Records after drop:", df_after)
+        df = df.dropna(subset=main_cols)
+        total_after_drop += len(df)
 
-# 3️⃣ Fill null values in other columns with suitable defaults
-for col in df.columns:
-    if col not in main_cols:
-        if df[col].dtype == 'object':  # text columns
-            df[col] = df[col].fillna("Unknown")
-        else:  # numeric columns
-            df[col] = df[col].fillna(0)
+        fill_values = {}
+        for col in df.columns:
+            if col not in main_cols:
+                if df[col].dtype == 'object':  # text columns
+                    fill_values[col] = "Unknown"
+                else:  # numeric columns
+                    fill_values[col] = 0
+        df = df.fillna(fill_values)
+
+        chunk_nulls = df.isnull().sum()
+        final_nulls = chunk_nulls if final_nulls is None else final_nulls + chunk_nulls
+
+    # Optional: Save cleaned data
+    with stage('save', items=len(df)):
+        writer.write(df)
+    if args.chunksize:
+        print(f"  Processed {total_records:,} records")
+
+with stage('save'):
+    writer.close()
+
+print("===== INITIAL DATA INFO =====")
+print("Total Records:", total_records)
+print("\nNull values per column:")
+print(initial_nulls)
+
+print("\n===== AFTER DROPPING MAIN COLUMN NULLS =====")
+print(f"Rows dropped: {total_records - total_after_drop}")
+print("Total Records after drop:", total_after_drop)
 
 # 4️⃣ Final null check
 print("\n===== FINAL NULL CHECK =====")
-print(df.isnull().sum())
+print(final_nulls)
 
-print("\nFinal Total Records:", len(df))
+print("\nFinal Total Records:", total_after_drop)
 
-# Optional: Save cleaned data
-df.to_csv("Amazon_Cleaned_Data.csv", index=False)
-print("\n✅ Cleaned data saved as Amazon_Cleaned_Data.csv")
+print(f"\n✅ Cleaned data saved as {args.output}")
@@ -1,11 +1,14 @@
+import argparse
+import os
+import time
 import pandas as pd
 import re
+from functools import partial
 
-# Read the cleaned data
-df = pd.read_csv("Amazon_Cleaned_Data.csv")
-
-print("===== PRODUCT NAME EXTRACTION =====")
-print(f"Total Records: {len(df)}")
+from chunked_io import (DEFAULT_CHUNKSIZE, ChunkWriter, export_csv, is_columnar, ordered_map, read_batches,
+                        read_chunks, replace_column, resolve_workers, sibling_path)
+from instrumentation import collect, from_env, merge, stage, timed
+from unique_apply import load_memo, memo_key, print_dedup_report, save_memo, source_fingerprint
 
 # Function to extract clean product name
 def extract_product_name(name):
@@ -100,23 +103,130 @@ def extract_product_name(name):
     
     return name if name and len(name) > 2 else "Unknown"
 
-# Apply the extraction function
-print("\nExtracting product names...")
-df['Product Name'] = df['Product Name'].apply(extract_product_name)
 
-# Show some examples
-print("\nSample cleaned product names:")
-print(df['Product Name'].head(10))
+# Memo entries are only valid for this version of extract_product_name
+EXTRACT_FINGERPRINT = source_fingerprint(extract_product_name)
+
+
+def process_chunk(chunk, memo_path=None):
+    """
+    Extract product names for one chunk, running extract_product_name once per
+    distinct name. Also returns the chunk's distinct results, new memo entries,
+    dedup stats and stage metrics.
+    """
+    memo = load_memo(memo_path, EXTRACT_FINGERPRINT) if memo_path else {}
+    codes, unique_names = pd.factorize(chunk['Product Name'], use_na_sentinel=False)
+
+    start = time.perf_counter()
+    memo_hits = 0
+    memo_updates = {}
+    extracted = []
+    with collect() as metrics, stage('clean', items=len(unique_names)):
+        for name in unique_names:
+            key = memo_key(name)
+            if key in memo:
+                memo_hits += 1
+                extracted.append(memo[key])
+            else:
+                memo_updates[key] = extract_product_name(name)
+                extracted.append(memo_updates[key])
+
+    dedup_stats = {
+        'records': len(chunk),
+        'unique': len(unique_names),
+        'memo_hits': memo_hits,
+        'compute_seconds': time.perf_counter() - start,
+    }
+    extracted = pd.Series(extracted, dtype=object).take(codes).set_axis(chunk.index)
+    chunk = chunk.assign(**{'Product Name': extracted})
+    return chunk, chunk[['Product Name']].drop_duplicates(), memo_updates, dedup_stats, metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract clean product names")
+    parser.add_argument('--input', default='Amazon_Cleaned_Data.csv',
+                        help="CSV, Parquet or Arrow IPC file")
+    parser.add_argument('--output', default=None,
+                        help="where to save the dataset (default: rewrite the input in place)")
+    parser.add_argument('--names-output', default='Amazon_Product_name_Cleaned_Data.csv')
+    parser.add_argument('--export-csv', default=None,
+                        help="also export the rewritten dataset to this CSV path")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes (0 = one per CPU core, 1 = run in this process)")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help=f"rows per chunk (default: whole file, or {DEFAULT_CHUNKSIZE:,} with several workers)")
+    parser.add_argument('--memo', default=None,
+                        help="memo file of already extracted names, reused and updated across runs")
+    args = parser.parse_args()
+    from_env('extract')  # per-stage metrics when PIPELINE_METRICS is set
+
+    workers = resolve_workers(args.workers)
+    chunksize = args.chunksize or (DEFAULT_CHUNKSIZE if workers > 1 else None)
+
+    print("===== PRODUCT NAME EXTRACTION =====")
+
+    # Apply the extraction function chunk by chunk (on a process pool with --workers).
+    # The output may be the input itself, so results go to a temporary file first.
+    # Between columnar files only 'Product Name' is sent to the workers; the other
+    # columns stay memory-mapped Arrow data and are written back without being parsed.
+    print("\nExtracting product names...")
+    output = args.output or args.input
+    columnar = is_columnar(args.input) and is_columnar(output)
+    output_path = sibling_path(output, 'tmp')
+    writer = ChunkWriter(output_path)
+    full_batches = read_batches(args.input, chunksize) if columnar else None
+    total_records = 0
+    sample_names = None
+    product_names_only = None
+    memo = load_memo(args.memo, EXTRACT_FINGERPRINT) if args.memo else {}
+    dedup_totals = {'records': 0, 'unique': 0, 'memo_hits': 0, 'compute_seconds': 0.0}
+
+    chunks = timed('load', read_chunks(args.input, chunksize, columns=['Product Name'] if columnar else None))
+    results = ordered_map(partial(process_chunk, memo_path=args.memo), chunks, workers)
+    for chunk, chunk_names, memo_updates, dedup_stats, metrics in results:
+        merge(metrics)
+        with stage('save', items=len(chunk)):
+            if columnar:
+                writer.write_arrow(replace_column(next(full_batches), 'Product Name', chunk['Product Name']))
+            else:
+                writer.write(chunk)
+        total_records += len(chunk)
+        if sample_names is None:
+            sample_names = chunk['Product Name'].head(10)
+        product_names_only = pd.concat([product_names_only, chunk_names]).drop_duplicates()
+        memo.update(memo_updates)
+        dedup_totals = {key: total + dedup_stats[key] for key, total in dedup_totals.items()}
+        if chunksize:
+            print(f"  Processed {total_records:,} records")
+
+    with stage('save'):
+        writer.close()
+    if columnar:
+        full_batches.close()
+
+    print(f"Total Records: {total_records}")
+    print_dedup_report(**dedup_totals)
+    if args.memo:
+        save_memo(memo, args.memo, EXTRACT_FINGERPRINT)
+
+    # Show some examples
+    print("\nSample cleaned product names:")
+    print(sample_names)
 
-# Check unique product names
-unique_count = df['Product Name'].nunique()
-print(f"\nTotal distinct product names: {unique_count}")
+    # Check unique product names
+    unique_count = product_names_only['Product Name'].nunique()
+    print(f"\nTotal distinct product names: {unique_count}")
 
-# Save the updated dataframe
-df.to_csv("Amazon_Cleaned_Data.csv", index=False)
-print("\n✅ Product names cleaned and saved to Amazon_Cleaned_Data.csv")
+    # Save the updated dataframe
+    os.replace(output_path, output)
+    print(f"\n✅ Product names cleaned and saved to {output}")
+    if args.export_csv:
+        with stage('save'):
+            export_csv(output, args.export_csv)
+        print(f"✅ Exported to {args.export_csv}")
 
-# Also save a CSV with only unique product names for review
-product_names_only = df[['Product Name']].drop_duplicates().sort_values('Product Name')
-product_names_only.to_csv("Amazon_Product_name_Cleaned_Data.csv", index=False)
-print("✅ Unique product names saved to Amazon_Product_name_Cleaned_Data.csv")
+    # Also save a CSV with only unique product names for review
+    product_names_only = product_names_only.sort_values('Product Name')
+    with stage('save'):
+        product_names_only.to_csv(args.names_output, index=False)
+    print(f"✅ Unique product names saved to {args.names_output}")
@@ -1,13 +1,14 @@
+import argparse
 import pandas as pd
 import re
 import numpy as np
+from functools import partial
 
-# Load original raw data
-raw_df = pd.read_csv('data/Amazon_Unlocked_Mobile.csv')
+from chunked_io import DEFAULT_CHUNKSIZE, ChunkWriter, ordered_map, read_chunks, resolve_workers
+from instrumentation import collect, from_env, merge, stage, timed
+from product_name_engine import ENGINE_FINGERPRINT, clean_and_score
+from unique_apply import load_memo, print_dedup_report, save_memo
 
-print("=" * 100)
-print("IMPROVED PRODUCT NAME EXTRACTION WITH QUALITY VALIDATION")
-print("=" * 100)
 
 # 1. CLEAN PRODUCT NAMES - Remove obvious non-product descriptions
 def clean_product_name(name):
@@ -159,109 +160,170 @@ def validate_product_name(product_name, brand_name):
     return min(100, max(0, score))
 
 
-# 3. PROCESS ALL RECORDS
-print("\nProcessing records...")
-cleaned_names = []
-quality_scores = []
-original_names = []
-brand_names = []
+# 3. PROCESS ONE CHUNK OF RECORDS
+REPORT_COLUMNS = ['Product Name', 'Cleaned_Product_Name', 'Quality_Score', 'Brand Name']
+UNIQUE_PRODUCT_COLUMNS = ['Product Name', 'Brand Name', 'Price', 'Rating', 'Reviews']
+QUALITY_BANDS = [
+    ("Excellent (80-100):", 80, 101),
+    ("Good      (60-79): ", 60, 80),
+    ("Fair      (40-59): ", 40, 60),
+    ("Poor      (0-39):  ", 0, 40),
+]
 
-for idx, row in raw_df.iterrows():
-    if (idx + 1) % 50000 == 0:
-        print(f"  Processed {idx + 1:,} / {len(raw_df):,}")
-    
-    original_name = row['Product Name']
-    brand_name = row['Brand Name']
-    
-    # Clean the name
-    cleaned = clean_product_name(original_name)
-    
-    # Validate quality
-    if cleaned:
-        quality = validate_product_name(cleaned, brand_name)
-    else:
-        quality = 0
-    
-    cleaned_names.append(cleaned)
-    quality_scores.append(quality)
-    original_names.append(original_name)
-    brand_names.append(brand_name)
-
-# 4. ADD TO DATAFRAME
-raw_df['Cleaned_Product_Name'] = cleaned_names
-raw_df['Quality_Score'] = quality_scores
-
-# 5. FILTER BY QUALITY THRESHOLD
-quality_threshold = 60  # Only keep scores >= 60
-
-print(f"\nQuality score distribution:")
-print(f"  Excellent (80-100): {(raw_df['Quality_Score'] >= 80).sum():,}")
-print(f"  Good      (60-79):  {((raw_df['Quality_Score'] >= 60) & (raw_df['Quality_Score'] < 80)).sum():,}")
-print(f"  Fair      (40-59):  {((raw_df['Quality_Score'] >= 40) & (raw_df['Quality_Score'] < 60)).sum():,}")
-print(f"  Poor      (0-39):   {(raw_df['Quality_Score'] < 40).sum():,}")
-
-# 6. CREATE CLEANED DATASET
-filtered_df = raw_df[raw_df['Quality_Score'] >= quality_threshold].copy()
-
-# Remove Quality_Score column before saving (keep for analysis)
-quality_analysis_df = raw_df[['Product Name', 'Cleaned_Product_Name', 'Quality_Score', 'Brand Name']].copy()
-
-# Save main dataset
-output_df = filtered_df.drop(columns=['Quality_Score', 'Cleaned_Product_Name']).copy()
-output_df.to_csv('Amazon_Cleaned_Data.csv', index=False)
-
-print(f"\n" + "=" * 100)
-print("RESULTS")
-print("=" * 100)
-print(f"\nOriginal records:           {len(raw_df):,}")
-print(f"Records with quality >= 60: {len(filtered_df):,}")
-print(f"Records removed:            {len(raw_df) - len(filtered_df):,} ({(len(raw_df)-len(filtered_df))/len(raw_df)*100:.2f}%)")
-print(f"Retention rate:             {len(filtered_df)/len(raw_df)*100:.2f}%")
-
-# 7. CREATE UNIQUE PRODUCT NAMES
-unique_products = filtered_df.groupby('Product Name').size().reset_index(name='count')
-unique_products = unique_products.sort_values('count', ascending=False)
-
-print(f"\nUnique product names:       {len(unique_products):,}")
-print(f"Average records per product: {len(filtered_df) / len(unique_products):.1f}")
-
-# Save unique products
-unique_products_df = filtered_df[['Product Name', 'Brand Name', 'Price', 'Rating', 'Reviews']].drop_duplicates('Product Name')
-unique_products_df = unique_products_df.sort_values('Product Name')
-unique_products_df.to_csv('Amazon_Product_name_Cleaned_Data.csv', index=False)
-
-# 8. SAVE QUALITY ANALYSIS
-quality_analysis_df.to_csv('Product_Quality_Analysis.csv', index=False)
-
-print(f"\nFiles saved:")
-print(f"  ✓ Amazon_Cleaned_Data.csv ({len(filtered_df):,} records)")
-print(f"  ✓ Amazon_Product_name_Cleaned_Data.csv ({len(unique_products_df):,} unique products)")
-print(f"  ✓ Product_Quality_Analysis.csv (for review)")
-
-# 9. SHOW EXAMPLES OF REMOVED RECORDS
-print(f"\n" + "=" * 100)
-print("EXAMPLES OF REMOVED LOW-QUALITY RECORDS")
-print("=" * 100)
-
-removed_df = raw_df[raw_df['Quality_Score'] < quality_threshold]
-removed_examples = removed_df.nlargest(20, 'Quality_Score')[['Product Name', 'Cleaned_Product_Name', 'Quality_Score', 'Brand Name']]
-
-for idx, row in removed_examples.iterrows():
-    print(f"\nOriginal:  {row['Product Name'][:80]}")
-    print(f"Cleaned:   {row['Cleaned_Product_Name']}")
-    print(f"Score:     {row['Quality_Score']:.0f}/100 (Brand: {row['Brand Name']})")
-
-# 10. SHOW EXAMPLES OF KEPT RECORDS
-print(f"\n" + "=" * 100)
-print("EXAMPLES OF HIGH-QUALITY KEPT RECORDS")
-print("=" * 100)
-
-kept_df = raw_df[raw_df['Quality_Score'] >= quality_threshold]
-kept_examples = kept_df.nlargest(20, 'Quality_Score')[['Product Name', 'Cleaned_Product_Name', 'Quality_Score', 'Brand Name']]
-
-for idx, row in kept_examples.iterrows():
-    print(f"\nOriginal:  {row['Product Name'][:80]}")
-    print(f"Cleaned:   {row['Cleaned_Product_Name']}")
-    print(f"Score:     {row['Quality_Score']:.0f}/100 (Brand: {row['Brand Name']})")
-
-print(f"\n" + "=" * 100)
+
+def process_chunk(chunk, quality_threshold=60, memo_path=None):
+    """
+    Clean and score one chunk of raw records.
+    Returns the rows to save plus partial counts and examples for the report,
+    so the report never needs the whole dataset in memory.
+    """
+    # Clean and score each distinct (Product Name, Brand Name) pair once (see product_name_engine.py)
+    memo = load_memo(memo_path, ENGINE_FINGERPRINT) if memo_path else None
+    with collect() as metrics:  # stage metrics travel back with the result from worker processes
+        cleaned_names, quality_scores, memo_updates, dedup_stats = clean_and_score(
+            chunk['Product Name'], chunk['Brand Name'], memo)
+    chunk = chunk.assign(Cleaned_Product_Name=cleaned_names, Quality_Score=quality_scores)
+
+    kept = chunk['Quality_Score'] >= quality_threshold
+    filtered_df = chunk[kept]
+
+    return {
+        'records': len(chunk),
+        'kept': len(filtered_df),
+        'bands': [int(quality_scores.between(low, high, inclusive='left').sum()) for _, low, high in QUALITY_BANDS],
+        'output': filtered_df.drop(columns=['Quality_Score', 'Cleaned_Product_Name']),
+        'quality_analysis': chunk[REPORT_COLUMNS],
+        'unique_products': filtered_df[UNIQUE_PRODUCT_COLUMNS].drop_duplicates('Product Name'),
+        'removed_examples': chunk[~kept].nlargest(20, 'Quality_Score')[REPORT_COLUMNS],
+        'kept_examples': filtered_df.nlargest(20, 'Quality_Score')[REPORT_COLUMNS],
+        'memo_updates': memo_updates,
+        'dedup': dedup_stats,
+        'metrics': metrics,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract and quality-check product names")
+    parser.add_argument('--input', default='data/Amazon_Unlocked_Mobile.csv')
+    parser.add_argument('--output', default='Amazon_Cleaned_Data.csv',
+                        help="cleaned dataset; .parquet/.arrow hands typed columns to the next stage")
+    parser.add_argument('--quality-output', default='Product_Quality_Analysis.csv')
+    parser.add_argument('--names-output', default='Amazon_Product_name_Cleaned_Data.csv')
+    parser.add_argument('--quality-threshold', type=int, default=60, help="only keep scores >= this")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes (0 = one per CPU core, 1 = run in this process)")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help=f"rows per chunk (default: whole file, or {DEFAULT_CHUNKSIZE:,} with several workers)")
+    parser.add_argument('--memo', default=None,
+                        help="memo file of already cleaned (Product Name, Brand Name) pairs, reused and updated across runs")
+    args = parser.parse_args()
+    from_env('quality')  # per-stage metrics when PIPELINE_METRICS is set
+
+    workers = resolve_workers(args.workers)
+    chunksize = args.chunksize or (DEFAULT_CHUNKSIZE if workers > 1 else None)
+
+    print("=" * 100)
+    print("IMPROVED PRODUCT NAME EXTRACTION WITH QUALITY VALIDATION")
+    print("=" * 100)
+
+    # 4. PROCESS ALL RECORDS
+    # Chunks are cleaned in order (on a process pool with --workers) and each
+    # result is written out before the next one is read.
+    quality_threshold = args.quality_threshold  # Only keep scores >= 60 by default
+
+    print("\nProcessing records...")
+    chunks = timed('load', read_chunks(args.input, chunksize))
+    results = ordered_map(partial(process_chunk, quality_threshold=quality_threshold, memo_path=args.memo), chunks, workers)
+    memo = load_memo(args.memo, ENGINE_FINGERPRINT) if args.memo else {}
+
+    total_records = 0
+    kept_records = 0
+    band_counts = [0] * len(QUALITY_BANDS)
+    unique_products_df = None
+    removed_examples = None
+    kept_examples = None
+    output_writer = ChunkWriter(args.output)
+    quality_writer = ChunkWriter(args.quality_output)
+    dedup_totals = {'records': 0, 'unique': 0, 'memo_hits': 0, 'compute_seconds': 0.0}
+
+    for result in results:
+        merge(result['metrics'])
+        with stage('save', items=result['records']):
+            output_writer.write(result['output'])
+            quality_writer.write(result['quality_analysis'])
+
+        total_records += result['records']
+        kept_records += result['kept']
+        band_counts = [total + count for total, count in zip(band_counts, result['bands'])]
+
+        # Keep the first occurrence of each product and the overall top-20 examples
+        unique_products_df = pd.concat([unique_products_df, result['unique_products']]).drop_duplicates('Product Name')
+        removed_examples = pd.concat([removed_examples, result['removed_examples']]).nlargest(20, 'Quality_Score')
+        kept_examples = pd.concat([kept_examples, result['kept_examples']]).nlargest(20, 'Quality_Score')
+
+        memo.update(result['memo_updates'])
+        dedup_totals = {key: total + result['dedup'][key] for key, total in dedup_totals.items()}
+
+        if chunksize:
+            print(f"  Processed {total_records:,} records")
+
+    with stage('save'):
+        output_writer.close()
+        quality_writer.close()
+
+    # Distinct keys are counted per chunk, so bigger chunks share more work
+    print_dedup_report(**dedup_totals)
+    if args.memo:
+        save_memo(memo, args.memo, ENGINE_FINGERPRINT)
+        print(f"Memo saved:                 {args.memo} ({len(memo):,} pairs)")
+
+    # 5. FILTER BY QUALITY THRESHOLD
+    print(f"\nQuality score distribution:")
+    for (label, _, _), count in zip(QUALITY_BANDS, band_counts):
+        print(f"  {label} {count:,}")
+
+    # 6. CREATE CLEANED DATASET (saved chunk by chunk above)
+    print(f"\n" + "=" * 100)
+    print("RESULTS")
+    print("=" * 100)
+    print(f"\nOriginal records:           {total_records:,}")
+    print(f"Records with quality >= {quality_threshold}: {kept_records:,}")
+    print(f"Records removed:            {total_records - kept_records:,} ({(total_records - kept_records)/total_records*100:.2f}%)")
+    print(f"Retention rate:             {kept_records/total_records*100:.2f}%")
+
+    # 7. CREATE UNIQUE PRODUCT NAMES
+    print(f"\nUnique product names:       {len(unique_products_df):,}")
+    print(f"Average records per product: {kept_records / len(unique_products_df):.1f}")
+
+    # Save unique products
+    unique_products_df = unique_products_df.sort_values('Product Name')
+    with stage('save'):
+        unique_products_df.to_csv(args.names_output, index=False)
+
+    # 8. SAVE QUALITY ANALYSIS (saved chunk by chunk above)
+    print(f"\nFiles saved:")
+    print(f"  ✓ {args.output} ({kept_records:,} records)")
+    print(f"  ✓ {args.names_output} ({len(unique_products_df):,} unique products)")
+    print(f"  ✓ {args.quality_output} (for review)")
+
+    # 9. SHOW EXAMPLES OF REMOVED RECORDS
+    print(f"\n" + "=" * 100)
+    print("EXAMPLES OF REMOVED LOW-QUALITY RECORDS")
+    print("=" * 100)
+
+    for idx, row in removed_examples.iterrows():
+        print(f"\nOriginal:  {row['Product Name'][:80]}")
+        print(f"Cleaned:   {row['Cleaned_Product_Name']}")
+        print(f"Score:     {row['Quality_Score']:.0f}/100 (Brand: {row['Brand Name']})")
+
+    # 10. SHOW EXAMPLES OF KEPT RECORDS
+    print(f"\n" + "=" * 100)
+    print("EXAMPLES OF HIGH-QUALITY KEPT RECORDS")
+    print("=" * 100)
+
+    for idx, row in kept_examples.iterrows():
+        print(f"\nOriginal:  {row['Product Name'][:80]}")
+        print(f"Cleaned:   {row['Cleaned_Product_Name']}")
+        print(f"Score:     {row['Quality_Score']:.0f}/100 (Brand: {row['Brand Name']})")
+
+    print(f"\n" + "=" * 100)
@@ -0,0 +1,399 @@
+"""
+End-to-end benchmark suite: the cleaning, embedding, indexing and query stages
+on corpora of several sizes, with results saved as JSON and compared against
+a stored baseline.
+
+Scenarios (each run once per --sizes value, in a fresh worker process so its
+peak RSS is its own):
+  clean       clean_product_name and validate_product_name per row, and the
+              column engine's clean_and_score, on the Amazon product names
+  extract     extract_product_name per row
+  filter_qa   filter_lines of notebooks/filter_mobile_records.py on QA dump lines
+  embed       embed_texts with the deterministic FakeEmbedder, cold and through
+              a warm EmbeddingCache
+  index       FAISS build time and serialized size per index type
+  retrieve    RetrievalBundle.retrieve_top_k p50/p95/p99 latency and QPS at
+              each --concurrency level
+Every metric is the median of --repeats runs. Metric names say which way is
+better: *_per_sec and *_qps higher, *_ms, *_seconds and *_mb lower.
+
+compare flags the metrics that got worse than the baseline by more than
+--tolerance, and exits with status 1 if any did.
+
+    python benchmark_suite.py run --sizes 1000 10000 --output build/benchmarks/baseline.json
+    python benchmark_suite.py run --scenarios clean extract --baseline build/benchmarks/baseline.json
+    python benchmark_suite.py compare build/benchmarks/baseline.json build/benchmarks/latest.json
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from importlib import metadata
+
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+sys.path.insert(0, os.path.join(ROOT, 'notebooks'))
+
+DEFAULT_OUTPUT = os.path.join('build', 'benchmarks', 'latest.json')
+PRODUCT_NAMES = os.path.join('data', 'Amazon_Cleaned_Data_Lightweight.csv.gz')
+PACKAGES = ['numpy', 'pandas', 'pyarrow', 'faiss-cpu', 'sentence-transformers']
+
+HIGHER_IS_BETTER = ('_per_sec', '_qps')
+LOWER_IS_BETTER = ('_ms', '_seconds', '_mb')
+
+
+# 1. INPUTS
+def product_names(size, path=PRODUCT_NAMES):
+    """(Product Name, Brand Name) lists of `size` rows, cycling the file if it is shorter"""
+    import pandas as pd
+
+    df = pd.read_csv(path, usecols=['Product Name', 'Brand Name'], nrows=size)
+    df = df.iloc[np.arange(size) % len(df)]
+    return df['Product Name'].tolist(), df['Brand Name'].tolist()
+
+
+def prompt_records(size, seed=0):
+    """`size` records of the synthetic prompt/response corpus (scripts/generate_records.py)"""
+    from generate_records import FIELDNAMES, Vocabulary, generate_chunk
+
+    columns = generate_chunk(Vocabulary(), 0, size, 0, seed, 0.0, max(4, len(str(size))))
+    return [dict(zip(FIELDNAMES, row)) for row in zip(*(columns[name] for name in FIELDNAMES))]
+
+
+def qa_lines(size, seed=0):
+    """Lines shaped like the Amazon QA dump: half JSON, half Python dict literals, a third about phones"""
+    rng = np.random.default_rng(seed)
+    subjects = ["my iPhone", "this Samsung Galaxy", "the Pixel", "this case", "the charger", "the cable",
+                "the screen protector", "this mobile plan", "the headset", "the car mount"]
+    lines = []
+    for i, (subject, style) in enumerate(zip(rng.integers(len(subjects), size=size), rng.integers(2, size=size))):
+        record = {'questionType': 'yes/no', 'asin': f"B{i:09d}", 'answerTime': 'Jan 1, 2014',
+                  'unixTime': 1388563200 + i, 'question': f"Does it work with {subjects[subject]}?",
+                  'answerType': 'Y', 'answer': "Yes, it works fine after the latest update."}
+        lines.append((json.dumps(record) if style else repr(record)) + "\n")
+    return lines
+
+
+def clustered_vectors(count, dim, clusters=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(clusters, size=count)] + 0.3 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def rate(count, seconds):
+    return count / max(seconds, 1e-9)
+
+
+def has_faiss():
+    try:
+        import faiss  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# 2. SCENARIOS
+# Each takes the corpus size and the CLI options and returns (metrics, info);
+# metrics are compared against the baseline, info is only recorded.
+def bench_clean(size, options):
+    from Improved_Extract_Product_Names import clean_product_name, validate_product_name
+    from product_name_engine import clean_and_score
+
+    names, brands = product_names(size)
+    start = time.perf_counter()
+    cleaned = [clean_product_name(name) for name in names]
+    clean_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = [validate_product_name(name, brand) if name else 0 for name, brand in zip(cleaned, brands)]
+    validate_seconds = time.perf_counter() - start
+
+    import pandas as pd
+
+    start = time.perf_counter()
+    clean_and_score(pd.Series(names), pd.Series(brands))
+    engine_seconds = time.perf_counter() - start
+    metrics = {
+        'clean_rows_per_sec': rate(size, clean_seconds),
+        'validate_rows_per_sec': rate(size, validate_seconds),
+        'clean_validate_rows_per_sec': rate(size, clean_seconds + validate_seconds),
+        'engine_rows_per_sec': rate(size, engine_seconds),
+    }
+    return metrics, {'mean_quality_score': float(np.mean(scores))}
+
+
+def bench_extract(size, options):
+    from Extract_Product_Names import extract_product_name
+
+    names, _ = product_names(size)
+    start = time.perf_counter()
+    extracted = [extract_product_name(name) for name in names]
+    seconds = time.perf_counter() - start
+    return {'extract_rows_per_sec': rate(size, seconds)}, {'unknown': extracted.count("Unknown")}
+
+
+def bench_filter_qa(size, options):
+    from filter_mobile_records import filter_lines
+
+    lines = qa_lines(size)
+    megabytes = sum(len(line) for line in lines) / 1e6
+    start = time.perf_counter()
+    matches, _, malformed = filter_lines(lines)
+    seconds = time.perf_counter() - start
+    metrics = {'scan_lines_per_sec': rate(size, seconds), 'scan_mb_per_sec': rate(megabytes, seconds)}
+    return metrics, {'kept': len(matches), 'malformed': malformed}
+
+
+def bench_embed(size, options):
+    from embedding_cache import EmbeddingCache
+    from embedding_client import FakeEmbedder, embed_texts
+
+    texts = [f"{record['prompt']} {record['response']} #{i}" for i, record in enumerate(prompt_records(size))]
+    backend = FakeEmbedder(dim=options.dim, latency=0.0)
+    start = time.perf_counter()
+    embed_texts(texts, backend, batch_size=100, concurrency=8)
+    cold_seconds = time.perf_counter() - start
+
+    cache_dir = tempfile.mkdtemp(prefix='bench_embed_')
+    try:
+        cache = EmbeddingCache(cache_dir, backend.model)
+        embed_texts(texts, backend, batch_size=100, concurrency=8, cache=cache)
+        start = time.perf_counter()
+        embed_texts(texts, backend, batch_size=100, concurrency=8, cache=cache)
+        warm_seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    metrics = {'fake_encoder_texts_per_sec': rate(size, cold_seconds),
+               'warm_cache_texts_per_sec': rate(size, warm_seconds)}
+    return metrics, {'dim': options.dim}
+
+
+def bench_index(size, options):
+    if not has_faiss():
+        return {}, {'skipped': "faiss is not installed"}
+    import faiss
+    from build_faiss_index import build_index
+
+    vectors = clustered_vectors(size, options.dim)
+    metrics = {}
+    for index_type in options.index_types:
+        start = time.perf_counter()
+        index = build_index(vectors, index_type)
+        metrics[f'{index_type}_build_ms'] = (time.perf_counter() - start) * 1000
+        metrics[f'{index_type}_index_mb'] = len(faiss.serialize_index(index)) / 1e6
+    return metrics, {'dim': options.dim}
+
+
+def bench_retrieve(size, options):
+    import pandas as pd
+
+    from retrieval_bundle import load_bundle, save_bundle
+
+    index_type = 'flat' if has_faiss() else 'numpy-float32'
+    vectors = clustered_vectors(size, options.dim)
+    queries = clustered_vectors(options.queries, options.dim, seed=1)
+    bundle_dir = tempfile.mkdtemp(prefix='bench_retrieve_')
+    metrics = {}
+    try:
+        save_bundle(bundle_dir, vectors, pd.DataFrame(prompt_records(size)), 'benchmark', index_type)
+        bundle = load_bundle(bundle_dir)
+
+        def timed(query):
+            start = time.perf_counter()
+            bundle.retrieve_top_k(query, options.k)
+            return (time.perf_counter() - start) * 1000
+
+        for concurrency in options.concurrency:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                start = time.perf_counter()
+                latencies = list(pool.map(timed, queries))
+                seconds = time.perf_counter() - start
+            for percentile in (50, 95, 99):
+                metrics[f'c{concurrency}_p{percentile}_ms'] = float(np.percentile(latencies, percentile))
+            metrics[f'c{concurrency}_qps'] = rate(len(queries), seconds)
+        bundle.close()
+    finally:
+        shutil.rmtree(bundle_dir, ignore_errors=True)
+    return metrics, {'index_type': index_type, 'dim': options.dim, 'k': options.k, 'queries': options.queries}
+
+
+SCENARIOS = {
+    'clean': bench_clean,
+    'extract': bench_extract,
+    'filter_qa': bench_filter_qa,
+    'embed': bench_embed,
+    'index': bench_index,
+    'retrieve': bench_retrieve,
+}
+
+
+# 3. RUN
+def run_case(name, size, options):
+    """Median metrics of `options.repeats` runs of one scenario, plus this process's peak RSS"""
+    os.chdir(ROOT)
+    runs = []
+    start = time.perf_counter()
+    for _ in range(options.repeats):
+        metrics, info = SCENARIOS[name](size, options)
+        runs.append(metrics)
+    metrics = {key: float(np.median([run[key] for run in runs])) for key in runs[0]}
+    metrics['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {'scenario': name, 'size': size, 'metrics': metrics, 'info': info,
+            'wall_seconds': round(time.perf_counter() - start, 3)}
+
+
+def package_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None, None
+    return commit or None, bool(dirty)
+
+
+def environment():
+    commit, dirty = git_revision()
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'git_dirty': dirty,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'packages': {name: package_version(name) for name in PACKAGES},
+    }
+
+
+def run_suite(scenarios, sizes, options):
+    results = []
+    print(f"{'Scenario':<12}{'Size':>10}  Metrics")
+    for name in scenarios:
+        for size in sizes:
+            # A fresh process per case keeps each peak RSS and warm-up separate
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(run_case, name, size, options).result()
+            results.append(result)
+            summary = ', '.join(f"{key}={value:,.2f}" for key, value in result['metrics'].items())
+            print(f"{name:<12}{size:>10,}  {summary or result['info'].get('skipped', '')}")
+    return {'environment': environment(), 'options': vars(options), 'results': results}
+
+
+def save_results(report, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load_results(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# 4. COMPARE
+def direction(metric):
+    """+1 if higher is better, -1 if lower is better, 0 if the name does not say"""
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline, current, tolerance=0.10):
+    """
+    Rows (scenario, size, metric, baseline, current, relative change, status) for
+    every metric present in both reports; status is 'regression' when the
+    metric got worse by more than `tolerance`, 'improved' when it got better by
+    as much, else 'ok'
+    """
+    previous = {(r['scenario'], r['size']): r['metrics'] for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        before = previous.get((result['scenario'], result['size']), {})
+        for metric, value in result['metrics'].items():
+            if metric not in before or not direction(metric) or not before[metric]:
+                continue
+            change = (value - before[metric]) / abs(before[metric])
+            gain = change * direction(metric)
+            status = 'regression' if gain < -tolerance else 'improved' if gain > tolerance else 'ok'
+            rows.append((result['scenario'], result['size'], metric, before[metric], value, change, status))
+    return rows
+
+
+def print_comparison(baseline, current, rows, tolerance):
+    for key in ('git_commit', 'python', 'machine', 'cpu_count'):
+        if baseline['environment'].get(key) != current['environment'].get(key):
+            print(f"⚠️ {key} differs: {baseline['environment'].get(key)} (baseline) vs "
+                  f"{current['environment'].get(key)} (current)")
+    print(f"\n{'Scenario':<12}{'Size':>10}  {'Metric':<32}{'Baseline':>14}{'Current':>14}{'Change':>9}  Status")
+    for scenario, size, metric, before, value, change, status in rows:
+        flag = {'regression': '❌ regression', 'improved': '✅ improved'}.get(status, 'ok')
+        print(f"{scenario:<12}{size:>10,}  {metric:<32}{before:>14,.2f}{value:>14,.2f}{change:>+9.1%}  {flag}")
+    regressions = sum(row[-1] == 'regression' for row in rows)
+    print(f"\n{regressions} regression(s) beyond {tolerance:.0%} in {len(rows)} compared metrics")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages and compare against a baseline")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="run the scenarios and save the results")
+    run.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    run.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000], help="corpus sizes (rows)")
+    run.add_argument('--repeats', type=int, default=3, help="runs per case; metrics are the median")
+    run.add_argument('--output', default=DEFAULT_OUTPUT)
+    run.add_argument('--baseline', default=None, help="compare the new results against this file")
+    run.add_argument('--tolerance', type=float, default=0.10, help="relative change counted as a regression")
+    run.add_argument('--dim', type=int, default=384, help="embedding dimension")
+    run.add_argument('--index-types', nargs='+', default=['flat', 'ivf', 'hnsw'])
+    run.add_argument('--queries', type=int, default=500, help="retrieve_top_k calls per concurrency level")
+    run.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    run.add_argument('--k', type=int, default=5)
+
+    comparison = commands.add_parser('compare', help="compare two saved results")
+    comparison.add_argument('baseline')
+    comparison.add_argument('current')
+    comparison.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        options = argparse.Namespace(**{key: value for key, value in vars(args).items()
+                                        if key not in ('command', 'output', 'baseline')})
+        report = run_suite(args.scenarios, args.sizes, options)
+        save_results(report, args.output)
+        print(f"\n✅ Results saved to {args.output}")
+        baseline_path, current = args.baseline, report
+    else:
+        baseline_path, current = args.baseline, load_results(args.current)
+
+    if baseline_path:
+        baseline = load_results(baseline_path)
+        if print_comparison(baseline, current, compare(baseline, current, args.tolerance), args.tolerance):
+            raise SystemExit(1)
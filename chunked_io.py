@@ -0,0 +1,263 @@
+"""
+Helpers for running the cleaning scripts over a table in chunks.
+
+read_chunks streams a CSV with pinned dtypes, or a memory-mapped Parquet /
+Arrow IPC file with column projection. ordered_map runs a function over the
+chunks (in-process or on a process pool) and yields results in input order,
+and ChunkWriter appends each result to a CSV, Parquet or Arrow IPC file.
+The file format always follows the extension (.csv, .parquet, .arrow/.feather).
+
+Run this file directly to compare load and save times of the formats:
+    python chunked_io.py [--input data/Amazon_Cleaned_Data_Lightweight.csv.gz]
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+
+# Column types of the Amazon Unlocked Mobile dump. Pinned so that every chunk
+# parses a column the same way (e.g. Price never flips between int and float).
+AMAZON_DTYPES = {
+    'Product Name': 'object',
+    'Brand Name': 'object',
+    'Price': 'float64',
+    'Rating': 'Int64',
+    'Reviews': 'object',
+    'Review Votes': 'float64',
+}
+
+DEFAULT_CHUNKSIZE = 50_000
+
+# Rows sampled to fix the dtypes of columns not listed in AMAZON_DTYPES
+DTYPE_SAMPLE_ROWS = 10_000
+
+COLUMNAR_SUFFIXES = ('.parquet', '.arrow', '.feather')
+
+
+def resolve_workers(workers):
+    """0 means one worker per CPU core"""
+    if workers == 0:
+        return os.cpu_count() or 1
+    return max(1, workers)
+
+
+def is_columnar(path):
+    """True for Parquet and Arrow IPC files"""
+    return path.endswith(COLUMNAR_SUFFIXES)
+
+
+def sibling_path(path, tag):
+    """`path` with `tag` inserted before the extension, e.g. data.tmp.parquet"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{tag}{ext}"
+
+
+def resolve_dtypes(path, **kwargs):
+    """
+    Fix a dtype for every column before streaming: AMAZON_DTYPES where known,
+    otherwise text or float64 based on a sample of the first rows. A later
+    chunk that does not fit then fails loudly instead of parsing differently.
+    """
+    sample = pd.read_csv(path, dtype=AMAZON_DTYPES, nrows=DTYPE_SAMPLE_ROWS, **kwargs)
+    return {
+        col: AMAZON_DTYPES.get(col, 'object' if sample[col].dtype == 'object' else 'float64')
+        for col in sample.columns
+    }
+
+
+def read_batches(path, chunksize=None, columns=None):
+    """
+    Yield pyarrow record batches (or one table if chunksize is None) from a
+    memory-mapped Parquet or Arrow IPC file, reading only `columns`.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if path.endswith('.parquet'):
+        if chunksize is None:
+            yield pq.read_table(path, columns=columns, memory_map=True)
+        else:
+            yield from pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunksize, columns=columns)
+        return
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        if chunksize is None:
+            table = reader.read_all()
+            yield table.select(columns) if columns else table
+            return
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            batch = batch.select(columns) if columns else batch
+            for offset in range(0, batch.num_rows, chunksize):
+                yield batch.slice(offset, chunksize)
+
+
+def read_chunks(path, chunksize=None, dtype=None, columns=None, **kwargs):
+    """
+    Yield DataFrames of at most `chunksize` rows (the whole file if None),
+    with only `columns` if given.
+    Unless `dtype` is given, every column of a chunked CSV read gets the dtype
+    chosen by resolve_dtypes. Columnar files carry their own types.
+    """
+    if is_columnar(path):
+        for batch in read_batches(path, chunksize, columns):
+            yield batch.to_pandas()
+        return
+
+    if columns is not None:
+        kwargs['usecols'] = columns
+    if chunksize is None:
+        yield pd.read_csv(path, dtype=dtype or AMAZON_DTYPES, **kwargs)
+        return
+    dtype = dtype or resolve_dtypes(path, usecols=kwargs.get('usecols'))
+    with pd.read_csv(path, dtype=dtype, chunksize=chunksize, **kwargs) as reader:
+        yield from reader
+
+
+def ordered_map(func, items, workers=1, max_pending=None):
+    """
+    Yield func(item) for every item, in input order.
+    With more than one worker the items run on a process pool, and at most
+    `max_pending` of them are in flight so memory stays bounded by chunk size.
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_csv_chunk(df, path, first):
+    """Write the header with the first chunk, append the rest"""
+    df.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+
+
+class ChunkWriter:
+    """
+    Append DataFrame chunks to a CSV, Parquet or Arrow IPC file.
+    The columnar schema is taken from the first chunk, with all-null columns
+    typed as strings, so later chunks are always written with the same types.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._first = True
+        self._schema = None
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, df):
+        if not is_columnar(self.path):
+            write_csv_chunk(df, self.path, self._first)
+            self._first = False
+            self.rows += len(df)
+            return
+
+        import pyarrow as pa
+        if self._schema is None:
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            for i, field in enumerate(schema):
+                if pa.types.is_null(field.type):
+                    schema = schema.set(i, pa.field(field.name, pa.string()))
+            self._schema = schema
+        self.write_arrow(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+    def write_arrow(self, table):
+        """Write a pyarrow table or record batch without going through pandas"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if isinstance(table, pa.RecordBatch):
+            table = pa.Table.from_batches([table])
+        if self._writer is None:
+            self._schema = self._schema or table.schema
+            if self.path.endswith('.parquet'):
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, self._schema)
+        self._writer.write_table(table.cast(self._schema))
+        self.rows += table.num_rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def replace_column(batch, name, values):
+    """Swap one column of a pyarrow batch for pandas `values`; the other columns are not copied"""
+    import pyarrow as pa
+
+    table = pa.Table.from_batches([batch]) if isinstance(batch, pa.RecordBatch) else batch
+    i = table.schema.get_field_index(name)
+    field = table.schema.field(i)
+    return table.set_column(i, field, pa.array(values, type=field.type, from_pandas=True))
+
+
+def export_csv(path, csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Final CSV export of a Parquet / Arrow IPC intermediate"""
+    with ChunkWriter(csv_path) as writer:
+        for chunk in read_chunks(path, chunksize):
+            writer.write(chunk)
+    return writer.rows
+
+
+# FORMAT BENCHMARK
+def benchmark(input_path, projection):
+    df = pd.read_csv(input_path, dtype=AMAZON_DTYPES)
+    print(f"Loaded {len(df):,} rows x {len(df.columns)} columns from {input_path}")
+    print(f"\n{'Format':<10}{'Save s':>9}{'Load s':>9}{'Projected s':>13}{'Size MB':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for suffix in ['.csv', '.parquet', '.arrow']:
+            path = os.path.join(tmp_dir, 'bench' + suffix)
+
+            start = time.perf_counter()
+            with ChunkWriter(path) as writer:
+                writer.write(df)
+            save_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = next(read_chunks(path))
+            load_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            next(read_chunks(path, columns=projection))
+            projected_time = time.perf_counter() - start
+
+            if not loaded.equals(df):
+                raise SystemExit(f"{suffix} round trip changed the data")
+            size = os.path.getsize(path) / 1e6
+            print(f"{suffix[1:]:<10}{save_time:>9.2f}{load_time:>9.2f}{projected_time:>13.2f}{size:>10.1f}")
+
+    print(f"\nProjected load reads only: {', '.join(projection)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CSV vs Parquet vs Arrow IPC load/save times")
+    parser.add_argument('--input', default='data/Amazon_Cleaned_Data_Lightweight.csv.gz')
+    parser.add_argument('--columns', nargs='+', default=['Product Name', 'Brand Name'])
+    args = parser.parse_args()
+
+    benchmark(args.input, args.columns)
@@ -0,0 +1,249 @@
+"""
+Persistent content-addressed embedding cache shared by the embedding scripts.
+
+Vectors are keyed by (model name, hash of the normalized text) and stored in a
+memory-mapped float32 array, one file per model, next to a small index of
+text hash -> row. EmbeddingCache.embed looks every text up first, encodes each
+distinct missing text once, and stores the new vectors.
+
+The cache is bounded by `max_bytes` of vectors per model; when it is full the
+least recently used rows are evicted and reused. One process should write to a
+cache directory at a time.
+
+Run this file directly to see the hit rate on the synthetic prompt/response CSV:
+    python embedding_cache.py --input apple_prompt_response_1000_realistic.csv
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import time
+import unicodedata
+
+import numpy as np
+
+
+DEFAULT_CACHE_DIR = '.embedding_cache'
+DEFAULT_MAX_BYTES = 1 << 30
+
+# Share of the rows freed at once when the cache is full, so eviction does not run on every call
+EVICT_FRACTION = 0.1
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Unicode NFC with runs of whitespace collapsed; case is kept"""
+    return WHITESPACE.sub(' ', unicodedata.normalize('NFC', str(text))).strip()
+
+
+def text_key(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).digest()
+
+
+class EmbeddingCache:
+    """On-disk LRU cache of the embeddings of one model"""
+
+    def __init__(self, cache_dir, model, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(cache_dir, exist_ok=True)
+        slug = re.sub(r'[^\w.-]+', '_', model)
+        self.model = model
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, slug + '.index.pkl')
+        self.vectors_path = os.path.join(cache_dir, slug + '.f32')
+        self.hits = 0
+        self.misses = 0
+        self.duplicates = 0
+        self.evictions = 0
+
+        # slots: text hash -> row, keys: row -> text hash (None when free),
+        # last_used: row -> tick of the last call that read or wrote it
+        self.dim = None
+        self.slots = {}
+        self.keys = []
+        self.last_used = np.zeros(0, dtype=np.int64)
+        self.tick = 0
+        self.vectors = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'rb') as f:
+                stored = pickle.load(f)
+            if stored['model'] == model:
+                self.dim = stored['dim']
+                self.slots = stored['slots']
+                self.keys = stored['keys']
+                self.last_used = stored['last_used']
+                self.tick = stored['tick']
+                if self.dim is not None:
+                    self._open_vectors(len(self.keys))
+
+    @property
+    def capacity(self):
+        return len(self.keys)
+
+    @property
+    def max_entries(self):
+        return max(1, self.max_bytes // (4 * self.dim))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _open_vectors(self, rows):
+        """Memory-map the vector file with room for `rows` rows"""
+        if self.vectors is not None:
+            self.vectors.flush()
+        self.vectors = None
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(rows * self.dim * 4)
+        if rows:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(rows, self.dim))
+
+    def _allocate(self, count):
+        """Rows for `count` new vectors: free rows first, then growth, then LRU eviction"""
+        free = [row for row, key in enumerate(self.keys) if key is None]
+        if len(free) < count and self.capacity < self.max_entries:
+            grown = min(self.max_entries, max(count - len(free) + self.capacity, 2 * self.capacity, 1024))
+            free += range(self.capacity, grown)
+            self.keys += [None] * (grown - self.capacity)
+            self.last_used = np.concatenate([self.last_used, np.zeros(grown - len(self.last_used), dtype=np.int64)])
+            self._open_vectors(grown)
+        if len(free) < count:
+            evict = min(self.capacity, max(count - len(free), int(self.capacity * EVICT_FRACTION)))
+            ages = np.where([key is None for key in self.keys], np.iinfo(np.int64).max, self.last_used)
+            for row in np.argpartition(ages, evict - 1)[:evict]:
+                row = int(row)
+                if self.keys[row] is not None:
+                    del self.slots[self.keys[row]]
+                    self.keys[row] = None
+                    self.evictions += 1
+                    free.append(row)
+            # Forget the evicted rows on disk before they are overwritten
+            self.flush()
+        return free[:count]
+
+    def embed(self, texts, encode):
+        """
+        Embeddings of `texts` (float32, one row per text, in order).
+        `encode` is called once with the distinct texts missing from the cache
+        and must return one vector per text.
+        """
+        texts = list(texts)
+        keys = [text_key(text) for text in texts]
+        self.tick += 1
+
+        first_missing = {}
+        for i, key in enumerate(keys):
+            if key not in self.slots and key not in first_missing:
+                first_missing[key] = i
+        cached_rows = np.array([self.slots.get(key, -1) for key in keys], dtype=np.int64)
+        hit = cached_rows >= 0
+        self.hits += int(hit.sum())
+        self.misses += len(first_missing)
+        self.duplicates += int((~hit).sum()) - len(first_missing)
+
+        new_vectors = None
+        if first_missing:
+            new_vectors = np.asarray(encode([texts[i] for i in first_missing.values()]), dtype=np.float32)
+            if len(new_vectors) != len(first_missing):
+                raise ValueError(f"expected {len(first_missing)} embeddings, got {len(new_vectors)}")
+            if self.dim is None:
+                self.dim = new_vectors.shape[1]
+            elif new_vectors.shape[1] != self.dim:
+                raise ValueError(f"{self.model} vectors have {self.dim} dimensions, got {new_vectors.shape[1]}")
+
+        dim = self.dim if self.dim is not None else 0
+        out = np.empty((len(texts), dim), dtype=np.float32)
+        if hit.any():
+            out[hit] = self.vectors[cached_rows[hit]]
+            self.last_used[cached_rows[hit]] = self.tick
+
+        if new_vectors is not None:
+            position = {key: j for j, key in enumerate(first_missing)}
+            missing_rows = np.flatnonzero(~hit)
+            out[missing_rows] = new_vectors[[position[keys[i]] for i in missing_rows]]
+
+            # Only the newest vectors are kept if one call brings more than fit
+            stored = list(first_missing)[-self.max_entries:]
+            stored_vectors = new_vectors[-len(stored):]
+            # Rows this call just read may be evicted too; their vectors are already in `out`
+            rows = self._allocate(len(stored))
+            for row, key in zip(rows, stored):
+                self.slots[key] = row
+                self.keys[row] = key
+            self.vectors[rows] = stored_vectors
+            self.last_used[rows] = self.tick
+            self.flush()
+        return out
+
+    def flush(self):
+        """Write the vectors, then atomically replace the index"""
+        if self.vectors is not None:
+            self.vectors.flush()
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'model': self.model,
+                'dim': self.dim,
+                'slots': self.slots,
+                'keys': self.keys,
+                'last_used': self.last_used,
+                'tick': self.tick,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.index_path)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.duplicates
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'duplicates': self.duplicates,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.duplicates) / lookups if lookups else 0.0,
+            'entries': len(self),
+            'bytes': self.capacity * 4 * (self.dim or 0),
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print(f"Embedding cache ({self.model}): {stats['hits']:,} hits, {stats['misses']:,} encoded, "
+              f"{stats['duplicates']:,} repeated texts, {stats['evictions']:,} evicted "
+              f"-> {stats['hit_rate']:.1%} not re-encoded, {stats['entries']:,} entries "
+              f"({stats['bytes'] / 1e6:.1f} MB)")
+
+
+def open_cache(cache_dir, model, max_bytes=DEFAULT_MAX_BYTES):
+    """EmbeddingCache, or None if cache_dir is empty (caching disabled)"""
+    return EmbeddingCache(cache_dir, model, max_bytes) if cache_dir else None
+
+
+# HIT RATE ON THE SYNTHETIC RECORDS
+def demo(input_path, dim):
+    import pandas as pd
+
+    df = pd.read_csv(input_path)
+    texts = (df['prompt'] + " " + df['response']).tolist()
+    encoded = []
+
+    def encode(batch):
+        encoded.append(len(batch))
+        rng = np.random.default_rng(len(encoded))
+        return rng.standard_normal((len(batch), dim)).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for run in ['cold', 'warm']:
+            cache = EmbeddingCache(cache_dir, 'demo-model')
+            start = time.perf_counter()
+            cache.embed(texts, encode)
+            print(f"{run} run: {time.perf_counter() - start:.3f}s, encoder called on {sum(encoded):,} texts")
+            cache.print_stats()
+            encoded.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the embedding cache hit rate on a prompt/response CSV")
+    parser.add_argument('--input', default='apple_prompt_response_1000_realistic.csv')
+    parser.add_argument('--dim', type=int, default=384)
+    args = parser.parse_args()
+
+    demo(args.input, args.dim)
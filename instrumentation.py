@@ -0,0 +1,392 @@
+"""
+Per-stage timing, throughput and memory metrics for the pipeline scripts.
+
+The scripts wrap their major stages (load, clean, score, save, embed,
+index_build, search, context) in `stage()`; a run enables collection from the
+environment, so run_pipeline.py can switch it on for every stage it runs:
+    PIPELINE_METRICS          file the metrics go to ('-' for stdout, {run} is
+                              replaced by the run label); .prom files get
+                              Prometheus text format (rewritten at the end),
+                              anything else JSON lines (appended, one line
+                              per stage plus one for the run)
+    PIPELINE_METRICS_FORMAT   'jsonl' or 'prometheus', to override the extension
+    PIPELINE_RUN              run label (default: the script's own)
+    PIPELINE_PROFILE          'cprofile' or 'tracemalloc' to also profile stages
+    PIPELINE_PROFILE_STAGES   comma-separated stages to profile (default: all)
+    PIPELINE_PROFILE_DIR      where .prof / allocation reports go (build/profiles)
+When nothing is enabled stage() is a no-op, so library functions can use it
+on hot paths.
+
+Each stage accumulates calls, seconds, items (rows, texts, queries...) and
+the peak RSS seen while it ran, sampled by a background thread every
+PIPELINE_SAMPLE_INTERVAL seconds (0.05). Work done in worker processes is
+collected with collect() and merge().
+
+    PIPELINE_METRICS=build/metrics.jsonl python Improved_Extract_Product_Names.py ...
+    PIPELINE_METRICS=build/metrics.prom PIPELINE_PROFILE=cprofile python scripts/embed_qa.py ...
+"""
+import atexit
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+
+PROFILE_DIR = os.path.join('build', 'profiles')
+PROFILERS = ['cprofile', 'tracemalloc']
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+TOP_ALLOCATIONS = 10
+TRACEMALLOC_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__),
+                       tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')]
+
+_current = None
+
+
+# 1. MEMORY
+def peak_rss():
+    """Peak resident set size of this process so far, in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def current_rss():
+    """Resident set size now, in bytes (the peak so far where /proc is not available)"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss()
+
+
+class RssSampler:
+    """One daemon thread per process raising the peak_rss_bytes of every running stage"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.active = []
+        self.pid = None
+
+    def add(self, record):
+        if self.pid != os.getpid():  # first stage in this process (threads do not survive fork)
+            self.pid = os.getpid()
+            self.active = []
+            threading.Thread(target=self._run, name='rss-sampler', daemon=True).start()
+        self.active.append(record)
+
+    def remove(self, record):
+        self.active.remove(record)
+
+    def _run(self):
+        pid = self.pid
+        while pid == self.pid:
+            if self.active:
+                rss = current_rss()
+                for record in list(self.active):
+                    record['peak_rss_bytes'] = max(record['peak_rss_bytes'], rss)
+            time.sleep(self.interval)
+
+
+_sampler = RssSampler(float(os.environ.get('PIPELINE_SAMPLE_INTERVAL', 0.05)))
+
+
+# 2. COLLECTION
+class RawStats:
+    """cProfile stats from another process, in the shape pstats.Stats loads"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class Instrumentation:
+    """Stage timers, item counts, peak RSS and counters of one run"""
+
+    def __init__(self, run, profile=None, profile_stages=None, profile_dir=PROFILE_DIR):
+        if profile not in (None, *PROFILERS):
+            raise ValueError(f"profile must be one of {PROFILERS}, got {profile!r}")
+        self.run = run
+        self.profile = profile
+        self.profile_stages = set(profile_stages) if profile_stages else None
+        self.profile_dir = profile_dir
+        self.stages = {}
+        self.counters = {}
+        self.profiles = {}  # stage -> list of cProfile stats dicts
+        self._profiling = False
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+
+    def _record(self, name):
+        record = self.stages.get(name)
+        if record is None:
+            record = self.stages[name] = {'calls': 0, 'seconds': 0.0, 'items': 0, 'peak_rss_bytes': 0}
+        return record
+
+    def _profiles(self, name):
+        return self.profile and (self.profile_stages is None or name in self.profile_stages)
+
+    @contextlib.contextmanager
+    def stage(self, name, items=0):
+        """Time one pass through a stage; `items` (or add_items) is the work it did"""
+        record = self._record(name)
+        profiler = None
+        if self._profiles(name) and self.profile == 'cprofile' and not self._profiling:
+            profiler, self._profiling = cProfile.Profile(), True
+            profiler.enable()
+        tracing = self._profiles(name) and self.profile == 'tracemalloc'
+        if tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        _sampler.add(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] += time.perf_counter() - start
+            record['calls'] += 1
+            record['items'] += items
+            _sampler.remove(record)
+            if not record['peak_rss_bytes']:  # shorter than one sampling interval so far
+                record['peak_rss_bytes'] = current_rss()
+            if profiler is not None:
+                profiler.disable()
+                profiler.create_stats()
+                self.profiles.setdefault(name, []).append(profiler.stats)
+                self._profiling = False
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                if peak > record.get('tracemalloc_peak_bytes', -1):
+                    record['tracemalloc_peak_bytes'] = peak
+                    snapshot = tracemalloc.take_snapshot().filter_traces(TRACEMALLOC_FILTERS)
+                    top = snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+                    record['top_allocations'] = [str(stat) for stat in top]
+
+    def add_items(self, name, items):
+        self._record(name)['items'] += items
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed(self, name, iterable, items=len):
+        """Yield from `iterable`, timing each step as stage `name` with items(element) items"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as record:
+                try:
+                    element = next(iterator)
+                except StopIteration:
+                    record['calls'] -= 1
+                    return
+                record['items'] += items(element) if items else 0
+            yield element
+
+    def snapshot(self):
+        """Picklable stages, counters and profiles, for merge() in another process"""
+        return {'stages': self.stages, 'counters': self.counters, 'profiles': self.profiles}
+
+    def merge(self, snapshot):
+        for name, other in snapshot['stages'].items():
+            record = self._record(name)
+            for key in ('calls', 'seconds', 'items'):
+                record[key] += other[key]
+            record['peak_rss_bytes'] = max(record['peak_rss_bytes'], other['peak_rss_bytes'])
+            if other.get('tracemalloc_peak_bytes', -1) > record.get('tracemalloc_peak_bytes', -1):
+                record['tracemalloc_peak_bytes'] = other['tracemalloc_peak_bytes']
+                record['top_allocations'] = other['top_allocations']
+        for name, value in snapshot['counters'].items():
+            self.count(name, value)
+        for name, stats in snapshot['profiles'].items():
+            self.profiles.setdefault(name, []).extend(stats)
+
+    # 3. OUTPUT
+    def rows(self):
+        """One JSON-ready dict per stage, then one for the whole run"""
+        common = {'run': self.run, 'started_at': self.started_at.isoformat(timespec='seconds'),
+                  'host': socket.gethostname(), 'pid': os.getpid()}
+        rows = []
+        for name, record in self.stages.items():
+            row = {'type': 'stage', **common, 'stage': name, 'calls': record['calls'],
+                   'seconds': round(record['seconds'], 6), 'items': record['items'],
+                   'items_per_sec': round(record['items'] / record['seconds'], 1) if record['seconds'] else None,
+                   'peak_rss_mb': round(record['peak_rss_bytes'] / 2**20, 1)}
+            if 'tracemalloc_peak_bytes' in record:
+                row['tracemalloc_peak_mb'] = round(record['tracemalloc_peak_bytes'] / 2**20, 1)
+            rows.append(row)
+        rows.append({'type': 'run', **common, 'seconds': round(time.perf_counter() - self._start, 6),
+                     'peak_rss_mb': round(peak_rss() / 2**20, 1), 'counters': self.counters})
+        return rows
+
+    def prometheus(self):
+        """Prometheus text exposition format (e.g. for the node_exporter textfile collector)"""
+        metrics = [
+            ('pipeline_stage_seconds_total', 'counter', "Wall time spent in the stage", 'seconds'),
+            ('pipeline_stage_calls_total', 'counter', "Times the stage ran", 'calls'),
+            ('pipeline_stage_items_total', 'counter', "Items the stage processed", 'items'),
+            ('pipeline_stage_peak_rss_bytes', 'gauge', "Peak resident memory while the stage ran", 'peak_rss_bytes'),
+            ('pipeline_stage_tracemalloc_peak_bytes', 'gauge', "Peak traced Python allocations in the stage",
+             'tracemalloc_peak_bytes'),
+        ]
+        lines = []
+        for metric, kind, help_text, key in metrics:
+            samples = [(name, record[key]) for name, record in self.stages.items() if key in record]
+            if not samples:
+                continue
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+            lines += [f'{metric}{{run="{self.run}",stage="{name}"}} {value}' for name, value in samples]
+        if self.counters:
+            lines += ["# HELP pipeline_counter_total Pipeline counters", "# TYPE pipeline_counter_total counter"]
+            lines += [f'pipeline_counter_total{{run="{self.run}",name="{name}"}} {value}'
+                      for name, value in self.counters.items()]
+        run = f'{{run="{self.run}"}}'
+        lines += ["# HELP pipeline_run_seconds Wall time of the run", "# TYPE pipeline_run_seconds gauge",
+                  f"pipeline_run_seconds{run} {time.perf_counter() - self._start:.6f}",
+                  "# HELP pipeline_run_peak_rss_bytes Peak resident memory of the run",
+                  "# TYPE pipeline_run_peak_rss_bytes gauge", f"pipeline_run_peak_rss_bytes{run} {peak_rss()}",
+                  "# HELP pipeline_run_timestamp_seconds Start of the run",
+                  "# TYPE pipeline_run_timestamp_seconds gauge",
+                  f"pipeline_run_timestamp_seconds{run} {self.started_at.timestamp():.0f}"]
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, output_format=None):
+        output_format = output_format or ('prometheus' if path.endswith('.prom') else 'jsonl')
+        if output_format == 'prometheus':
+            text = self.prometheus()
+        else:
+            text = ''.join(json.dumps(row) + '\n' for row in self.rows())
+        if path == '-':
+            sys.stdout.write(text)
+            return
+        path = path.replace('{run}', self.run)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if output_format == 'prometheus':
+            # Scrapers must never see a half-written file
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        else:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(text)
+
+    def write_profiles(self):
+        """
+        A merged .prof file and its top-20 cumulative listing per cProfile
+        stage, and the top allocations of each tracemalloc stage
+        """
+        os.makedirs(self.profile_dir, exist_ok=True)
+        for name, profiles in self.profiles.items():
+            stats = pstats.Stats(RawStats(profiles[0]))
+            for other in profiles[1:]:
+                stats.add(RawStats(other))
+            path = os.path.join(self.profile_dir, f"{self.run}.{name}.prof")
+            stats.dump_stats(path)
+            listing = io.StringIO()
+            pstats.Stats(path, stream=listing).sort_stats('cumulative').print_stats(20)
+            with open(path[:-len('.prof')] + '.txt', 'w', encoding='utf-8') as f:
+                f.write(listing.getvalue())
+        for name, record in self.stages.items():
+            if 'top_allocations' in record:
+                with open(os.path.join(self.profile_dir, f"{self.run}.{name}.allocations.txt"), 'w',
+                          encoding='utf-8') as f:
+                    f.write(f"Peak traced memory: {record['tracemalloc_peak_bytes'] / 2**20:.1f} MB\n")
+                    f.write('\n'.join(record['top_allocations']) + '\n')
+
+    def print_report(self, stream=None):
+        stream = stream or sys.stderr
+        print(f"\n{'Stage':<16}{'Calls':>8}{'Seconds':>10}{'Items':>12}{'Items/sec':>13}{'Peak RSS MB':>13}",
+              file=stream)
+        for row in self.rows()[:-1]:
+            rate = f"{row['items_per_sec']:,.0f}" if row['items_per_sec'] else '-'
+            print(f"{row['stage']:<16}{row['calls']:>8,}{row['seconds']:>10.2f}{row['items']:>12,}{rate:>13}"
+                  f"{row['peak_rss_mb']:>13,.1f}", file=stream)
+
+
+# 4. PROCESS-WIDE RUN
+def current():
+    """The active Instrumentation of this process, or None"""
+    return _current
+
+
+def activate(instrumentation):
+    global _current
+    _current = instrumentation
+    return instrumentation
+
+
+def stage(name, items=0):
+    """Instrumentation.stage on the active run; a no-op context when there is none"""
+    return _current.stage(name, items) if _current is not None else contextlib.nullcontext()
+
+
+def add_items(name, items):
+    if _current is not None:
+        _current.add_items(name, items)
+
+
+def count(name, value=1):
+    if _current is not None:
+        _current.count(name, value)
+
+
+def timed(name, iterable, items=len):
+    return _current.timed(name, iterable, items) if _current is not None else iterable
+
+
+def merge(snapshot):
+    if _current is not None and snapshot:
+        _current.merge(snapshot)
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    Collect the stages of a block into a fresh snapshot (None when no run is
+    active), e.g. inside a process-pool task whose result goes back to merge()
+    """
+    outer = _current
+    if outer is None:
+        yield None
+        return
+    inner = activate(Instrumentation(outer.run, outer.profile, outer.profile_stages, outer.profile_dir))
+    snapshot = {}
+    try:
+        yield snapshot
+    finally:
+        activate(outer)
+        snapshot.update(inner.snapshot())
+
+
+def from_env(run):
+    """
+    Activate collection as configured by the PIPELINE_* variables; the metrics
+    are written when the process exits. Returns the Instrumentation, or None
+    if neither metrics nor profiling is enabled.
+    """
+    path = os.environ.get('PIPELINE_METRICS')
+    profile = os.environ.get('PIPELINE_PROFILE') or None
+    if not path and not profile:
+        return None
+    profile_stages = [s for s in os.environ.get('PIPELINE_PROFILE_STAGES', '').split(',') if s]
+    instrumentation = activate(Instrumentation(os.environ.get('PIPELINE_RUN') or run, profile, profile_stages,
+                                               os.environ.get('PIPELINE_PROFILE_DIR', PROFILE_DIR)))
+
+    def finish():
+        instrumentation.print_report()
+        if path:
+            instrumentation.write(path, os.environ.get('PIPELINE_METRICS_FORMAT'))
+        if profile:
+            instrumentation.write_profiles()
+            print(f"Profiles written to {instrumentation.profile_dir}", file=sys.stderr)
+    atexit.register(finish)
+    return instrumentation
@@ -0,0 +1,172 @@
+"""
+Bulk, idempotent loading of embedded records into a Chroma collection.
+
+Records are written in batches of `batch_size` with one collection.upsert call
+per batch, keyed by run_id, so a rerun updates the existing records instead of
+failing on duplicate ids (and get_or_create_collection replaces
+create_collection). load_batches overlaps the two halves of the job: the
+caller's generator embeds the next batch while a consumer thread upserts the
+previous one.
+
+Run this file directly to measure records/sec against a local persistent
+collection (needs chromadb>=0.5):
+    python notebooks/chroma_loader.py --sizes 1000 100000 1000000
+"""
+import argparse
+import math
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+DEFAULT_BATCH_SIZE = 5_000
+
+
+def get_collection(path, name, space='cosine'):
+    """Persistent collection at `path`, created on the first run and reused afterwards"""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=path)
+    return client, client.get_or_create_collection(name, metadata={"hnsw:space": space})
+
+
+def max_batch_size(client, batch_size):
+    """`batch_size`, capped at the largest batch the Chroma client accepts"""
+    limit = getattr(client, 'get_max_batch_size', None)
+    return min(batch_size, limit()) if limit else batch_size
+
+
+def clean_metadata(metadata):
+    """Chroma only stores str/int/float/bool values: missing values become "" """
+    return {
+        key: "" if value is None or (isinstance(value, float) and math.isnan(value)) else value
+        for key, value in metadata.items()
+    }
+
+
+def upsert_batch(collection, batch):
+    """
+    One upsert call for a batch dict with ids, embeddings, metadatas and documents.
+    Repeated ids inside a batch keep their last record, since Chroma rejects
+    duplicates within a single call.
+    """
+    ids = batch['ids']
+    last = {record_id: i for i, record_id in enumerate(ids)}
+    keep = list(last.values()) if len(last) < len(ids) else None
+    if keep is not None:
+        batch = {key: [values[i] for i in keep] if not isinstance(values, np.ndarray) else values[keep]
+                 for key, values in batch.items()}
+    collection.upsert(
+        ids=batch['ids'],
+        embeddings=batch['embeddings'],
+        metadatas=[clean_metadata(m) for m in batch['metadatas']],
+        documents=batch['documents'],
+    )
+    return len(batch['ids'])
+
+
+def split_batch(batch, size):
+    """Batches of at most `size` records from one batch dict"""
+    for start in range(0, len(batch['ids']), size):
+        yield {key: values[start:start + size] for key, values in batch.items()}
+
+
+def load_batches(collection, batches, batch_size=DEFAULT_BATCH_SIZE, queue_size=2):
+    """
+    Upsert every batch yielded by `batches` on a consumer thread while the
+    generator produces the next one. Returns the number of records written.
+    """
+    pending = queue.Queue(maxsize=queue_size)
+    written = [0]
+    errors = []
+
+    def consume():
+        while True:
+            batch = pending.get()
+            if batch is None:
+                return
+            if not errors:
+                try:
+                    written[0] += upsert_batch(collection, batch)
+                except Exception as error:
+                    errors.append(error)
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+    try:
+        for batch in batches:
+            for part in split_batch(batch, batch_size):
+                pending.put(part)
+            if errors:
+                break
+    finally:
+        pending.put(None)
+        consumer.join()
+    if errors:
+        raise errors[0]
+    return written[0]
+
+
+# BENCHMARK
+TOPICS = ["Battery", "Charging", "Apple Silicon", "Thermal", "Privacy"]
+REGIONS = ["United States", "India", "EU", "UK", "Canada"]
+MODELS = ["ChatGPT", "Gemini", "Copilot"]
+
+
+def synthetic_batches(count, dim, batch_size, seed=0):
+    """Batches of random unit vectors with metadata shaped like vector_db.py's records"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        vectors = rng.standard_normal((size, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        topics = rng.integers(len(TOPICS), size=size)
+        yield {
+            'ids': [f"r{i:07d}" for i in range(start, start + size)],
+            'embeddings': vectors,
+            'metadatas': [
+                {"prompt_id": f"p{i:07d}", "topic": TOPICS[t], "region": REGIONS[i % len(REGIONS)],
+                 "model": MODELS[i % len(MODELS)]}
+                for i, t in zip(range(start, start + size), topics)
+            ],
+            'documents': [f"Why does iPhone have issue related to {TOPICS[t]}? ({i})"
+                          for i, t in zip(range(start, start + size), topics)],
+        }
+
+
+def benchmark(sizes, dim, batch_size, single_limit):
+    print(f"{'Records':>10}  {'Mode':<22}{'Seconds':>10}{'Records/sec':>14}")
+    for count in sizes:
+        runs = [('batched upsert', batch_size), ('batched upsert rerun', batch_size)]
+        if count <= single_limit:
+            runs.insert(0, ('one upsert per record', 1))
+
+        path = tempfile.mkdtemp(prefix='chroma_bench_')
+        try:
+            for name, size in runs:
+                client, collection = get_collection(path, f"bench_{size}")
+                size = max_batch_size(client, size)
+                start = time.perf_counter()
+                written = load_batches(collection, synthetic_batches(count, dim, max(size, 1000)), size)
+                seconds = time.perf_counter() - start
+                if collection.count() != count:
+                    raise SystemExit(f"{name}: collection holds {collection.count()} records, expected {count}")
+                print(f"{count:>10,}  {name:<22}{seconds:>10.2f}{written / seconds:>14,.0f}")
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark bulk upserts into a local persistent Chroma collection")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--single-limit', type=int, default=10_000,
+                        help="only time one-upsert-per-record loads up to this many records")
+    args = parser.parse_args()
+
+    benchmark(args.sizes, args.dim, args.batch_size, args.single_limit)
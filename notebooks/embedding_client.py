@@ -0,0 +1,209 @@
+"""
+Batched, concurrent embedding client.
+
+embed_texts splits the inputs into batches of `batch_size` texts and keeps at
+most `concurrency` requests in flight with asyncio, so ingestion is limited by
+the API's throughput rather than by one round trip per record. Throttled
+requests are retried with exponential backoff, and the vectors come back as one
+float32 matrix in input order. With a cache (embedding_cache.EmbeddingCache)
+only the distinct texts it does not hold yet are sent.
+
+Backends:
+  - OpenAIEmbedder: the OpenAI embeddings API (needs `openai` and an API key)
+  - FakeEmbedder: deterministic vectors with a simulated latency and rate
+    limit, for offline tests and benchmarks
+
+Run this file directly to compare one-request-per-row against batched requests
+on the fake backend:
+    python notebooks/embedding_client.py --records 1000 --latency 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_cache import DEFAULT_CACHE_DIR, open_cache  # noqa: E402,F401
+
+
+class RateLimitError(Exception):
+    """Raised by FakeEmbedder when too many requests are in flight"""
+
+
+# 1. BACKENDS
+class OpenAIEmbedder:
+    """OpenAI embeddings API; several inputs per request"""
+
+    def __init__(self, model="text-embedding-3-small", api_key=None):
+        from openai import AsyncOpenAI
+
+        self.model = model
+        self.client = AsyncOpenAI(api_key=api_key)
+
+    async def embed_batch(self, texts):
+        response = await self.client.embeddings.create(model=self.model, input=texts)
+        # Items carry their position in the request; don't rely on response order
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def is_retryable(self, error):
+        import openai
+
+        return isinstance(error, (openai.RateLimitError, openai.APITimeoutError,
+                                  openai.APIConnectionError, openai.InternalServerError))
+
+
+class FakeEmbedder:
+    """
+    Deterministic embeddings: each text is hashed into a seed for a unit vector.
+    Every request sleeps `latency` seconds plus `per_item` per text, and fails
+    with RateLimitError while more than `max_in_flight` requests are running.
+    """
+
+    def __init__(self, model="fake-embedding", dim=1536, latency=0.05, per_item=0.0, max_in_flight=None):
+        self.model = model
+        self.dim = dim
+        self.latency = latency
+        self.per_item = per_item
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+
+    def vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(f"{self.model}\0{text}".encode('utf-8')).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    async def embed_batch(self, texts):
+        self.requests += 1
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            self.throttled += 1
+            await asyncio.sleep(self.latency / 10)
+            raise RateLimitError(f"more than {self.max_in_flight} requests in flight")
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency + self.per_item * len(texts))
+            return [self.vector(text) for text in texts]
+        finally:
+            self.in_flight -= 1
+
+    def is_retryable(self, error):
+        return isinstance(error, RateLimitError)
+
+
+# 2. CLIENT
+async def embed_batch_with_retry(backend, texts, max_retries=6, base_delay=0.5, max_delay=30.0):
+    """One request, retried with exponential backoff and jitter while the backend throttles"""
+    for attempt in range(max_retries + 1):
+        try:
+            return await backend.embed_batch(texts)
+        except Exception as error:
+            if attempt == max_retries or not backend.is_retryable(error):
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+
+async def embed_texts_async(texts, backend, batch_size=100, concurrency=8, **retry_options):
+    """float32 matrix with one embedding per text, in input order"""
+    texts = list(texts)
+    batches = [(start, texts[start:start + batch_size]) for start in range(0, len(texts), batch_size)]
+    results = [None] * len(texts)
+    queue = asyncio.Queue()
+    for batch in batches:
+        queue.put_nowait(batch)
+
+    # A fixed set of workers pulls batches, so at most `concurrency` requests are in flight
+    async def worker():
+        while not queue.empty():
+            start, batch = queue.get_nowait()
+            vectors = await embed_batch_with_retry(backend, batch, **retry_options)
+            if len(vectors) != len(batch):
+                raise ValueError(f"expected {len(batch)} embeddings, got {len(vectors)}")
+            results[start:start + len(batch)] = vectors
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(batches)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
+    if not texts:
+        return np.empty((0, getattr(backend, 'dim', 0)), dtype=np.float32)
+    return np.asarray(results, dtype=np.float32)
+
+
+def run_blocking(coroutine):
+    """
+    asyncio.run(coroutine), also from a thread that already runs an event loop
+    (a Jupyter cell), where the coroutine gets its own loop on a worker thread
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def embed_texts(texts, backend, batch_size=100, concurrency=8, cache=None, **retry_options):
+    """
+    Blocking wrapper around embed_texts_async, consulting `cache` first if
+    given. Safe to call in a notebook; inside a coroutine, prefer awaiting
+    embed_texts_async so the caller's loop is not blocked.
+    """
+    def encode(batch):
+        return run_blocking(embed_texts_async(batch, backend, batch_size, concurrency, **retry_options))
+
+    if cache is None:
+        return encode(texts)
+    if cache.model != backend.model:
+        raise ValueError(f"cache holds {cache.model} embeddings, backend is {backend.model}")
+    return cache.embed(texts, encode)
+
+
+# 3. BENCHMARK ON THE FAKE BACKEND
+def benchmark(records, latency, per_item, batch_size, concurrency, max_in_flight):
+    texts = [f"prompt {i} about the iPhone battery and its response" for i in range(records)]
+    runs = [
+        ("one per row", 1, 1),
+        ("batched", batch_size, 1),
+        ("batched + concurrent", batch_size, concurrency),
+    ]
+    print(f"{records:,} texts, {latency * 1000:.0f} ms per request + {per_item * 1000:.1f} ms per text, "
+          f"server allows {max_in_flight or 'any number of'} requests in flight\n")
+    print(f"{'Mode':<24}{'Requests':>10}{'Throttled':>11}{'Seconds':>10}{'Texts/sec':>12}")
+
+    reference = None
+    for name, size, workers in runs:
+        backend = FakeEmbedder(latency=latency, per_item=per_item, max_in_flight=max_in_flight)
+        start = time.perf_counter()
+        vectors = embed_texts(texts, backend, size, workers, base_delay=latency)
+        seconds = time.perf_counter() - start
+        print(f"{name:<24}{backend.requests:>10,}{backend.throttled:>11,}{seconds:>10.2f}{records / seconds:>12,.0f}")
+        if reference is None:
+            reference = vectors
+        elif not np.array_equal(reference, vectors):
+            raise SystemExit(f"{name} returned different vectors")
+    print("\nAll modes returned identical vectors in input order")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the embedding client on the fake backend")
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds per request")
+    parser.add_argument('--per-item', type=float, default=0.0002, help="extra seconds per text in a request")
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--max-in-flight', type=int, default=6, help="simulated server rate limit")
+    args = parser.parse_args()
+
+    benchmark(args.records, args.latency, args.per_item, args.batch_size, args.concurrency, args.max_in_flight)
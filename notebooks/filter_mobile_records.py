@@ -1,36 +1,169 @@
+"""
+Keep the mobile phone records of the Amazon QA dump.
+
+The gzip file is streamed line by line and matching records are written out as
+they are found, so memory stays flat however big the dump is. Lines are JSON or
+Python dict literals (the format of the original dump), parsed without eval().
+With --workers the decompressed lines are handed to worker processes in blocks
+and the results are written back in input order.
+
+The output format follows the extension: .jsonl (one record per line) or .json
+(a single array, as read by the notebook).
+
+    python notebooks/filter_mobile_records.py --input qa_Cell_Phones_and_Accessories.json.gz --workers 0
+"""
+import argparse
+import ast
 import gzip
 import json
+import os
+import re
+import resource
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-gz_file = "qa_Cell_Phones_and_Accessories.json.gz"
-json_file = "mobile_qa.json"
 
 mobile_keywords = ["phone", "iPhone", "Samsung", "Galaxy", "Pixel", "mobile"]
 
-mobile_data = []
+# One pass over the text for all keywords; the text is lowercased once
+MOBILE_PATTERN = re.compile('|'.join(re.escape(k.lower()) for k in mobile_keywords))
+
+LINES_PER_BLOCK = 20_000
+
+
+def parse_record(line):
+    """Dict for a JSON or Python-literal line, None if it is neither"""
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        # The original dump is written as Python dicts (single quotes, True/None)
+        try:
+            record = ast.literal_eval(line)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            return None
+        if not isinstance(record, dict):
+            return None
+        record = {str(k): v for k, v in record.items()}
+    return record if isinstance(record, dict) else None
 
-with gzip.open(gz_file, 'rt', encoding='utf-8', errors='ignore') as f_in:
-    for line in f_in:
+
+def is_mobile(record):
+    """Any keyword in the question or the answer, ignoring case"""
+    question = record.get('question') or ''
+    answer = record.get('answer') or ''
+    return bool(MOBILE_PATTERN.search(question.lower()) or MOBILE_PATTERN.search(answer.lower()))
+
+
+def filter_lines(lines):
+    """
+    Returns (JSON strings of the matching records, lines read, malformed lines).
+    A keyword can only be in the question or answer if it is somewhere in the
+    raw line, so lines without any are dropped before they are parsed (and are
+    not counted as malformed).
+    """
+    matches = []
+    malformed = 0
+    for line in lines:
         line = line.strip()
-        if not line:
+        if not line or not MOBILE_PATTERN.search(line.lower()):
             continue
-        try:
-            record = json.loads(line)  # try parsing line as JSON
-        except json.JSONDecodeError:
-            # Some files wrap the JSON in a single dict
-            try:
-                record = eval(line)  # fallback: parse Python-style dict safely
-                # convert keys to string if needed
-                record = {str(k): v for k, v in record.items()}
-            except Exception:
-                continue  # skip malformed lines
-        # Filter mobile-related QA
-        question = record.get('question', '')
-        answer = record.get('answer', '')
-        if any(k.lower() in (question + answer).lower() for k in mobile_keywords):
-            mobile_data.append(record)
-
-# Save filtered mobile records
-with open(json_file, 'w', encoding='utf-8') as f_out:
-    json.dump(mobile_data, f_out, indent=2)
-
-print(f"Saved {len(mobile_data)} mobile QA entries to {json_file}")
+        record = parse_record(line)
+        if record is None:
+            malformed += 1
+        elif is_mobile(record):
+            matches.append(json.dumps(record))
+    return matches, len(lines), malformed
+
+
+def read_blocks(path, size):
+    """Lists of at most `size` decompressed lines"""
+    with gzip.open(path, 'rt', encoding='utf-8', errors='ignore') as f_in:
+        block = []
+        for line in f_in:
+            block.append(line)
+            if len(block) >= size:
+                yield block
+                block = []
+        if block:
+            yield block
+
+
+def ordered_map(func, items, workers=1):
+    """
+    Yield func(item) in input order, on a process pool if workers > 1.
+    At most two blocks per worker are in flight so memory stays bounded.
+    """
+    if workers <= 1:
+        yield from map(func, items)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class RecordWriter:
+    """Write JSON record strings as JSON lines or as one JSON array"""
+
+    def __init__(self, path):
+        self.path = path
+        self.as_array = path.endswith('.json')
+        self.count = 0
+        self._file = open(path, 'w', encoding='utf-8')
+        if self.as_array:
+            self._file.write('[')
+
+    def write(self, records):
+        for record in records:
+            if self.as_array:
+                self._file.write(',\n' if self.count else '\n')
+            self._file.write(record)
+            if not self.as_array:
+                self._file.write('\n')
+            self.count += 1
+
+    def close(self):
+        if self.as_array:
+            self._file.write('\n]' if self.count else ']')
+        self._file.close()
+
+
+def filter_file(input_path, output_path, workers=1, block_size=LINES_PER_BLOCK):
+    """Stream `input_path` into `output_path`; returns (lines read, records kept, malformed lines)"""
+    lines_read = 0
+    malformed = 0
+    writer = RecordWriter(output_path)
+    try:
+        results = ordered_map(filter_lines, read_blocks(input_path, block_size), workers)
+        for matches, lines, block_malformed in results:
+            writer.write(matches)
+            lines_read += lines
+            malformed += block_malformed
+    finally:
+        writer.close()
+    return lines_read, writer.count, malformed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the mobile phone records of the Amazon QA dump")
+    parser.add_argument('--input', default="qa_Cell_Phones_and_Accessories.json.gz")
+    parser.add_argument('--output', default="mobile_qa.jsonl", help=".jsonl, or .json for a single array")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="worker processes (0 = one per CPU core, 1 = run in this process)")
+    parser.add_argument('--block-size', type=int, default=LINES_PER_BLOCK, help="lines per worker task")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    workers = args.workers or os.cpu_count() or 1
+    lines_read, kept, malformed = filter_file(args.input, args.output, workers, args.block_size)
+    seconds = time.perf_counter() - start
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Saved {kept} mobile QA entries to {args.output}")
+    print(f"Read {lines_read:,} lines in {seconds:.1f}s ({lines_read / max(seconds, 1e-9):,.0f} lines/sec), "
+          f"skipped {malformed:,} malformed, peak RSS {peak_mb:.0f} MB")
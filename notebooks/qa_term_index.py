@@ -0,0 +1,247 @@
+"""
+Inverted term index over the Amazon QA dump, for repeat keyword filtering.
+
+`build` scans the gzip dump once. It stores every parsed record as a JSON line
+in an uncompressed records file with byte offsets, and maps each term of the
+question and answer to the ids of the records containing it. Posting lists
+are delta + varint encoded into one file, with a term -> (start, end)
+vocabulary next to it.
+
+`query` then resolves a keyword filter against the index and reads only the
+matching records:
+  - plain terms match whole words ("galaxy")
+  - terms with spaces are phrases ("galaxy note")
+  - --substring matches keywords anywhere inside a word, like
+    filter_mobile_records.py ("phone" also finds "iphone", "smartphones")
+  - --mode any|all combines the terms
+
+    python notebooks/qa_term_index.py build --input qa_Cell_Phones_and_Accessories.json.gz --index qa_index
+    python notebooks/qa_term_index.py query --index qa_index phone iPhone Samsung Galaxy Pixel mobile --substring
+"""
+import argparse
+import json
+import mmap
+import os
+import pickle
+import re
+import time
+
+import numpy as np
+
+from filter_mobile_records import LINES_PER_BLOCK, RecordWriter, ordered_map, parse_record, read_blocks
+
+
+# Fields whose text is indexed (the ones the mobile filter looks at)
+INDEXED_FIELDS = ('question', 'answer')
+
+TOKEN = re.compile(r'[^\W_]+')
+
+RECORDS_FILE = 'records.jsonl'
+OFFSETS_FILE = 'offsets.npy'
+POSTINGS_FILE = 'postings.bin'
+VOCAB_FILE = 'vocab.pkl'
+
+
+def tokenize(text):
+    """Lowercase word tokens of a text field"""
+    return TOKEN.findall(text.lower()) if isinstance(text, str) else []
+
+
+# 1. POSTING LIST ENCODING
+def encode_postings(ids):
+    """Varint (LEB128) bytes of the gaps between sorted record ids"""
+    gaps = np.diff(np.asarray(ids, dtype=np.uint64), prepend=np.uint64(0))
+    nbytes = np.ones(len(gaps), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        nbytes += gaps >= np.uint64(1 << shift)
+
+    starts = np.cumsum(nbytes) - nbytes
+    position = np.arange(nbytes.sum()) - np.repeat(starts, nbytes)
+    out = (np.repeat(gaps, nbytes) >> (7 * position).astype(np.uint64)) & np.uint64(0x7F)
+    more = position < np.repeat(nbytes, nbytes) - 1
+    out[more] |= np.uint64(0x80)
+    return out.astype(np.uint8).tobytes()
+
+
+def decode_postings(data):
+    """Sorted record ids back from encode_postings bytes"""
+    data = np.frombuffer(data, dtype=np.uint8)
+    if not len(data):
+        return np.empty(0, dtype=np.int64)
+    last = data < 0x80
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    lengths = np.diff(np.append(starts, len(data)))
+    position = np.arange(len(data)) - np.repeat(starts, lengths)
+    parts = (data & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.cumsum(np.add.reduceat(parts, starts)).astype(np.int64)
+
+
+# 2. BUILD
+def index_lines(lines):
+    """(record JSON, indexed terms) for every parsable line of a block"""
+    results = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        record = parse_record(line)
+        if record is None:
+            continue
+        terms = set()
+        for name in INDEXED_FIELDS:
+            terms.update(tokenize(record.get(name)))
+        results.append((json.dumps(record), terms))
+    return results
+
+
+def build_index(input_path, index_dir, workers=1, block_size=LINES_PER_BLOCK):
+    """Scan the dump once and write the index; returns (records, terms)"""
+    os.makedirs(index_dir, exist_ok=True)
+    postings = {}
+    offsets = [0]
+
+    with open(os.path.join(index_dir, RECORDS_FILE), 'wb') as records_file:
+        for results in ordered_map(index_lines, read_blocks(input_path, block_size), workers):
+            for record_json, terms in results:
+                record_id = len(offsets) - 1
+                data = record_json.encode('utf-8') + b'\n'
+                records_file.write(data)
+                offsets.append(offsets[-1] + len(data))
+                for term in terms:
+                    postings.setdefault(term, []).append(record_id)
+
+    vocab = {}
+    with open(os.path.join(index_dir, POSTINGS_FILE), 'wb') as postings_file:
+        position = 0
+        for term in sorted(postings):
+            data = encode_postings(postings[term])
+            postings_file.write(data)
+            vocab[term] = (position, position + len(data))
+            position += len(data)
+
+    np.save(os.path.join(index_dir, OFFSETS_FILE), np.asarray(offsets, dtype=np.uint64))
+    with open(os.path.join(index_dir, VOCAB_FILE), 'wb') as f:
+        pickle.dump(vocab, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return len(offsets) - 1, len(vocab)
+
+
+# 3. QUERY
+class TermIndex:
+    """Read-only view of an index directory; postings and records are memory-mapped"""
+
+    def __init__(self, index_dir):
+        with open(os.path.join(index_dir, VOCAB_FILE), 'rb') as f:
+            self.vocab = pickle.load(f)
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode='r')
+        self._files = [open(os.path.join(index_dir, name), 'rb') for name in (POSTINGS_FILE, RECORDS_FILE)]
+        self._postings, self._records = (
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+            for f in self._files
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for view in (self._postings, self._records):
+            if isinstance(view, mmap.mmap):
+                view.close()
+        for f in self._files:
+            f.close()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def postings(self, term):
+        """Ids of the records containing `term` as a whole word"""
+        span = self.vocab.get(term)
+        if span is None:
+            return np.empty(0, dtype=np.int64)
+        return decode_postings(self._postings[span[0]:span[1]])
+
+    def substring_postings(self, keyword):
+        """Ids of the records with a word containing `keyword`"""
+        ids = [self.postings(term) for term in self.vocab if keyword in term]
+        return np.unique(np.concatenate(ids)) if ids else np.empty(0, dtype=np.int64)
+
+    def record_json(self, record_id):
+        start, end = int(self.offsets[record_id]), int(self.offsets[record_id + 1])
+        return self._records[start:end].decode('utf-8').rstrip('\n')
+
+    def search(self, keywords, mode='any', substring=False):
+        """
+        Sorted ids of the records matching `keywords`.
+        A keyword of several words is a phrase: its words must be consecutive
+        in the question or the answer, which is checked on the candidate records.
+        """
+        matches = None
+        for keyword in keywords:
+            words = tokenize(keyword)
+            if not words:
+                continue
+            lookup = self.substring_postings if substring else self.postings
+            ids = lookup(words[0])
+            for word in words[1:]:
+                ids = np.intersect1d(ids, lookup(word), assume_unique=True)
+            if len(words) > 1:
+                ids = np.array([i for i in ids if self._has_phrase(i, words, substring)], dtype=np.int64)
+
+            if matches is None:
+                matches = ids
+            elif mode == 'all':
+                matches = np.intersect1d(matches, ids, assume_unique=True)
+            else:
+                matches = np.union1d(matches, ids)
+        return matches if matches is not None else np.empty(0, dtype=np.int64)
+
+    def _has_phrase(self, record_id, words, substring):
+        record = json.loads(self.record_json(record_id))
+        for name in INDEXED_FIELDS:
+            tokens = tokenize(record.get(name))
+            for start in range(len(tokens) - len(words) + 1):
+                window = tokens[start:start + len(words)]
+                if all((w in t) if substring else (w == t) for w, t in zip(words, window)):
+                    return True
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query an inverted term index over the QA dump")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="index the gzip dump (one full scan)")
+    build.add_argument('--input', default="qa_Cell_Phones_and_Accessories.json.gz")
+    build.add_argument('--index', default="qa_index", help="index directory")
+    build.add_argument('--workers', type=int, default=1,
+                       help="worker processes (0 = one per CPU core, 1 = run in this process)")
+
+    query = commands.add_parser('query', help="filter records through the index")
+    query.add_argument('keywords', nargs='+', help="terms, or quoted phrases")
+    query.add_argument('--index', default="qa_index", help="index directory")
+    query.add_argument('--mode', choices=['any', 'all'], default='any')
+    query.add_argument('--substring', action='store_true', help="match keywords inside words")
+    query.add_argument('--output', default=None, help=".jsonl or .json file for the matching records")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        records, terms = build_index(args.input, args.index, args.workers or os.cpu_count() or 1)
+        print(f"Indexed {records:,} records ({terms:,} terms) in {time.perf_counter() - start:.1f}s -> {args.index}")
+    else:
+        start = time.perf_counter()
+        with TermIndex(args.index) as index:
+            load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            ids = index.search(args.keywords, args.mode, args.substring)
+            search_time = time.perf_counter() - start
+            if args.output:
+                writer = RecordWriter(args.output)
+                writer.write(index.record_json(i) for i in ids)
+                writer.close()
+                print(f"Saved {len(ids)} matching QA entries to {args.output}")
+            total = len(index)
+        print(f"{len(ids):,} of {total:,} records match "
+              f"(index load {load_time * 1000:.0f} ms, search {search_time * 1000:.1f} ms)")
@@ -1,46 +1,64 @@
-# generaate embeddings
-from openai import OpenAI
+import argparse
+import time
+
 import pandas as pd
 
-client = OpenAI(api_key="YOUR_API_KEY")
-df = pd.read_csv("apple_prompt_response_1000_realistic.csv")
-
-records = []
-
-for _, row in df.iterrows():
-    text_to_embed = row["prompt"] + " " + row["response"]
-    embedding = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text_to_embed
-    )["data"][0]["embedding"]
-    
-    record = {
-        "id": row["run_id"],        # unique id
-        "vector": embedding,        # embedding vector
-        "metadata": {
-            "prompt_id": row["prompt_id"],
-            "topic": row["topics"],
-            "theme": row["themes"],
-            "region": row["region"],
-            "model": row["model"],
-            "citations": row["citations"]
-        },
-        "text": text_to_embed
-    }
-    records.append(record)
-
-
-# insert embeddings to db 
-from chromadb import Client
-from chromadb.config import Settings
-
-client = Client(Settings(chroma_db_impl="duckdb+parquet", persist_directory="./chroma_db"))
-collection = client.create_collection("apple_prompts")
-
-for rec in records:
-    collection.add(
-        ids=[rec["id"]],
-        embeddings=[rec["vector"]],
-        metadatas=[rec["metadata"]],
-        documents=[rec["text"]]
-    )
+from chroma_loader import DEFAULT_BATCH_SIZE, get_collection, load_batches, max_batch_size
+from embedding_client import DEFAULT_CACHE_DIR, FakeEmbedder, OpenAIEmbedder, embed_texts, open_cache
+
+parser = argparse.ArgumentParser(description="Embed the prompt/response records and load them into Chroma")
+parser.add_argument('--input', default="apple_prompt_response_1000_realistic.csv")
+parser.add_argument('--model', default="text-embedding-3-small")
+parser.add_argument('--batch-size', type=int, default=100, help="texts per embeddings request")
+parser.add_argument('--concurrency', type=int, default=8, help="requests in flight at once")
+parser.add_argument('--fake', action='store_true', help="use deterministic fake embeddings (offline)")
+parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="embedding cache ('' to disable)")
+parser.add_argument('--insert-batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="records per upsert call")
+parser.add_argument('--db', default="./chroma_db", help="persistent Chroma directory")
+parser.add_argument('--collection', default="apple_prompts")
+args = parser.parse_args()
+
+# generaate embeddings
+# All texts go through the batched client: a few concurrent requests of
+# --batch-size inputs each instead of one round trip per row. Texts already in
+# the embedding cache (and repeats of the same text) are not sent at all.
+backend = FakeEmbedder(f"fake-{args.model}") if args.fake else OpenAIEmbedder(args.model)  # reads OPENAI_API_KEY
+df = pd.read_csv(args.input)
+
+# Embedding (producer) and insertion (consumer) overlap: while one batch of
+# --insert-batch-size records is upserted, the next one is being embedded.
+cache = open_cache(args.cache_dir, backend.model)
+
+
+def record_batches(df):
+    for start in range(0, len(df), args.insert_batch_size):
+        chunk = df.iloc[start:start + args.insert_batch_size]
+        texts = (chunk["prompt"] + " " + chunk["response"]).tolist()
+        embeddings = embed_texts(texts, backend, args.batch_size, args.concurrency, cache)
+        yield {
+            "ids": chunk["run_id"].astype(str).tolist(),   # unique id, upserted on reruns
+            "embeddings": embeddings,                        # embedding vectors
+            "metadatas": [
+                {
+                    "prompt_id": row.prompt_id,
+                    "topic": row.topics,
+                    "theme": row.themes,
+                    "region": row.region,
+                    "model": row.model,
+                    "citations": row.citations
+                }
+                for row in chunk.itertuples(index=False)
+            ],
+            "documents": texts,
+        }
+
+
+# insert embeddings to db
+client, collection = get_collection(args.db, args.collection)
+start = time.perf_counter()
+written = load_batches(collection, record_batches(df), max_batch_size(client, args.insert_batch_size))
+seconds = time.perf_counter() - start
+print(f"Upserted {written:,} records into {args.collection} in {seconds:.2f}s "
+      f"({written / max(seconds, 1e-9):,.0f} records/sec); collection holds {collection.count():,}")
+if cache is not None:
+    cache.print_stats()
@@ -0,0 +1,277 @@
+"""
+Column-level engine for product name cleaning and quality scoring.
+
+clean_product_names / validate_product_names are whole-column versions of
+clean_product_name / validate_product_name in Improved_Extract_Product_Names.py.
+The rules are compiled once at import and run with pandas .str operations, and
+the output matches the per-row functions exactly. clean_and_score runs them
+once per distinct (Product Name, Brand Name) pair and broadcasts the results.
+
+Run this file directly to benchmark both implementations:
+    python product_name_engine.py [--input data/Amazon_Cleaned_Data_Lightweight.csv.gz]
+"""
+import argparse
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from unique_apply import factorize_pairs, memo_key, source_fingerprint
+
+
+# 1. CLEANING RULES (same order as clean_product_name)
+QUOTED_PREFIX = re.compile(r'^"[^"]*"\s*')
+
+# First asterisk-separated part that is still longer than 3 chars after strip()
+ASTERISK_PART = re.compile(r'(?:\A|(?<=\*))\s*([^*\s][^*]{2,}[^*\s])\s*(?=\*|\Z)')
+
+PARENTHESES = re.compile(r'\([^)]*\)')
+
+# Word-only rules delete whole runs of word characters, so one pass over their
+# alternation gives the same result as one re.sub per word.
+# "factory.unlocked" can only still match after "unlocked" has been removed when
+# the separator is itself a word character, hence the \w here.
+QUALIFIERS = re.compile(
+    r'\b(?:unlocked|factory\wunlocked|refurbished|used|new|open.box|warranty)\b',
+    re.IGNORECASE,
+)
+UPDATE_TAG = re.compile(r'\b\[update.*?\]\b', re.IGNORECASE)
+
+ANDROID_VERSION = re.compile(r'android\s+\d+\.\d+', re.IGNORECASE)
+SCREEN_SIZE_PREFIX = re.compile(r'^\d+\.?\d*["\']?\s*')
+MEMORY_SPEC = re.compile(r'\b\d+\s*(GB|MB)\s*(RAM|ROM|VRAM)\b', re.IGNORECASE)
+PROCESSOR_SPEC = re.compile(
+    r'\b(?:(?:Quad|Dual|Octa)\s+Core|MTK|Snapdragon|Mediatek|Exynos|Kirin)\b',
+    re.IGNORECASE,
+)
+BATTERY_SPEC = re.compile(r'\d+\s*mAh', re.IGNORECASE)
+
+# Feature descriptors and software keywords run back to back in the per-row
+# function and are all word-run deletions, so they share a single pass.
+FEATURES_AND_NON_PRODUCTS = re.compile(
+    r'\b(?:waterproof|shockproof|rugged|long.standby|dual.sim|single.sim|stand.by'
+    r'|capacitive|touch|screen|display'
+    r'|software|download|recovery|bugged|patch|update|plugin)\b',
+    re.IGNORECASE,
+)
+
+URLS = re.compile(r'https?://\S+|www\.\S+|\.com', re.IGNORECASE)
+SPECIAL_CHARS = re.compile(r'[^\w\s\-]')
+WHITESPACE = re.compile(r'\s+')
+
+CLEANING_RULES = [
+    (PARENTHESES, ' '),
+    (QUALIFIERS, ''),
+    (UPDATE_TAG, ''),
+    (ANDROID_VERSION, ''),
+    (SCREEN_SIZE_PREFIX, ''),
+    (MEMORY_SPEC, ''),
+    (PROCESSOR_SPEC, ''),
+    (BATTERY_SPEC, ''),
+    (FEATURES_AND_NON_PRODUCTS, ''),
+    (URLS, ''),
+    (SPECIAL_CHARS, ' '),
+    (WHITESPACE, ' '),
+]
+
+
+# 2. SCORING RULES (same order as validate_product_name)
+LONG_WORD = re.compile(r'(?<!\S)\S{3,}')
+PRODUCT_INDICATOR = re.compile(
+    r'(?<!\S)(?:phone|mobile|smartphone|model|series|plus|pro|ultra|max|lite|mini)(?!\S)'
+)
+MODEL_CODE = re.compile(r'^[A-Z]\d{4,}$')
+SCREEN_SIZE = re.compile(r'^\d+\.?\d*["\']')
+ANDROID_PREFIX = re.compile(r'^Android', re.IGNORECASE)
+SPEC_KEYWORDS = ['capacitive', 'touchscreen', 'standby', 'waterproof', 'shockproof']
+
+
+def _as_text(values):
+    """Object-dtype copy of a column so every .str call goes through Python re"""
+    return pd.Series(values, copy=False).astype(object)
+
+
+def clean_product_names(names):
+    """
+    Clean a whole column of product names.
+    Returns an object Series aligned with `names`, None where nothing is left.
+    """
+    names = _as_text(names)
+    present = names.notna().to_numpy()
+    text = names[present].reset_index(drop=True).astype(str).astype(object).str.strip()
+
+    text = text.str.replace(QUOTED_PREFIX, '', regex=True)
+
+    # Only rows containing '*' take the first meaningful part
+    has_asterisk = text.str.contains('*', regex=False)
+    first_part = text[has_asterisk].str.extract(ASTERISK_PART, expand=False)
+    first_part = first_part.dropna()
+    text[first_part.index] = first_part
+
+    for pattern, replacement in CLEANING_RULES:
+        text = text.str.replace(pattern, replacement, regex=True)
+
+    text = text.str.strip().str.strip('-').str.strip()
+
+    values = text.to_numpy(dtype=object)
+    values[values == ''] = None
+
+    cleaned = np.full(len(names), None, dtype=object)
+    cleaned[present] = values
+    return pd.Series(cleaned, index=names.index, dtype=object)
+
+
+def validate_product_names(product_names, brand_names):
+    """
+    Score a whole column of cleaned product names (0-100).
+    Missing or empty names score 0, like rows skipped by the per-row loop.
+    """
+    names = _as_text(product_names)
+    brands = _as_text(brand_names)
+    present = (names.notna() & (names != '')).to_numpy()
+
+    text = names[present].reset_index(drop=True)
+    brand = brands[present].reset_index(drop=True)
+    lower = text.str.lower()
+    length = text.str.len().to_numpy()
+
+    score = np.full(len(text), 50, dtype=np.int64)
+    too_short = length < 5
+    score[(length >= 10) & (length <= 80)] += 15
+
+    # Brand name presence
+    brand_lower = brand.astype(str).str.lower()
+    brand_hit = np.fromiter(
+        (b in p for b, p in zip(brand_lower, lower)), dtype=bool, count=len(text)
+    ) & brand.notna().to_numpy()
+    score[brand_hit] += 15
+
+    # Meaningful words and product indicator bonus
+    score += 5 * lower.str.count(PRODUCT_INDICATOR).to_numpy()
+    meaningful = text.str.count(LONG_WORD).to_numpy() >= 2
+    score = np.where(meaningful, score + 10, np.maximum(0, score - 20))
+
+    # Penalties, clamped at 0 after each one
+    no_parens = text.str.replace('(', '', regex=False).str.replace(')', '', regex=False)
+    penalties = [
+        (no_parens.str.match(MODEL_CODE), 30),
+        (no_parens.str.replace(' ', '', regex=False).str.isalnum()
+         & text.str[0].str.isdigit(), 25),
+        (text.str.match(SCREEN_SIZE), 30),
+        (text.str.match(ANDROID_PREFIX), 30),
+    ]
+    penalties += [(lower.str.contains(keyword, regex=False), 10) for keyword in SPEC_KEYWORDS]
+    for hit, penalty in penalties:
+        hit = hit.to_numpy(dtype=bool)
+        score[hit] = np.maximum(0, score[hit] - penalty)
+
+    score = np.clip(score, 0, 100)
+    score[too_short] = 0
+
+    scores = np.zeros(len(names), dtype=np.int64)
+    scores[present] = score
+    return pd.Series(scores, index=names.index)
+
+
+# 3. DEDUPLICATE-THEN-BROADCAST
+# Memo entries are only valid for the rules in this file
+ENGINE_FINGERPRINT = source_fingerprint(sys.modules[__name__])
+
+
+def clean_and_score(names, brands, memo=None):
+    """
+    Clean and score each distinct (name, brand) pair once, reusing results
+    found in `memo`, and broadcast them back to every row.
+    Returns (cleaned names, scores, new memo entries, stats).
+    """
+    codes, unique_names, unique_brands = factorize_pairs(names, brands)
+    keys = [(memo_key(name), memo_key(brand)) for name, brand in zip(unique_names, unique_brands)]
+    memo = memo if memo is not None else {}
+
+    cleaned = np.full(len(keys), None, dtype=object)
+    scores = np.zeros(len(keys), dtype=np.int64)
+    missing = []
+    for i, key in enumerate(keys):
+        if key in memo:
+            cleaned[i], scores[i] = memo[key]
+        else:
+            missing.append(i)
+
+    start = time.perf_counter()
+    new_entries = {}
+    if missing:
+        with stage('clean', items=len(missing)):
+            missing_cleaned = clean_product_names(pd.Series(unique_names[missing], dtype=object))
+        with stage('score', items=len(missing)):
+            missing_scores = validate_product_names(missing_cleaned, pd.Series(unique_brands[missing], dtype=object))
+        cleaned[missing] = missing_cleaned.to_numpy(dtype=object)
+        scores[missing] = missing_scores.to_numpy()
+        new_entries = {keys[i]: (cleaned[i], int(scores[i])) for i in missing}
+
+    stats = {
+        'records': len(codes),
+        'unique': len(keys),
+        'memo_hits': len(keys) - len(missing),
+        'compute_seconds': time.perf_counter() - start,
+    }
+    index = names.index if isinstance(names, pd.Series) else None
+    return (
+        pd.Series(cleaned[codes], index=index, dtype=object),
+        pd.Series(scores[codes], index=index),
+        new_entries,
+        stats,
+    )
+
+
+# 4. BENCHMARK AGAINST THE PER-ROW FUNCTIONS
+def benchmark(input_path, rows=None):
+    from Improved_Extract_Product_Names import clean_product_name, validate_product_name
+
+    df = pd.read_csv(input_path, nrows=rows)
+    print(f"Loaded {len(df):,} rows from {input_path}")
+
+    start = time.perf_counter()
+    row_cleaned = []
+    row_scores = []
+    for _, row in df.iterrows():
+        cleaned = clean_product_name(row['Product Name'])
+        row_cleaned.append(cleaned)
+        row_scores.append(validate_product_name(cleaned, row['Brand Name']) if cleaned else 0)
+    row_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    col_cleaned = clean_product_names(df['Product Name'])
+    col_scores = validate_product_names(col_cleaned, df['Brand Name'])
+    col_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dedup_cleaned, dedup_scores, _, stats = clean_and_score(df['Product Name'], df['Brand Name'])
+    dedup_time = time.perf_counter() - start
+
+    name_mismatches = sum(a != b for a, b in zip(row_cleaned, col_cleaned))
+    name_mismatches += sum(a != b for a, b in zip(row_cleaned, dedup_cleaned))
+    score_mismatches = int((np.asarray(row_scores) != col_scores.to_numpy()).sum())
+    score_mismatches += int((np.asarray(row_scores) != dedup_scores.to_numpy()).sum())
+
+    print(f"\n{'Implementation':<16}{'Seconds':>10}{'Rows/sec':>14}")
+    print(f"{'per-row':<16}{row_time:>10.2f}{len(df) / row_time:>14,.0f}")
+    print(f"{'column engine':<16}{col_time:>10.2f}{len(df) / col_time:>14,.0f}")
+    print(f"{'unique pairs':<16}{dedup_time:>10.2f}{len(df) / dedup_time:>14,.0f}")
+    print(f"\nDistinct pairs:     {stats['unique']:,} ({stats['unique'] / len(df):.2%} of rows)")
+    print(f"Speedup:            {row_time / col_time:.1f}x (column), {row_time / dedup_time:.1f}x (unique pairs)")
+    print(f"Name mismatches:    {name_mismatches:,}")
+    print(f"Score mismatches:   {score_mismatches:,}")
+    return name_mismatches == 0 and score_mismatches == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the column-level product name engine")
+    parser.add_argument('--input', default='data/Amazon_Cleaned_Data_Lightweight.csv.gz')
+    parser.add_argument('--rows', type=int, default=None, help="only read the first N rows")
+    args = parser.parse_args()
+
+    if not benchmark(args.input, args.rows):
+        raise SystemExit("Column engine output differs from the per-row functions")
@@ -0,0 +1,269 @@
+"""
+Per-rule cost and hit-rate profiler for the product name rules.
+
+clean_product_name (Improved_Extract_Product_Names.py) and
+extract_product_name (Extract_Product_Names.py) are ordered lists of re.sub /
+re.match / re.search calls. RuleProfiler runs either function unchanged with
+its module's `re` swapped for a recorder. Every regex call made from the
+function's own body counts as a rule, keyed by source line and pattern, so
+each pattern of a `for qualifier in qualifiers` loop is its own rule. For each
+rule the recorder keeps:
+  - calls, and how many inputs it changed (sub) or matched (match/search)
+  - cumulative time, including the `re` module's pattern cache lookup
+  - the first before/after example
+  - how often it fired together with every other rule on the same input,
+    which points at adjacent rules that could be merged into one pattern
+Time spent outside regex calls (splits, loops, strip) is reported as "other".
+
+The report ranks rules by time, lists dead rules (never fired) and the pairs
+that nearly always fire together.
+
+    python rule_profiler.py --function clean
+    python rule_profiler.py --function extract --all-rows --rows 100000 --output build/extract_rules.json
+"""
+import argparse
+import inspect
+import json
+import re
+import sys
+import time
+from collections import Counter
+from itertools import combinations
+
+
+FUNCTIONS = {
+    'clean': ('Improved_Extract_Product_Names', 'clean_product_name'),
+    'extract': ('Extract_Product_Names', 'extract_product_name'),
+}
+
+# A pair of rules "fires together" when the inputs either rule fired on overlap this much (Jaccard)
+CO_FIRING_SHARE = 0.8
+EXAMPLE_WIDTH = 70
+
+
+# 1. RECORDING
+class RuleRecorder:
+    """Stand-in for the `re` module that times and counts the regex calls of one function"""
+
+    def __init__(self, code, regex=re):
+        self._re = regex
+        self._code = code
+        self.rules = {}
+        self.fired = set()
+
+    def __getattr__(self, name):
+        return getattr(self._re, name)  # flags, escape(), compile()... pass straight through
+
+    def _rule(self, kind, pattern, depth=2):
+        frame = sys._getframe(depth)  # the caller of sub() / match()..., past this method and its wrapper
+        if frame.f_code is not self._code:
+            return None
+        key = (frame.f_lineno, kind, getattr(pattern, 'pattern', pattern))
+        rule = self.rules.get(key)
+        if rule is None:
+            rule = self.rules[key] = {'line': key[0], 'kind': kind, 'pattern': key[2], 'calls': 0, 'fired': 0,
+                                      'seconds': 0.0, 'example': None}
+        return rule
+
+    def _record(self, rule, seconds, fired, before, after):
+        rule['calls'] += 1
+        rule['seconds'] += seconds
+        if fired:
+            rule['fired'] += 1
+            self.fired.add((rule['line'], rule['kind'], rule['pattern']))
+            if rule['example'] is None:
+                rule['example'] = [before, after]
+
+    def sub(self, pattern, repl, string, count=0, flags=0):
+        rule = self._rule('sub', pattern)
+        start = time.perf_counter()
+        result = self._re.sub(pattern, repl, string, count=count, flags=flags)
+        if rule is not None:
+            self._record(rule, time.perf_counter() - start, result != string, string, result)
+        return result
+
+    def _find(self, kind, pattern, string, flags):
+        rule = self._rule(kind, pattern, depth=3)
+        start = time.perf_counter()
+        match = getattr(self._re, kind)(pattern, string, flags)
+        if rule is not None:
+            self._record(rule, time.perf_counter() - start, match is not None, string,
+                         match.group(0) if match is not None else None)
+        return match
+
+    def match(self, pattern, string, flags=0):
+        return self._find('match', pattern, string, flags)
+
+    def search(self, pattern, string, flags=0):
+        return self._find('search', pattern, string, flags)
+
+    def fullmatch(self, pattern, string, flags=0):
+        return self._find('fullmatch', pattern, string, flags)
+
+
+def step_comments(function):
+    """Source line -> the closest comment above it in `function`, which names the step"""
+    lines, first = inspect.getsourcelines(function)
+    steps, comment = {}, None
+    for number, line in enumerate(lines, first):
+        stripped = line.strip()
+        if stripped.startswith('#'):
+            comment = stripped.lstrip('# ').strip()
+        steps[number] = comment
+    return steps
+
+
+class RuleProfiler:
+    """Runs a rule function over many inputs with its regex calls recorded"""
+
+    def __init__(self, module, function_name):
+        self.module = module
+        self.function = getattr(module, function_name)
+        self.recorder = RuleRecorder(self.function.__code__)
+        self.steps = step_comments(self.function)
+        self.inputs = 0
+        self.changed = 0
+        self.seconds = 0.0
+        self.pairs = Counter()
+
+    def run(self, values):
+        """Apply the function to every value; returns the outputs"""
+        outputs = []
+        original = self.module.re
+        self.module.re = self.recorder
+        try:
+            for value in values:
+                self.recorder.fired = set()
+                start = time.perf_counter()
+                output = self.function(value)
+                self.seconds += time.perf_counter() - start
+                self.inputs += 1
+                self.changed += output != value
+                self.pairs.update(combinations(sorted(self.recorder.fired), 2))
+                outputs.append(output)
+        finally:
+            self.module.re = original
+        return outputs
+
+    # 2. REPORT
+    def report(self):
+        """Rules ranked by cumulative time, plus totals and co-firing pairs"""
+        rules = sorted(self.recorder.rules.values(), key=lambda r: -r['seconds'])
+        regex_seconds = sum(rule['seconds'] for rule in rules)
+        for rank, rule in enumerate(rules, 1):
+            rule.update(rank=rank, step=self.steps.get(rule['line']),
+                        hit_rate=rule['fired'] / rule['calls'] if rule['calls'] else 0.0,
+                        time_share=rule['seconds'] / self.seconds if self.seconds else 0.0,
+                        us_per_call=rule['seconds'] / rule['calls'] * 1e6 if rule['calls'] else 0.0)
+
+        fired = {(r['line'], r['kind'], r['pattern']): r for r in rules}
+        together = []
+        for (a, b), count in self.pairs.most_common():
+            share = count / (fired[a]['fired'] + fired[b]['fired'] - count)
+            if share >= CO_FIRING_SHARE:
+                together.append({'rules': [fired[a]['rank'], fired[b]['rank']], 'inputs': count, 'share': share})
+        return {
+            'function': f"{self.module.__name__}.{self.function.__name__}",
+            'inputs': self.inputs,
+            'changed': self.changed,
+            'seconds': self.seconds,
+            'regex_seconds': regex_seconds,
+            'other_seconds': self.seconds - regex_seconds,
+            'rules': rules,
+            'dead_rules': [rule['rank'] for rule in rules if not rule['fired']],
+            'fire_together': together,
+        }
+
+
+def _probe(name):
+    name = re.sub(r'\s+', ' ', name)
+    if re.match(r'^\w', name) and re.search(r'\d', name):
+        return re.fullmatch(r'[\w ]+', name) is not None
+    return False
+
+
+def self_check():
+    """Make sure every kind of regex call is attributed to its caller before trusting a report"""
+    profiler = RuleProfiler(sys.modules[__name__], '_probe')
+    profiler.run(['Galaxy  S3', 'Nokia'])
+    kinds = {rule['kind'] for rule in profiler.recorder.rules.values()}
+    missing = {'sub', 'match', 'search', 'fullmatch'} - kinds
+    if missing:
+        raise RuntimeError(f"RuleRecorder did not record {sorted(missing)} calls")
+
+
+def clip(value, width=EXAMPLE_WIDTH):
+    text = repr(value)
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+def print_report(report, top=None):
+    print(f"{report['function']}: {report['inputs']:,} inputs, {report['changed']:,} changed, "
+          f"{report['seconds']:.2f}s ({report['regex_seconds']:.2f}s in regex rules, "
+          f"{report['other_seconds']:.2f}s other)")
+    print(f"\n{'Rank':>4} {'Line':>5} {'Kind':<7}{'Calls':>10}{'Fired':>10}{'Hit %':>8}{'Total ms':>10}"
+          f"{'Time %':>8}{'us/call':>9}  Step / pattern")
+    for rule in report['rules'][:top]:
+        print(f"{rule['rank']:>4} {rule['line']:>5} {rule['kind']:<7}{rule['calls']:>10,}{rule['fired']:>10,}"
+              f"{rule['hit_rate']:>8.1%}{rule['seconds'] * 1000:>10.1f}{rule['time_share']:>8.1%}"
+              f"{rule['us_per_call']:>9.2f}  {rule['step'] or ''}")
+        print(f"{'':>53}{rule['pattern']}")
+        if rule['example']:
+            before, after = rule['example']
+            print(f"{'':>53}{clip(before)} -> {clip(after)}")
+
+    dead = [rule for rule in report['rules'] if not rule['fired']]
+    print(f"\nDead rules (never fired on these inputs): {len(dead)}")
+    for rule in dead:
+        print(f"  #{rule['rank']:<4} line {rule['line']:<5} {rule['seconds'] * 1000:>8.1f} ms  {rule['pattern']}")
+
+    print(f"\nRules firing together (>= {CO_FIRING_SHARE:.0%} overlap): "
+          f"{len(report['fire_together'])}")
+    rules = {rule['rank']: rule for rule in report['rules']}
+    for pair in report['fire_together'][:20]:
+        a, b = (rules[rank] for rank in pair['rules'])
+        print(f"  #{a['rank']} (line {a['line']}) + #{b['rank']} (line {b['line']}): {pair['inputs']:,} inputs, "
+              f"{pair['share']:.0%}  {a['pattern'][:40]} | {b['pattern'][:40]}")
+
+    cheap_hits = sorted((rule for rule in report['rules'] if rule['fired']),
+                        key=lambda rule: -rule['fired'] / max(rule['seconds'], 1e-9))[:5]
+    print("\nMost hits per ms: " + ', '.join(f"#{rule['rank']} (line {rule['line']})" for rule in cheap_hits))
+
+
+def load_names(path, rows=None, all_rows=False):
+    """Product names to profile: the distinct ones (as the pipeline runs them), or every row"""
+    import pandas as pd
+
+    names = pd.read_csv(path, usecols=['Product Name'], nrows=rows)['Product Name']
+    return names.tolist() if all_rows else names.drop_duplicates().tolist()
+
+
+if __name__ == "__main__":
+    import importlib
+
+    parser = argparse.ArgumentParser(description="Per-rule cost and hit rate of the product name rules")
+    parser.add_argument('--function', choices=list(FUNCTIONS), nargs='+', default=list(FUNCTIONS))
+    parser.add_argument('--input', default='data/Amazon_Cleaned_Data_Lightweight.csv.gz')
+    parser.add_argument('--rows', type=int, default=None, help="only read the first N rows")
+    parser.add_argument('--all-rows', action='store_true',
+                        help="profile every row (default: each distinct name once, as the pipeline does)")
+    parser.add_argument('--top', type=int, default=None, help="only print the N most expensive rules")
+    parser.add_argument('--output', default=None, help="also save the reports as JSON")
+    args = parser.parse_args()
+
+    self_check()
+    names = load_names(args.input, args.rows, args.all_rows)
+    reports = []
+    for key in args.function:
+        module_name, function_name = FUNCTIONS[key]
+        profiler = RuleProfiler(importlib.import_module(module_name), function_name)
+        profiler.run(names)
+        reports.append(profiler.report())
+        print("=" * 100)
+        print_report(reports[-1], args.top)
+        print()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2, default=str)
+        print(f"✅ Report saved to {args.output}")
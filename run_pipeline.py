@@ -0,0 +1,326 @@
+"""
+Incremental runner for the cleaning -> extraction -> indexing scripts.
+
+Every stage declares the files it reads and writes. A stage's fingerprint is a
+hash of its command line, the source of its script and of the local modules it
+imports, and the contents of its input files. A stage is skipped when its
+fingerprint matches the last successful run and its outputs still exist, so
+editing one stage's arguments (e.g. the quality threshold) only reruns that
+stage and the stages that read files it actually changed.
+
+Stages whose inputs are ready run concurrently, each in its own process.
+With --metrics every stage appends its per-step timings, throughput and peak
+memory (see instrumentation.py) to one file, labelled with the stage name.
+
+    python run_pipeline.py                 # everything
+    python run_pipeline.py quality -j 2    # one stage and what it depends on
+    python run_pipeline.py --metrics build/metrics.jsonl --profile cprofile
+    python run_pipeline.py --list
+"""
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = 'build'
+STATE_FILE = os.path.join(BUILD_DIR, '.pipeline_state.json')
+LOG_DIR = os.path.join(BUILD_DIR, 'logs')
+
+HASH_BLOCK_SIZE = 1 << 20
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    args: list = field(default_factory=list)
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+
+    def command(self):
+        return [sys.executable, self.script, *self.args]
+
+
+def build_path(name):
+    return os.path.join(BUILD_DIR, name)
+
+
+# 1. STAGES
+# Intermediates stay in build/ as Parquet so no stage rewrites another's output.
+STAGES = [
+    Stage('clean', 'Data_cleaning.py',
+          ['--input', 'data/Amazon_Unlocked_Mobile.csv', '--output', build_path('Amazon_Cleaned_Data.parquet')],
+          inputs=['data/Amazon_Unlocked_Mobile.csv'],
+          outputs=[build_path('Amazon_Cleaned_Data.parquet')]),
+    Stage('extract', 'Extract_Product_Names.py',
+          ['--input', build_path('Amazon_Cleaned_Data.parquet'), '--output', build_path('Amazon_Product_Data.parquet'),
+           '--names-output', build_path('Extracted_Product_Names.csv')],
+          inputs=[build_path('Amazon_Cleaned_Data.parquet')],
+          outputs=[build_path('Amazon_Product_Data.parquet'), build_path('Extracted_Product_Names.csv')]),
+    Stage('quality', 'Improved_Extract_Product_Names.py',
+          ['--input', build_path('Amazon_Cleaned_Data.parquet'), '--quality-threshold', '60',
+           '--memo', build_path('product_name_memo.pkl'),
+           '--output', build_path('Amazon_Cleaned_Data_Improved.parquet'),
+           '--quality-output', build_path('Product_Quality_Analysis.csv'),
+           '--names-output', build_path('Amazon_Product_name_Cleaned_Data.csv')],
+          inputs=[build_path('Amazon_Cleaned_Data.parquet')],
+          outputs=[build_path('Amazon_Cleaned_Data_Improved.parquet'), build_path('Product_Quality_Analysis.csv'),
+                   build_path('Amazon_Product_name_Cleaned_Data.csv')]),
+    Stage('filter_qa', 'notebooks/filter_mobile_records.py',
+          ['--input', 'qa_Cell_Phones_and_Accessories.json.gz', '--output', build_path('mobile_qa.jsonl')],
+          inputs=['qa_Cell_Phones_and_Accessories.json.gz'],
+          outputs=[build_path('mobile_qa.jsonl')]),
+    Stage('term_index_qa', 'notebooks/qa_term_index.py',
+          ['build', '--input', 'qa_Cell_Phones_and_Accessories.json.gz', '--index', build_path('qa_term_index')],
+          inputs=['qa_Cell_Phones_and_Accessories.json.gz'],
+          outputs=[build_path('qa_term_index')]),
+    Stage('embed_qa', 'scripts/embed_qa.py',
+          ['--input', build_path('mobile_qa.jsonl'), '--records', build_path('qa_records.jsonl'),
+           '--embeddings', build_path('qa_embeddings.npy')],
+          inputs=[build_path('mobile_qa.jsonl')],
+          outputs=[build_path('qa_records.jsonl'), build_path('qa_embeddings.npy')]),
+    Stage('index_qa', 'scripts/build_faiss_index.py',
+          ['--embeddings', build_path('qa_embeddings.npy'), '--output', build_path('qa_index.faiss')],
+          inputs=[build_path('qa_embeddings.npy')],
+          outputs=[build_path('qa_index.faiss')]),
+    Stage('bundle_qa', 'scripts/retrieval_bundle.py',
+          ['build', '--records', build_path('qa_records.jsonl'), '--embeddings', build_path('qa_embeddings.npy'),
+           '--bundle', build_path('qa_bundle')],
+          inputs=[build_path('qa_records.jsonl'), build_path('qa_embeddings.npy')],
+          outputs=[build_path('qa_bundle')]),
+    Stage('vector_db', 'notebooks/vector_db.py',
+          inputs=['apple_prompt_response_1000_realistic.csv'],
+          outputs=['chroma_db']),
+]
+
+
+# 2. FINGERPRINTS
+def local_sources(script):
+    """The script plus every module of this repo it imports, directly or not"""
+    seen = []
+    pending = [script]
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.append(path)
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                for base in (os.path.dirname(path), ROOT):
+                    candidate = os.path.join(base, module.split('.')[0] + '.py')
+                    if os.path.exists(candidate):
+                        pending.append(os.path.relpath(candidate, ROOT))
+                        break
+    return sorted(seen)
+
+
+def file_digest(path, cache):
+    """sha256 of a file (or directory tree), reused while its size and mtime are unchanged"""
+    if os.path.isdir(path):
+        digest = hashlib.sha256()
+        for dir_path, dir_names, file_names in os.walk(path):
+            dir_names.sort()
+            for name in sorted(file_names):
+                full = os.path.join(dir_path, name)
+                digest.update(os.path.relpath(full, path).encode('utf-8'))
+                digest.update(file_digest(full, cache).encode('ascii'))
+        return digest.hexdigest()
+
+    stat = os.stat(path)
+    stamp = [stat.st_size, stat.st_mtime_ns]
+    cached = cache.get(path)
+    if cached and cached['stamp'] == stamp:
+        return cached['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    cache[path] = {'stamp': stamp, 'sha256': digest.hexdigest()}
+    return cache[path]['sha256']
+
+
+def stage_fingerprint(stage, cache):
+    digest = hashlib.sha256()
+    digest.update(json.dumps(stage.command()[1:]).encode('utf-8'))
+    for path in local_sources(stage.script) + stage.inputs:
+        digest.update(os.path.relpath(path, ROOT).encode('utf-8'))
+        digest.update(file_digest(path, cache).encode('ascii'))
+    return digest.hexdigest()
+
+
+# 3. SCHEDULING
+def dependencies(stages):
+    """Names of the stages producing each stage's inputs"""
+    producers = {path: stage.name for stage in stages for path in stage.outputs}
+    return {
+        stage.name: {producers[path] for path in stage.inputs if path in producers}
+        for stage in stages
+    }
+
+
+def select_stages(stages, targets):
+    """The target stages and everything upstream of them, in declaration order"""
+    if not targets:
+        return list(stages)
+    unknown = set(targets) - {stage.name for stage in stages}
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    deps = dependencies(stages)
+    wanted = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(deps[name])
+    return [stage for stage in stages if stage.name in wanted]
+
+
+def run_stage(stage, metrics_env=None):
+    """Run one stage's script, logging its output; returns (return code, seconds)"""
+    log_path = os.path.join(LOG_DIR, stage.name + '.log')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    if metrics_env:
+        env.update(metrics_env, PIPELINE_RUN=stage.name)
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        returncode = subprocess.call(stage.command(), cwd=ROOT, stdout=log, stderr=subprocess.STDOUT, env=env)
+    return returncode, time.perf_counter() - start
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {'stages': {}, 'hashes': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_pipeline(stages, jobs=1, force=(), state_path=STATE_FILE, metrics_env=None):
+    """
+    Run the stages in dependency order, up to `jobs` at a time, with the
+    PIPELINE_* instrumentation variables in `metrics_env`.
+    Returns {stage name: (status, seconds, note)}.
+    """
+    os.makedirs(LOG_DIR, exist_ok=True)
+    state = load_state(state_path)
+    deps = dependencies(stages)
+    results = {}
+    waiting = list(stages)
+    running = {}
+
+    def finished(name):
+        return name in results and results[name][0] in ('ran', 'skipped')
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while waiting or running:
+            for stage in list(waiting):
+                upstream = deps[stage.name]
+                if any(name in results and not finished(name) for name in upstream):
+                    waiting.remove(stage)
+                    results[stage.name] = ('blocked', 0.0, "upstream stage did not finish")
+                    continue
+                if not all(finished(name) for name in upstream):
+                    continue
+                waiting.remove(stage)
+
+                missing = [path for path in stage.inputs if not os.path.exists(path)]
+                if missing:
+                    results[stage.name] = ('blocked', 0.0, f"missing input {missing[0]}")
+                    continue
+
+                fingerprint = stage_fingerprint(stage, state['hashes'])
+                previous = state['stages'].get(stage.name, {})
+                outputs_exist = all(os.path.exists(path) for path in stage.outputs)
+                if stage.name not in force and previous.get('fingerprint') == fingerprint and outputs_exist:
+                    results[stage.name] = ('skipped', 0.0, "unchanged")
+                    continue
+
+                print(f"▶ {stage.name}: {' '.join(stage.command()[1:])}")
+                running[pool.submit(run_stage, stage, metrics_env)] = (stage, fingerprint)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, fingerprint = running.pop(future)
+                returncode, seconds = future.result()
+                log_path = os.path.join(LOG_DIR, stage.name + '.log')
+                if returncode == 0:
+                    results[stage.name] = ('ran', seconds, '')
+                    state['stages'][stage.name] = {'fingerprint': fingerprint, 'seconds': round(seconds, 3)}
+                else:
+                    results[stage.name] = ('failed', seconds, f"exit code {returncode}, see {log_path}")
+                    state['stages'].pop(stage.name, None)
+                save_state(state, state_path)
+                print(f"  {stage.name} {results[stage.name][0]} in {seconds:.1f}s")
+
+    save_state(state, state_path)
+    return results
+
+
+def print_report(stages, results, total_seconds):
+    print(f"\n{'Stage':<16}{'Status':<10}{'Seconds':>9}  Note")
+    for stage in stages:
+        status, seconds, note = results[stage.name]
+        print(f"{stage.name:<16}{status:<10}{seconds:>9.1f}  {note}")
+    print(f"\nWall time: {total_seconds:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline stages whose code or inputs changed")
+    parser.add_argument('targets', nargs='*', help="stages to bring up to date (default: all)")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="stages to run at the same time")
+    parser.add_argument('--force', nargs='*', default=[], help="rerun these stages even if unchanged")
+    parser.add_argument('--list', action='store_true', help="print the stages and exit")
+    parser.add_argument('--metrics', default=None,
+                        help="per-step metrics of every stage: a .jsonl file they all append to, "
+                             "or .prom files named with {run}, e.g. build/metrics/{run}.prom")
+    parser.add_argument('--profile', choices=['cprofile', 'tracemalloc'], default=None,
+                        help="also profile every step, reports in build/profiles")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    if args.list:
+        deps = dependencies(STAGES)
+        for stage in STAGES:
+            after = ', '.join(sorted(deps[stage.name])) or '-'
+            print(f"{stage.name:<16}after: {after:<20}{stage.script}")
+        raise SystemExit(0)
+
+    selected = select_stages(STAGES, args.targets)
+    start = time.perf_counter()
+    metrics_env = {}
+    if args.metrics:
+        metrics_env['PIPELINE_METRICS'] = os.path.abspath(args.metrics)
+    if args.profile:
+        metrics_env.update(PIPELINE_PROFILE=args.profile,
+                           PIPELINE_PROFILE_DIR=os.path.join(ROOT, BUILD_DIR, 'profiles'))
+    results = run_pipeline(selected, args.jobs, set(args.force), metrics_env=metrics_env)
+    print_report(selected, results, time.perf_counter() - start)
+    if any(status == 'failed' for status, _, _ in results.values()):
+        raise SystemExit(1)
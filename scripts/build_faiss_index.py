@@ -0,0 +1,202 @@
+"""
+Build the FAISS vector DB over the QA embeddings (STEP 4 of copy_of_aigurukul.py).
+
+Vectors are L2-normalised so the L2 index ranks by cosine similarity. The index
+type is selectable:
+  - flat:  exact brute-force scan (the notebook's IndexFlatL2)
+  - ivf:   inverted lists over --nlist k-means cells, --nprobe cells searched
+  - ivfpq: IVF with product-quantized vectors (--pq-m codes of --pq-bits bits)
+  - hnsw:  graph index (--hnsw-m links, --ef-construction / --ef-search)
+IVF and PQ are trained on a random sample of --train-size vectors first. The
+search parameters are stored in the index file.
+
+--evaluate holds out --queries vectors and reports recall@k against the flat
+index, p50/p99 single-query latency, build time and index memory for every
+index type and search setting given:
+    python scripts/build_faiss_index.py --embeddings qa_embeddings.npy --evaluate \\
+        --index-type flat ivf ivfpq hnsw --nprobe 1 8 32 --ef-search 16 64 256
+    python scripts/build_faiss_index.py --synthetic 200000 --dim 384 --evaluate --index-type ivf hnsw
+"""
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentation import add_items, from_env, stage  # noqa: E402
+
+
+INDEX_TYPES = ['flat', 'ivf', 'ivfpq', 'hnsw']
+
+
+def default_nlist(count):
+    """About 4 * sqrt(N) cells, the usual starting point for IVF, but never more cells than vectors"""
+    return max(1, min(count, int(4 * np.sqrt(count))))
+
+
+def factory_string(index_type, count, nlist=None, pq_m=16, pq_bits=8, hnsw_m=32):
+    """FAISS factory description; IVF-PQ falls back to IVF-Flat below the 2**pq_bits vectors PQ training needs"""
+    nlist = nlist or default_nlist(count)
+    if index_type == 'ivfpq' and count < 2 ** pq_bits:
+        index_type = 'ivf'
+    return {
+        'flat': "Flat",
+        'ivf': f"IVF{nlist},Flat",
+        'ivfpq': f"IVF{nlist},PQ{pq_m}x{pq_bits}",
+        'hnsw': f"HNSW{hnsw_m},Flat",
+    }[index_type]
+
+
+def normalized(embeddings):
+    """float32 C-contiguous copy with unit-length rows"""
+    embeddings = np.array(embeddings, dtype=np.float32, order='C')
+    faiss.normalize_L2(embeddings)  # normalize for cosine similarity
+    return embeddings
+
+
+def set_search_params(index, nprobe=None, ef_search=None):
+    """Apply the search-time knobs that exist on this index"""
+    params = faiss.ParameterSpace()
+    if nprobe is not None and faiss.try_extract_index_ivf(index) is not None:
+        params.set_index_parameter(index, 'nprobe', nprobe)
+    if ef_search is not None and isinstance(index, faiss.IndexHNSW):
+        params.set_index_parameter(index, 'efSearch', ef_search)
+
+
+def build_index(embeddings, index_type='flat', nlist=None, pq_m=16, pq_bits=8, hnsw_m=32,
+                ef_construction=40, train_size=100_000, seed=0):
+    """Index over already normalised `embeddings`, trained first if the type needs it"""
+    description = factory_string(index_type, len(embeddings), nlist, pq_m, pq_bits, hnsw_m)
+    index = faiss.index_factory(embeddings.shape[1], description, faiss.METRIC_L2)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = ef_construction
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(embeddings), min(len(embeddings), train_size), replace=False)
+        index.train(embeddings[np.sort(sample)])
+    index.add(embeddings)
+    return index
+
+
+# EVALUATION
+def synthetic_embeddings(count, dim, clusters=256, seed=0):
+    """Clustered random vectors, so ANN indexes face a realistic non-uniform distribution"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(clusters, size=count)
+    return centers[labels] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+
+
+def recall_at_k(found, truth):
+    """Share of the exact top-k neighbours that the approximate search returned"""
+    k = truth.shape[1]
+    hits = sum(len(np.intersect1d(f[f >= 0], t)) for f, t in zip(found, truth))
+    return hits / (k * len(truth))
+
+
+def latency_percentiles(index, queries, k):
+    """p50 and p99 milliseconds of one-query searches, on one thread as a serving worker would run them"""
+    times = np.empty(len(queries))
+    threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)
+    try:
+        for i in range(len(queries)):
+            start = time.perf_counter()
+            index.search(queries[i:i + 1], k)
+            times[i] = time.perf_counter() - start
+    finally:
+        faiss.omp_set_num_threads(threads)
+    return np.percentile(times, 50) * 1000, np.percentile(times, 99) * 1000
+
+
+def evaluate(embeddings, index_types, k, query_count, nprobes, ef_searches, **build_options):
+    rng = np.random.default_rng(1)
+    held_out_count = min(query_count, len(embeddings) // 10)  # hold out at most a tenth of the vectors
+    if held_out_count < 1:
+        raise ValueError(f"cannot evaluate on {len(embeddings)} vectors with {query_count} queries: "
+                         "need at least one held-out query, so at least 10 vectors")
+    held_out = np.zeros(len(embeddings), dtype=bool)
+    held_out[rng.choice(len(embeddings), held_out_count, replace=False)] = True
+    base, queries = embeddings[~held_out], embeddings[held_out]
+    print(f"{len(base):,} vectors x {base.shape[1]} dims, {len(queries):,} held-out queries, k={k}")
+
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+
+    print(f"\n{'Index':<24}{'Search':<14}{'Recall@k':>9}{'p50 ms':>9}{'p99 ms':>9}{'Build s':>9}{'Memory MB':>11}")
+    for index_type in index_types:
+        start = time.perf_counter()
+        with stage('index_build', items=len(base)):
+            index = build_index(base, index_type, **build_options)
+        build_seconds = time.perf_counter() - start
+        memory_mb = faiss.serialize_index(index).nbytes / 1e6
+        name = factory_string(index_type, len(base), build_options.get('nlist'), build_options.get('pq_m', 16),
+                              build_options.get('pq_bits', 8), build_options.get('hnsw_m', 32))
+
+        if index_type in ('ivf', 'ivfpq'):
+            settings = [(f"nprobe={n}", {'nprobe': n}) for n in nprobes]
+        elif index_type == 'hnsw':
+            settings = [(f"efSearch={ef}", {'ef_search': ef}) for ef in ef_searches]
+        else:
+            settings = [("exact", {})]
+
+        for label, params in settings:
+            set_search_params(index, **params)
+            with stage('search', items=len(queries)):
+                _, found = index.search(queries, k)
+            p50, p99 = latency_percentiles(index, queries, k)
+            print(f"{name:<24}{label:<14}{recall_at_k(found, truth):>9.3f}{p50:>9.3f}{p99:>9.3f}"
+                  f"{build_seconds:>9.2f}{memory_mb:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a FAISS index from an embedding matrix")
+    parser.add_argument('--embeddings', default='qa_embeddings.npy')
+    parser.add_argument('--output', default='qa_index.faiss')
+    parser.add_argument('--index-type', nargs='+', choices=INDEX_TYPES, default=['flat'],
+                        help="index to build (several with --evaluate)")
+    parser.add_argument('--nlist', type=int, default=None, help="IVF cells (default: 4 * sqrt(N))")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[8], help="IVF cells searched per query")
+    parser.add_argument('--pq-m', type=int, default=16, help="PQ sub-vectors (must divide the dimension)")
+    parser.add_argument('--pq-bits', type=int, default=8)
+    parser.add_argument('--hnsw-m', type=int, default=32)
+    parser.add_argument('--ef-construction', type=int, default=40)
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[64])
+    parser.add_argument('--train-size', type=int, default=100_000, help="vectors sampled to train IVF/PQ")
+    parser.add_argument('--evaluate', action='store_true', help="report recall, latency, build time and memory")
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=1000, help="held-out queries for --evaluate")
+    parser.add_argument('--synthetic', type=int, default=None, help="evaluate on N clustered random vectors")
+    parser.add_argument('--dim', type=int, default=384, help="dimension of --synthetic vectors")
+    args = parser.parse_args()
+
+    build_options = dict(nlist=args.nlist, pq_m=args.pq_m, pq_bits=args.pq_bits, hnsw_m=args.hnsw_m,
+                         ef_construction=args.ef_construction, train_size=args.train_size)
+    from_env('index_qa')  # per-stage metrics when PIPELINE_METRICS is set
+    with stage('load'):
+        if args.synthetic:
+            embeddings = normalized(synthetic_embeddings(args.synthetic, args.dim))
+        else:
+            embeddings = normalized(np.load(args.embeddings))
+    add_items('load', len(embeddings))
+
+    if args.evaluate:
+        try:
+            evaluate(embeddings, args.index_type, args.k, args.queries, args.nprobe, args.ef_search, **build_options)
+        except ValueError as error:
+            raise SystemExit(error)
+    else:
+        if len(args.index_type) > 1:
+            raise SystemExit("Pick one --index-type to build (several are only for --evaluate)")
+        start = time.perf_counter()
+        with stage('index_build', items=len(embeddings)):
+            index = build_index(embeddings, args.index_type[0], **build_options)
+        set_search_params(index, args.nprobe[0], args.ef_search[0])
+        with stage('save', items=index.ntotal):
+            faiss.write_index(index, args.output)
+        print(f"✅ Vector DB size: {index.ntotal} -> {args.output} "
+              f"({args.index_type[0]}, built in {time.perf_counter() - start:.1f}s)")
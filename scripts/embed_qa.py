@@ -0,0 +1,96 @@
+"""
+Embed the filtered mobile QA records (STEP 1-3 of copy_of_aigurukul.py).
+
+Reads the output of notebooks/filter_mobile_records.py, applies the notebook's
+cleaning, and writes the cleaned records as JSON lines next to a float32 .npy
+matrix with one embedding per record, in the same row order. Texts found in the
+shared embedding cache, and repeated answers, are not encoded again.
+
+    python scripts/embed_qa.py --input mobile_qa.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_cache import DEFAULT_CACHE_DIR, open_cache  # noqa: E402
+from instrumentation import add_items, from_env, stage  # noqa: E402
+
+
+# Defaults for the columns the QA dump leaves empty
+FILL_VALUES = {
+    'questionType': "Unknown questionType",
+    'answerTime': "Unknown answerTime",
+    'unixTime': "Unknown unixTime",
+    'answerType': "Unknown answerType",
+    'answer': "No answer generated",
+}
+
+
+def load_qa(path):
+    """DataFrame of the QA records in a JSON lines (.jsonl) or JSON array file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+        return pd.DataFrame(json.load(f))
+
+
+def clean_qa(df):
+    """Fill missing values, drop records without a question or asin and build the text to embed"""
+    df = df.fillna({col: value for col, value in FILL_VALUES.items() if col in df.columns})
+    df = df.dropna(subset=['question', 'asin']).reset_index(drop=True)
+    df['text_for_embedding'] = df['question'] + " " + df['answer']
+    df['text_length'] = df['text_for_embedding'].str.len()
+    return df
+
+
+def embed_texts(texts, model_name, batch_size, cache=None):
+    """float32 embedding matrix, one row per text"""
+    def encode(batch):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        embed_model = SentenceTransformer(model_name, device=device)
+        embeddings = embed_model.encode(batch, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=True)
+        return embeddings.astype(np.float32, copy=False)
+
+    if cache is None:
+        return encode(texts)
+    embeddings = cache.embed(texts, encode)
+    cache.print_stats()
+    return embeddings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean and embed the mobile QA records")
+    parser.add_argument('--input', default='mobile_qa.jsonl')
+    parser.add_argument('--records', default='qa_records.jsonl', help="cleaned records, one JSON object per line")
+    parser.add_argument('--embeddings', default='qa_embeddings.npy')
+    parser.add_argument('--model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help="embedding cache ('' to disable)")
+    args = parser.parse_args()
+    from_env('embed_qa')  # per-stage metrics when PIPELINE_METRICS is set
+
+    with stage('load'):
+        df = load_qa(args.input)
+    add_items('load', len(df))
+    print(f"Loaded {len(df):,} records from {args.input}")
+    with stage('clean', items=len(df)):
+        df = clean_qa(df)
+    print(f"Remaining after cleaning: {len(df):,}")
+
+    cache = open_cache(args.cache_dir, args.model)
+    with stage('embed', items=len(df)):
+        embeddings = embed_texts(df['text_for_embedding'].tolist(), args.model, args.batch_size, cache)
+    print("Embeddings shape:", embeddings.shape)
+
+    with stage('save', items=len(df)):
+        df.to_json(args.records, orient='records', lines=True, force_ascii=False)
+        np.save(args.embeddings, embeddings)
+    print(f"✅ Saved {args.records} and {args.embeddings}")
@@ -1,89 +1,341 @@
+"""
+Synthetic prompt/response corpus generator (data/apple_prompt_response_*.jsonl).
+
+One generator for the JSONL, CSV and Parquet corpora, from the 1,000-record
+samples up to 10M+ records for load tests:
+  - vocabulary cardinality is configurable (--topics, --mentions,
+    --citations, --regions); the first entries are the original Apple
+    topics, devices, sources and regions, extra ones are generated
+  - --text-variants sets how many distinct prompts and responses each topic
+    has (2 responses and 1 prompt per topic reproduce the original samples)
+  - records are generated in chunks of --chunk-size with vectorized NumPy
+    draws and table lookups; chunk i always uses the RNG stream
+    SeedSequence(seed, spawn_key=(i,)), so the corpus depends only on
+    --seed, and never on the shard count or worker count
+  - --shards splits the corpus into files of contiguous chunks that
+    --workers processes write in parallel; every chunk is streamed to its
+    file, so memory stays at one chunk per worker
+
+    python scripts/generate_records.py                                  # 1,000 records, JSONL
+    python scripts/generate_records.py --format csv
+    python scripts/generate_records.py --records 10000000 --format parquet --shards 16 --workers 4 \\
+        --topics 50 --mentions 200 --citations 2000 --regions 30 --text-variants 40
+"""
+import argparse
+import csv
 import json
-from datetime import datetime, timedelta
-import random
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
 
 # Logical mapping of topic → theme
-topic_theme_map = {
+TOPIC_THEMES = {
     "Battery": "Hardware",
     "Charging": "Hardware",
     "Apple Silicon": "Performance",
     "Thermal": "Performance",
-    "Privacy": "Security"
+    "Privacy": "Security",
 }
-
-# Sample topics
-topics = list(topic_theme_map.keys())
-regions = ["United States", "India", "EU", "UK", "Canada"]
-models = ["ChatGPT", "Gemini", "Copilot"]
+REGIONS = ["United States", "India", "EU", "UK", "Canada"]
+MODELS = ["ChatGPT", "Gemini", "Copilot"]
+DEVICES = ["iPhone", "iPad", "MacBook Air", "MacBook Pro", "Apple Watch", "AirPods"]
 
 # Sample citations by topic
-citations_map = {
+CITATIONS = {
     "Battery": ["Apple Support: Battery Guide", "iFixit: iPhone Battery Tips"],
     "Charging": ["Apple Support: Charging Guidelines", "MacRumors: iPhone Charging Issues"],
     "Apple Silicon": ["Apple Developer: M1/M2 Overview", "AnandTech: Apple Silicon Review"],
     "Thermal": ["Apple Support: Device Temperature", "iFixit: iPhone Repair Guides"],
-    "Privacy": ["Apple Privacy Whitepaper", "TechCrunch: iOS Privacy Features"]
+    "Privacy": ["Apple Privacy Whitepaper", "TechCrunch: iOS Privacy Features"],
 }
+SOURCES = ["Apple Support", "iFixit", "MacRumors", "AnandTech", "TechCrunch", "9to5Mac", "The Verge"]
 
 # Sample enriched responses by topic
-response_templates = {
+RESPONSES = {
     "Battery": [
         "Battery may drain faster due to background apps, high screen brightness, or aging battery.",
-        "Battery performance can be impacted by multiple apps running in the background and location services."
+        "Battery performance can be impacted by multiple apps running in the background and location services.",
     ],
     "Charging": [
         "Charging issues can occur due to faulty cables, non-certified adapters, or outdated iOS versions.",
-        "Slow charging may result from high usage while charging or device temperature."
+        "Slow charging may result from high usage while charging or device temperature.",
     ],
     "Apple Silicon": [
         "Apple Silicon improves performance by integrating CPU, GPU, and memory on a single chip.",
-        "Energy efficiency is enhanced in Apple Silicon thanks to optimized cores and unified memory."
+        "Energy efficiency is enhanced in Apple Silicon thanks to optimized cores and unified memory.",
     ],
     "Thermal": [
         "Overheating occurs during heavy CPU/GPU tasks like gaming or video rendering.",
-        "Device temperature rises when using power-intensive apps or high ambient heat."
+        "Device temperature rises when using power-intensive apps or high ambient heat.",
     ],
     "Privacy": [
         "Privacy issues can happen if location services or app tracking are enabled.",
-        "iOS features like App Tracking Transparency help protect user privacy."
-    ]
+        "iOS features like App Tracking Transparency help protect user privacy.",
+    ],
 }
+GENERIC_RESPONSES = [
+    "{topic} issues are usually caused by settings, outdated software, or worn hardware.",
+    "Problems with {topic} can often be traced to background activity or recent updates.",
+]
+RESPONSE_CLAUSES = [
+    "Updating to the latest iOS often helps.",
+    "Restarting the device clears most temporary causes.",
+    "Apple Support can run a diagnostic if it persists.",
+    "Checking Settings for recent changes is a good first step.",
+    "Third-party accessories can make it worse.",
+    "A backup before troubleshooting is recommended.",
+]
+PROMPTS = [
+    "Why does iPhone have issue related to {topic}?",
+    "How can I fix {topic} problems on my iPhone?",
+    "What causes {topic} issues on iPhone?",
+    "Is {topic} a known problem on recent iPhones?",
+    "My iPhone has {topic} trouble, what should I do?",
+    "Any tips for {topic} on iPhone?",
+]
+
+BASE_TIME = np.datetime64('2024-08-01T09:00:00')
+FIELDNAMES = ["run_id", "created_at", "prompt_id", "prompt", "mentions", "prompt_type", "response",
+              "citations", "themes", "topics", "region", "model", "tags"]
+LIST_FIELDS = {"mentions", "citations", "themes", "topics", "tags"}
+FORMATS = {'jsonl': '.jsonl', 'csv': '.csv', 'parquet': '.parquet'}
+
+
+# 1. VOCABULARY
+class Vocabulary:
+    """Names of every dimension, and per-topic text and citation tables, at the requested cardinality"""
+
+    def __init__(self, topics=5, mentions=6, citations=10, regions=5, text_variants=2):
+        base_topics = list(TOPIC_THEMES)
+        themes = list(dict.fromkeys(TOPIC_THEMES.values()))
+        self.topics = (base_topics + [f"Topic {i}" for i in range(len(base_topics), topics)])[:topics]
+        self.themes = [TOPIC_THEMES.get(topic, themes[i % len(themes)]) for i, topic in enumerate(self.topics)]
+        extra_devices = [f"{DEVICES[i % len(DEVICES)]} {i // len(DEVICES) + 1}" for i in range(6, mentions)]
+        self.mentions = ([f"iPhone {12 + i}" for i in range(6)] + extra_devices)[:mentions]
+        self.regions = (REGIONS + [f"Region {i}" for i in range(len(REGIONS), regions)])[:regions]
+        self.models = list(MODELS)
+
+        # Citations: the original two per base topic first, extra ones dealt round-robin over the topics,
+        # then trimmed from the topics with the most until there are exactly `citations` (at least one per topic)
+        if citations < len(self.topics):
+            raise ValueError(f"need at least one citation per topic: {citations} citations for {topics} topics")
+        by_topic = [list(CITATIONS.get(topic, [])) for topic in self.topics]
+        for i in range(max(0, citations - sum(len(c) for c in by_topic))):
+            topic = i % len(self.topics)
+            source, number = SOURCES[i % len(SOURCES)], i // len(self.topics) + 1
+            by_topic[topic].append(f"{source}: {self.topics[topic]} notes #{number}")
+        for topic, names in enumerate(by_topic):
+            if not names:
+                names.append(f"{SOURCES[topic % len(SOURCES)]}: {self.topics[topic]} overview")
+        for _ in range(sum(len(c) for c in by_topic) - citations):
+            max(by_topic, key=len).pop()
+        self.citations, self.citation_offsets = flatten(by_topic)
+
+        # Text: `text_variants` responses per topic (templates, then templates + clauses) and prompts
+        self.responses, self.response_offsets = flatten(
+            [response_variants(topic, text_variants) for topic in self.topics])
+        self.prompts, self.prompt_offsets = flatten(
+            [[PROMPTS[v % len(PROMPTS)].format(topic=topic) + ("" if v < len(PROMPTS) else f" ({v // len(PROMPTS)})")
+              for v in range(max(1, text_variants // 2))] for topic in self.topics])
+        self.tags = [["apple", topic.lower(), theme.lower()] for topic, theme in zip(self.topics, self.themes)]
 
-# Base timestamp
-base_time = datetime(2024, 8, 1, 9, 0, 0)
-
-records = []
-
-for i in range(1, 1001):
-    topic = topics[i % len(topics)]
-    theme = topic_theme_map[topic]
-    region = regions[i % len(regions)]
-    model = models[i % len(models)]
-    mentions = f"iPhone {12 + (i % 6)}"  # iPhone 12–17
-    response = random.choice(response_templates[topic])
-    citation = random.choice(citations_map[topic])
-    
-    record = {
-        "run_id": f"r{i:04}",
-        "created_at": (base_time + timedelta(minutes=i)).isoformat() + "Z",
-        "prompt_id": f"p{i:04}",
-        "prompt": f"Why does iPhone have issue related to {topic}?",
-        "mentions": [mentions],
-        "prompt_type": "open-ended",
-        "response": response,
-        "citations": [citation],
-        "themes": [theme],
-        "topics": [topic],
-        "region": region,
-        "model": model,
-        "tags": ["apple", topic.lower(), theme.lower()]
+
+def flatten(lists):
+    """(object array of all items, int64 offsets of each list)"""
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(items) for items in lists], out=offsets[1:])
+    return np.array([item for items in lists for item in items], dtype=object), offsets
+
+
+def response_variants(topic, count):
+    templates = RESPONSES.get(topic) or [t.format(topic=topic) for t in GENERIC_RESPONSES]
+    variants = []
+    for v in range(count):
+        text = templates[v % len(templates)]
+        extra = v // len(templates)
+        while extra:  # mixed-radix choice of clauses, so every variant is distinct
+            extra -= 1
+            text += " " + RESPONSE_CLAUSES[extra % len(RESPONSE_CLAUSES)]
+            extra //= len(RESPONSE_CLAUSES)
+        variants.append(text)
+    return variants
+
+
+# 2. GENERATION
+def zipf_choice(rng, count, size, skew):
+    """Indices in [0, count) with popularity ~ 1 / rank**skew (uniform when skew is 0)"""
+    weights = 1 / np.arange(1, count + 1) ** skew
+    return rng.choice(count, size=size, p=weights / weights.sum())
+
+
+def within(rng, offsets, groups):
+    """A uniformly drawn index into each group's slice of a flattened per-topic table"""
+    starts, sizes = offsets[groups], offsets[groups + 1] - offsets[groups]
+    return starts + (rng.random(len(groups)) * sizes).astype(np.int64)
+
+
+def generate_chunk(vocab, start, stop, chunk_index, seed, skew, id_width):
+    """Columns of records start+1 .. stop, drawn from the chunk's own RNG stream"""
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(chunk_index,)))
+    size = stop - start
+    numbers = np.arange(start + 1, stop + 1)
+    topics = zipf_choice(rng, len(vocab.topics), size, skew)
+    mentions = zipf_choice(rng, len(vocab.mentions), size, skew)
+    regions = zipf_choice(rng, len(vocab.regions), size, skew)
+    models = rng.integers(len(vocab.models), size=size)
+    citations = within(rng, vocab.citation_offsets, topics)
+    responses = within(rng, vocab.response_offsets, topics)
+    prompts = within(rng, vocab.prompt_offsets, topics)
+
+    topic_names = np.array(vocab.topics, dtype=object)[topics]
+    theme_names = np.array(vocab.themes, dtype=object)[topics]
+    created = np.datetime_as_string(BASE_TIME + numbers.astype('timedelta64[m]'), unit='s')
+    return {
+        "run_id": np.char.mod(f"r%0{id_width}d", numbers).astype(object),
+        "created_at": np.char.add(created, "Z").astype(object),
+        "prompt_id": np.char.mod(f"p%0{id_width}d", numbers).astype(object),
+        "prompt": vocab.prompts[prompts],
+        "mentions": [[m] for m in np.array(vocab.mentions, dtype=object)[mentions]],
+        "prompt_type": np.full(size, "open-ended", dtype=object),
+        "response": vocab.responses[responses],
+        "citations": [[c] for c in vocab.citations[citations]],
+        "themes": [[t] for t in theme_names],
+        "topics": [[t] for t in topic_names],
+        "region": np.array(vocab.regions, dtype=object)[regions],
+        "model": np.array(vocab.models, dtype=object)[models],
+        "tags": [vocab.tags[t] for t in topics],
     }
-    
-    records.append(record)
 
-# Write JSONL file
-with open("apple_prompt_response_1000_realistic.jsonl", "w") as f:
-    for r in records:
-        f.write(json.dumps(r) + "\n")
 
-print("✅ 1,000 realistic records generated in 'apple_prompt_response_1000_realistic.jsonl'")
+# 3. OUTPUT
+class JsonlWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write(self, columns):
+        rows = zip(*(columns[name] for name in FIELDNAMES))
+        self.file.write(''.join(json.dumps(dict(zip(FIELDNAMES, row))) + "\n" for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class CsvWriter:
+    """The generate_csv_records.py layout: list fields joined with commas"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(FIELDNAMES)
+
+    def write(self, columns):
+        flat = [[','.join(v) for v in columns[name]] if isinstance(columns[name], list) else columns[name]
+                for name in FIELDNAMES]
+        self.writer.writerows(zip(*flat))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """One row group per chunk, list fields as list<string>"""
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.table({name: pa.array(list(columns[name]), type=pa.list_(pa.string()) if name in LIST_FIELDS
+                                         else pa.string()) for name in FIELDNAMES})
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:  # no records: still leave a file with the schema, as the other formats do
+            self.write({name: [] for name in FIELDNAMES})
+        self.writer.close()
+
+
+WRITERS = {'jsonl': JsonlWriter, 'csv': CsvWriter, 'parquet': ParquetWriter}
+
+
+def shard_paths(output, shards):
+    if shards == 1:
+        return [output]
+    stem, ext = os.path.splitext(output)
+    return [f"{stem}-{i:05d}-of-{shards:05d}{ext}" for i in range(shards)]
+
+
+def write_shard(path, output_format, vocab_options, chunks, seed, skew, id_width):
+    """Generate and stream the (chunk index, start, stop) chunks of one shard; returns records written"""
+    vocab = Vocabulary(**vocab_options)
+    writer = WRITERS[output_format](path)
+    written = 0
+    try:
+        for chunk_index, start, stop in chunks:
+            writer.write(generate_chunk(vocab, start, stop, chunk_index, seed, skew, id_width))
+            written += stop - start
+    finally:
+        writer.close()
+    return written
+
+
+def generate(output, records=1_000, output_format='jsonl', shards=1, workers=1, chunk_size=100_000,
+             seed=0, skew=0.0, **vocab_options):
+    """Write `records` records to `output` (or its shards); returns the paths written"""
+    chunks = [(i, start, min(start + chunk_size, records)) for i, start in enumerate(range(0, records, chunk_size))]
+    shards = max(1, min(shards, len(chunks)))
+    bounds = np.linspace(0, len(chunks), shards + 1).astype(int)
+    paths = shard_paths(output, shards)
+    id_width = max(4, len(str(records)))
+    jobs = [(path, output_format, vocab_options, chunks[bounds[i]:bounds[i + 1]], seed, skew, id_width)
+            for i, path in enumerate(paths)]
+    if workers > 1 and shards > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(write_shard, *zip(*jobs)))
+    else:
+        for job in jobs:
+            write_shard(*job)
+    return paths
+
+
+def main(default_format='jsonl'):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Apple prompt/response corpus")
+    parser.add_argument('--records', type=int, default=1_000)
+    parser.add_argument('--format', choices=list(FORMATS), default=default_format)
+    parser.add_argument('--output', default=None,
+                        help="output file (default: apple_prompt_response_<records>_realistic.<format>)")
+    parser.add_argument('--shards', type=int, default=1, help="split the corpus into this many files")
+    parser.add_argument('--workers', type=int, default=1, help="processes writing shards in parallel")
+    parser.add_argument('--chunk-size', type=int, default=100_000, help="records generated per RNG stream")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skew', type=float, default=0.0, help="Zipf exponent of topic/mention/region popularity")
+    parser.add_argument('--topics', type=int, default=5)
+    parser.add_argument('--mentions', type=int, default=6)
+    parser.add_argument('--citations', type=int, default=10)
+    parser.add_argument('--regions', type=int, default=5)
+    parser.add_argument('--text-variants', type=int, default=2, help="distinct responses per topic (prompts: half)")
+    args = parser.parse_args()
+    if args.citations < args.topics:
+        parser.error(f"--citations ({args.citations}) must be at least --topics ({args.topics})")
+
+    output = args.output or f"apple_prompt_response_{args.records}_realistic{FORMATS[args.format]}"
+    start = time.perf_counter()
+    paths = generate(output, args.records, args.format, args.shards, args.workers, args.chunk_size, args.seed,
+                     args.skew, topics=args.topics, mentions=args.mentions, citations=args.citations,
+                     regions=args.regions, text_variants=args.text_variants)
+    seconds = time.perf_counter() - start
+    where = f"'{paths[0]}'" if len(paths) == 1 else f"{len(paths)} shards ({paths[0]} ...)"
+    print(f"✅ {args.records:,} realistic records generated in {where} "
+          f"({seconds:.1f}s, {args.records / seconds:,.0f} records/sec)")
+
+
+if __name__ == "__main__":
+    main()
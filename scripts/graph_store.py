@@ -0,0 +1,263 @@
+"""
+Embedded, in-process graph store for the README1.md ontology.
+
+Answers questions like "prompts with Topic=Battery in Region=United States that
+mention iPhone 14" without a Neo4j server:
+  - node names are interned to integer ids per label (Prompt nodes by run_id)
+  - every relationship type (HAS_TOPIC, HAS_THEME, MENTIONS, CITED_IN,
+    IN_REGION, GENERATED_BY) is kept as CSR arrays in both directions:
+    prompt -> targets and target -> prompts, each row a sorted int32 array
+  - filters intersect sorted prompt-id arrays, expansions gather CSR rows
+The store is built straight from the data/ JSONL files and saved as a single
+.npz snapshot (arrays plus UTF-8 string blobs) that reloads without parsing JSON.
+
+    python scripts/graph_store.py build --input data/apple_prompt_response_1000_realistic.jsonl --snapshot graph.npz
+    python scripts/graph_store.py query --snapshot graph.npz --where Topic=Battery "Region=United States"
+    python scripts/graph_store.py benchmark --records 200000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from ingest_graph import RELATIONSHIPS, field_values, load_records, scaled_records
+
+
+LABELS = ['Prompt'] + [label for _, label, _ in RELATIONSHIPS]
+RELATIONSHIP_OF = {label: relationship for relationship, label, _ in RELATIONSHIPS}
+
+
+# 1. STRING PACKING
+def pack_strings(strings):
+    """(uint8 UTF-8 blob, int64 offsets) of a list of strings"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(blob, offsets):
+    data = blob.tobytes()
+    return [data[start:stop].decode('utf-8') for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def csr(sources, targets, rows):
+    """(indptr, indices) with each row's targets sorted and deduplicated"""
+    keys = np.unique(sources.astype(np.int64) << 32 | targets.astype(np.int64))
+    sources, targets = (keys >> 32).astype(np.int32), (keys & 0xFFFFFFFF).astype(np.int32)
+    indptr = np.zeros(rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=rows), out=indptr[1:])
+    return indptr, targets
+
+
+# 2. STORE
+class GraphStore:
+    """Interned node names, prompt properties and two-way CSR adjacency per relationship"""
+
+    def __init__(self, names, properties, forward, reverse):
+        self.names = names            # label -> list of names, index = node id
+        self.properties = properties  # JSON of each Prompt node's properties
+        self.forward = forward        # relationship -> (indptr, target ids) by prompt id
+        self.reverse = reverse        # relationship -> (indptr, prompt ids) by target id
+        self.ids = {label: {name: i for i, name in enumerate(values)} for label, values in names.items()}
+
+    @classmethod
+    def from_records(cls, records):
+        names = {label: [] for label in LABELS}
+        ids = {label: {} for label in LABELS}
+
+        def intern(label, name):
+            node = ids[label].get(name)
+            if node is None:
+                node = ids[label][name] = len(names[label])
+                names[label].append(name)
+            return node
+
+        properties = []
+        edges = {relationship: ([], []) for relationship, _, _ in RELATIONSHIPS}
+        for record in records:
+            prompt = intern('Prompt', record['run_id'])
+            if prompt == len(properties):
+                properties.append(None)
+            properties[prompt] = json.dumps({key: value for key, value in record.items() if key != 'run_id'})
+            for relationship, label, field in RELATIONSHIPS:
+                sources, targets = edges[relationship]
+                for name in field_values(record, field):
+                    sources.append(prompt)
+                    targets.append(intern(label, name))
+
+        forward, reverse = {}, {}
+        for relationship, label, _ in RELATIONSHIPS:
+            sources, targets = (np.asarray(values, dtype=np.int32) for values in edges[relationship])
+            forward[relationship] = csr(sources, targets, len(names['Prompt']))
+            reverse[relationship] = csr(targets, sources, len(names[label]))
+        return cls(names, properties, forward, reverse)
+
+    @classmethod
+    def from_jsonl(cls, paths):
+        records = []
+        for path in ([paths] if isinstance(paths, str) else paths):
+            records.extend(load_records(path))
+        return cls.from_records(records)
+
+    def save(self, path):
+        """Write the store to one uncompressed .npz snapshot"""
+        arrays = {}
+        for label, values in self.names.items():
+            arrays[f'names/{label}'], arrays[f'names/{label}/offsets'] = pack_strings(values)
+        arrays['properties'], arrays['properties/offsets'] = pack_strings(self.properties)
+        for direction, adjacency in (('forward', self.forward), ('reverse', self.reverse)):
+            for relationship, (indptr, indices) in adjacency.items():
+                arrays[f'{direction}/{relationship}/indptr'] = indptr
+                arrays[f'{direction}/{relationship}/indices'] = indices
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as snapshot:
+            names = {label: unpack_strings(snapshot[f'names/{label}'], snapshot[f'names/{label}/offsets'])
+                     for label in LABELS}
+            properties = unpack_strings(snapshot['properties'], snapshot['properties/offsets'])
+            forward = {relationship: (snapshot[f'forward/{relationship}/indptr'],
+                                      snapshot[f'forward/{relationship}/indices'])
+                       for relationship, _, _ in RELATIONSHIPS}
+            reverse = {relationship: (snapshot[f'reverse/{relationship}/indptr'],
+                                      snapshot[f'reverse/{relationship}/indices'])
+                       for relationship, _, _ in RELATIONSHIPS}
+        return cls(names, properties, forward, reverse)
+
+    # Queries
+    def count(self, label):
+        return len(self.names[label])
+
+    def prompts_with(self, label, names):
+        """Sorted ids of the prompts linked to any of `names` (one name or a list) of `label`"""
+        indptr, indices = self.reverse[RELATIONSHIP_OF[label]]
+        rows = [indices[indptr[node]:indptr[node + 1]]
+                for node in (self.ids[label].get(name) for name in ([names] if isinstance(names, str) else names))
+                if node is not None]
+        if len(rows) == 1:
+            return rows[0]
+        return np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int32)
+
+    def match(self, where):
+        """
+        Sorted prompt ids matching every {label: name or [names]} condition,
+        intersecting the shortest posting arrays first
+        """
+        rows = sorted((self.prompts_with(label, names) for label, names in where.items()), key=len)
+        if not rows:
+            return np.arange(self.count('Prompt'), dtype=np.int32)
+        result = rows[0]
+        for row in rows[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, row, assume_unique=True)
+        return result
+
+    def neighbors(self, prompt_ids, label):
+        """Sorted ids of the `label` nodes linked to any of `prompt_ids`"""
+        indptr, indices = self.forward[RELATIONSHIP_OF[label]]
+        prompt_ids = np.asarray(prompt_ids, dtype=np.int64)
+        if not len(prompt_ids):
+            return np.empty(0, dtype=np.int32)
+        starts, stops = indptr[prompt_ids], indptr[prompt_ids + 1]
+        lengths = stops - starts
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.unique(indices[positions])
+
+    def expand(self, label, name, to_label):
+        """Names of the `to_label` nodes sharing a prompt with `name`, e.g. Topics of a Mention"""
+        return [self.names[to_label][i] for i in self.neighbors(self.prompts_with(label, name), to_label)]
+
+    def prompt(self, prompt_id):
+        """Properties of one Prompt node, with its run_id"""
+        return {'run_id': self.names['Prompt'][prompt_id], **json.loads(self.properties[prompt_id])}
+
+
+# 3. BENCHMARK
+def scan(records, where):
+    """The per-record Python filter the graph store replaces"""
+    fields = {label: field for _, label, field in RELATIONSHIPS}
+    return [record for record in records
+            if all(set(field_values(record, fields[label])) & ({names} if isinstance(names, str) else set(names))
+                   for label, names in where.items())]
+
+
+def benchmark(records, snapshot_path, repeats):
+    start = time.perf_counter()
+    store = GraphStore.from_records(records)
+    build_seconds = time.perf_counter() - start
+    store.save(snapshot_path)
+    start = time.perf_counter()
+    store = GraphStore.load(snapshot_path)
+    load_seconds = time.perf_counter() - start
+    print(f"{store.count('Prompt'):,} prompts: built in {build_seconds:.2f}s, snapshot reloaded in {load_seconds:.2f}s")
+
+    first = store.prompt(0)
+    queries = [
+        {'Topic': first['topics'][0]},
+        {'Topic': first['topics'][0], 'Region': first['region']},
+        {'Topic': first['topics'][0], 'Region': first['region'], 'Mention': first['mentions'][0]},
+    ]
+    print(f"\n{'Query':<60}{'Matches':>9}{'Scan ms':>10}{'Graph ms':>10}")
+    for where in queries:
+        start = time.perf_counter()
+        expected = scan(records, where)
+        scan_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for _ in range(repeats):
+            found = store.match(where)
+        graph_ms = (time.perf_counter() - start) / repeats * 1000
+        if len(found) != len(expected):
+            raise SystemExit(f"{where}: graph store found {len(found)} prompts, scan {len(expected)}")
+        label = ' & '.join(f"{key}={value}" for key, value in where.items())
+        print(f"{label:<60}{len(found):>9,}{scan_ms:>10.2f}{graph_ms:>10.3f}")
+
+    start = time.perf_counter()
+    topics = store.expand('Mention', first['mentions'][0], 'Topic')
+    print(f"\nTopics of {first['mentions'][0]}: {', '.join(topics)} ({(time.perf_counter() - start) * 1000:.2f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedded graph store for the prompt ontology")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="load JSONL records and write a snapshot")
+    build.add_argument('--input', nargs='+', default=['data/apple_prompt_response_1000_realistic.jsonl'])
+    build.add_argument('--snapshot', default='graph.npz')
+
+    query = commands.add_parser('query', help="prompts matching Label=name conditions")
+    query.add_argument('--snapshot', default='graph.npz')
+    query.add_argument('--where', nargs='+', default=[], help="conditions such as Topic=Battery")
+    query.add_argument('--limit', type=int, default=10)
+
+    bench = commands.add_parser('benchmark', help="build, reload and query timings against a record scan")
+    bench.add_argument('--input', default='data/apple_prompt_response_1000_realistic.jsonl')
+    bench.add_argument('--records', type=int, default=200_000, help="cycle the input up to N records")
+    bench.add_argument('--snapshot', default='graph_bench.npz')
+    bench.add_argument('--repeats', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        store = GraphStore.from_jsonl(args.input)
+        store.save(args.snapshot)
+        counts = ', '.join(f"{store.count(label):,} {label}" for label in LABELS)
+        print(f"✅ Saved graph ({counts}) to {args.snapshot}")
+    elif args.command == 'query':
+        store = GraphStore.load(args.snapshot)
+        where = {}
+        for condition in args.where:
+            label, name = condition.split('=', 1)
+            if label not in RELATIONSHIP_OF:
+                raise SystemExit(f"Unknown label {label!r}; use one of {', '.join(RELATIONSHIP_OF)}")
+            where.setdefault(label, []).append(name)
+        matches = store.match(where)
+        print(f"{len(matches):,} prompts match")
+        for prompt_id in matches[:args.limit]:
+            record = store.prompt(prompt_id)
+            print(f"  {record['run_id']}: {record.get('prompt', '')}")
+    else:
+        benchmark(scaled_records(load_records(args.input), args.records), args.snapshot, args.repeats)
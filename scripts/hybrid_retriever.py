@@ -0,0 +1,231 @@
+"""
+Graph-expanded hybrid retrieval over a retrieval bundle and the prompt graph.
+
+retrieve_top_k in copy_of_aigurukul.py returns the nearest vectors only.
+HybridRetriever starts from the same vector top-k (the seeds). It then follows
+each seed's Mention / Citation / Topic edges to the other prompts linked to
+those entities, and ranks seeds and expanded candidates together:
+    score = alpha * cosine(query, candidate) + (1 - alpha) * graph proximity
+Graph proximity sums seed similarity * label weight * idf(entity) over the
+entities a candidate shares with the seeds, scaled to [0, 1].
+
+The per-entity prompt lists are precomputed from the graph's reverse CSR
+arrays, mapped to bundle row ids and capped at `max_fanout` rows; the cap
+limits which candidates are considered, not how they are scored. Entities
+linked to more than `max_degree` prompts (hubs such as a Region) are skipped.
+`budget_ms` stops expanding further seeds once the query has spent that long,
+so a slow query degrades towards plain vector results.
+
+Bundle rows and graph prompts are matched on run_id.
+Run this file directly to measure the added cost per query:
+    python scripts/hybrid_retriever.py --records 50000 --fanout 16 64 256
+"""
+import argparse
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from graph_store import RELATIONSHIP_OF, GraphStore
+from numpy_vector_store import normalize_rows
+
+
+EXPANSION_WEIGHTS = {'Mention': 1.0, 'Citation': 0.8, 'Topic': 0.5}
+
+
+class HybridRetriever:
+    """Vector top-k seeds re-ranked together with their graph neighbours"""
+
+    def __init__(self, bundle, graph, weights=None, alpha=0.7, seed_k=None, max_fanout=64,
+                 max_degree=None, budget_ms=None):
+        self.bundle = bundle
+        self.graph = graph
+        self.weights = dict(weights or EXPANSION_WEIGHTS)
+        self.alpha = alpha
+        self.seed_k = seed_k
+        self.budget_ms = budget_ms
+
+        run_ids = bundle.metadata.column('run_id').to_pylist()
+        prompt_ids = graph.ids['Prompt']
+        self.prompt_of_row = np.array([prompt_ids.get(run_id, -1) for run_id in run_ids], dtype=np.int64)
+        self.row_of_prompt = np.full(graph.count('Prompt'), -1, dtype=np.int64)
+        linked = self.prompt_of_row >= 0
+        self.row_of_prompt[self.prompt_of_row[linked]] = np.flatnonzero(linked)
+        self.entity_rows = {label: self._entity_rows(label, max_fanout, max_degree) for label in self.weights}
+
+    def _entity_rows(self, label, max_fanout, max_degree):
+        """(indptr, bundle rows, idf) per entity of `label`, each list capped at max_fanout rows"""
+        indptr, prompts = self.graph.reverse[RELATIONSHIP_OF[label]]
+        degrees = np.diff(indptr)
+        idf = np.log(max(len(self.row_of_prompt), 1) / np.maximum(degrees, 1)).astype(np.float32)
+        rows, lengths = [], []
+        for entity, degree in enumerate(degrees):
+            if max_degree is not None and degree > max_degree:
+                lengths.append(0)
+                continue
+            entity_rows = self.row_of_prompt[prompts[indptr[entity]:indptr[entity + 1]]]
+            entity_rows = entity_rows[entity_rows >= 0]
+            if len(entity_rows) > max_fanout:
+                # An even spread over the list rather than its first (oldest) prompts
+                entity_rows = entity_rows[np.linspace(0, len(entity_rows) - 1, max_fanout).astype(np.int64)]
+            rows.append(entity_rows)
+            lengths.append(len(entity_rows))
+        entity_indptr = np.zeros(len(degrees) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=entity_indptr[1:])
+        return entity_indptr, np.concatenate(rows) if rows else np.empty(0, dtype=np.int64), idf
+
+    def _graph_scores(self, candidates, entity_weights):
+        """Sum of the seed entity weights over every entity each candidate links to"""
+        prompts = self.prompt_of_row[candidates]
+        scores = np.zeros(len(candidates))
+        linked = np.flatnonzero(prompts >= 0)
+        for label, weights in entity_weights.items():
+            indptr, entities = self.graph.forward[RELATIONSHIP_OF[label]]
+            starts, lengths = indptr[prompts[linked]], np.diff(indptr)[prompts[linked]]
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            scores += np.bincount(np.repeat(linked, lengths), weights=weights[entities[positions]],
+                                  minlength=len(candidates))
+        return scores
+
+    def search(self, query_vector, k=5, budget_ms=None):
+        """
+        (row ids, scores, info) of the k best candidates; scores hold
+        'score', 'vector' (cosine) and 'graph' arrays aligned with the rows.
+        """
+        start = time.perf_counter()
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        query = normalize_rows(query_vector)
+        distances, seed_rows = self.bundle.search(query, self.seed_k or k)
+        found = seed_rows[0] >= 0
+        seeds, seed_similarity = seed_rows[0][found], 1 - distances[0][found] / 2
+
+        # Weight of each entity linked to the seeds, then the candidates those entities reach
+        entity_weights = {label: np.zeros(len(self.entity_rows[label][0]) - 1) for label in self.weights}
+        parts = [seeds]
+        expanded = 0
+        for seed, similarity in zip(seeds, seed_similarity):
+            if budget_ms is not None and (time.perf_counter() - start) * 1000 > budget_ms:
+                break
+            prompt = self.prompt_of_row[seed]
+            if prompt < 0:
+                continue
+            for label, weight in self.weights.items():
+                indptr, entities = self.graph.forward[RELATIONSHIP_OF[label]]
+                entity_indptr, entity_rows, idf = self.entity_rows[label]
+                for entity in entities[indptr[prompt]:indptr[prompt + 1]]:
+                    entity_weights[label][entity] += similarity * weight * idf[entity]
+                    parts.append(entity_rows[entity_indptr[entity]:entity_indptr[entity + 1]])
+            expanded += 1
+
+        candidates = np.unique(np.concatenate(parts))
+        graph_scores = self._graph_scores(candidates, entity_weights)
+        if graph_scores.max(initial=0) > 0:
+            graph_scores /= graph_scores.max()
+        vector_scores = np.asarray(self.bundle.embeddings[candidates], dtype=np.float32) @ query[0]
+        scores = self.alpha * vector_scores + (1 - self.alpha) * graph_scores
+
+        top = np.argsort(-scores)[:k]
+        info = {'seeds': len(seeds), 'expanded_seeds': expanded, 'candidates': len(candidates),
+                'ms': (time.perf_counter() - start) * 1000}
+        return candidates[top], {'score': scores[top], 'vector': vector_scores[top], 'graph': graph_scores[top]}, info
+
+    def retrieve_top_k(self, query_vector, k=5, columns=None, budget_ms=None):
+        """RetrievalBundle.retrieve_top_k results, with 'score' and 'graph_score' added"""
+        rows, scores, _ = self.search(query_vector, k, budget_ms)
+        results = self.bundle.rows(rows, columns)
+        for result, row_id, score, vector, graph in zip(results, rows, scores['score'], scores['vector'],
+                                                        scores['graph']):
+            result['row_id'] = int(row_id)
+            result['distance'] = float(2 - 2 * vector)
+            result['score'] = float(score)
+            result['graph_score'] = float(graph)
+        return results
+
+
+# BENCHMARK
+def topical_embeddings(records, dim, seed=0):
+    """Vectors built from per-topic, per-mention and per-citation directions plus noise"""
+    rng = np.random.default_rng(seed)
+    directions = {}
+
+    def direction(key):
+        if key not in directions:
+            directions[key] = rng.standard_normal(dim).astype(np.float32)
+        return directions[key]
+
+    embeddings = rng.standard_normal((len(records), dim)).astype(np.float32)
+    for i, record in enumerate(records):
+        for field, weight in (('topics', 1.0), ('mentions', 0.7), ('citations', 0.5)):
+            for name in record.get(field) or []:
+                embeddings[i] += weight * direction((field, name))
+    return embeddings
+
+
+def benchmark(records, dim, k, query_count, fanouts, budgets, index_type):
+    import pandas as pd
+
+    from retrieval_bundle import load_bundle, save_bundle
+
+    embeddings = topical_embeddings(records, dim)
+    bundle_dir = tempfile.mkdtemp(prefix='hybrid_bench_')
+    try:
+        save_bundle(bundle_dir, embeddings, pd.DataFrame(records), 'synthetic', index_type)
+        bundle = load_bundle(bundle_dir)
+        graph = GraphStore.from_records(records)
+        rng = np.random.default_rng(5)
+        queries = embeddings[rng.choice(len(records), query_count, replace=False)]
+        queries = queries + 0.5 * rng.standard_normal(queries.shape).astype(np.float32)
+        print(f"{len(records):,} records x {dim} dims ({index_type} bundle), {query_count} queries, k={k}")
+
+        vector_times = []
+        for query in queries:
+            start = time.perf_counter()
+            bundle.search(query, k)
+            vector_times.append((time.perf_counter() - start) * 1000)
+        base_p50 = np.percentile(vector_times, 50)
+        print(f"\n{'Retriever':<30}{'Candidates':>11}{'Expanded':>10}{'From graph':>11}"
+              f"{'p50 ms':>9}{'p99 ms':>9}{'Added ms':>10}")
+        print(f"{'vector top-k':<30}{k:>11}{0:>10}{0:>11.2f}{base_p50:>9.3f}"
+              f"{np.percentile(vector_times, 99):>9.3f}{0:>10.3f}")
+
+        for fanout in fanouts:
+            for budget in budgets:
+                start = time.perf_counter()
+                retriever = HybridRetriever(bundle, graph, max_fanout=fanout, budget_ms=budget)
+                setup = time.perf_counter() - start
+                times, candidates, expanded, from_graph = [], [], [], []
+                for query in queries:
+                    _, seed_rows = bundle.search(query, k)
+                    rows, _, info = retriever.search(query, k)
+                    times.append(info['ms'])
+                    candidates.append(info['candidates'])
+                    expanded.append(info['expanded_seeds'])
+                    from_graph.append(len(np.setdiff1d(rows, seed_rows[0])))
+                label = f"hybrid fanout={fanout}" + (f" budget={budget}ms" if budget is not None else "")
+                p50 = np.percentile(times, 50)
+                print(f"{label:<30}{np.mean(candidates):>11.0f}{np.mean(expanded):>10.1f}"
+                      f"{np.mean(from_graph):>11.2f}{p50:>9.3f}{np.percentile(times, 99):>9.3f}"
+                      f"{p50 - base_p50:>10.3f}   (lists built in {setup:.2f}s)")
+        bundle.close()
+    finally:
+        shutil.rmtree(bundle_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    from ingest_graph import load_records, scaled_records
+
+    parser = argparse.ArgumentParser(description="Benchmark graph-expanded hybrid retrieval")
+    parser.add_argument('--input', default='data/apple_prompt_response_1000.jsonl')
+    parser.add_argument('--records', type=int, default=50_000, help="cycle the input up to N records")
+    parser.add_argument('--dim', type=int, default=128)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--fanout', type=int, nargs='+', default=[16, 64, 256], help="max rows per entity")
+    parser.add_argument('--budget-ms', type=float, nargs='+', default=[None, 0.3],
+                        help="latency budgets to compare (omit for unbounded)")
+    parser.add_argument('--index-type', default='flat')
+    args = parser.parse_args()
+
+    benchmark(scaled_records(load_records(args.input), args.records), args.dim, args.k, args.queries,
+              args.fanout, args.budget_ms, args.index_type)
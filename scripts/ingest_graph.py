@@ -0,0 +1,342 @@
+"""
+Batched Neo4j ingestion of the prompt records (README1.md Step 4).
+
+The README loop runs one create_graph transaction per record. Here the graph is
+written in a few large statements instead:
+  1. uniqueness constraints on Prompt.id and on the name of every metadata label
+  2. the small dimensions (Region, Model, Topic, Theme) merged once, up front
+  3. batches of --batch-size records, one transaction each: a
+     `UNWIND $rows` MERGE of the Prompt nodes, then one `UNWIND $pairs`
+     statement per relationship type
+Batches are spread over --workers sessions. Workers only MATCH the pre-merged
+hot nodes, and each batch's pairs are sorted by target name. Every transaction
+therefore locks shared nodes in the same order, so workers queue on a hot node
+instead of deadlocking. Transient errors are retried by execute_write.
+
+RecordingDriver is a stand-in with the driver's session/execute_write/run API.
+It records every statement and keeps the resulting graph in memory, so the
+ingestion can be checked and timed without a server (needs neo4j>=5 otherwise):
+    python scripts/ingest_graph.py --input data/apple_prompt_response_1000_realistic.jsonl --password secret
+    python scripts/ingest_graph.py --fake --benchmark --records 20000
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+
+# README1.md ontology: (relationship, target label, record field)
+RELATIONSHIPS = [
+    ('HAS_TOPIC', 'Topic', 'topics'),
+    ('HAS_THEME', 'Theme', 'themes'),
+    ('MENTIONS', 'Mention', 'mentions'),
+    ('CITED_IN', 'Citation', 'citations'),
+    ('IN_REGION', 'Region', 'region'),
+    ('GENERATED_BY', 'Model', 'model'),
+]
+PREMERGED_LABELS = ('Region', 'Model', 'Topic', 'Theme')
+PROMPT_PROPERTIES = ('prompt_id', 'prompt', 'response', 'prompt_type', 'created_at', 'tags', 'embedding')
+
+CONSTRAINT_QUERY = "CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:{label}) REQUIRE n.{key} IS UNIQUE"
+PREMERGE_QUERY = "UNWIND $names AS name MERGE (:{label} {{name: name}})"
+PROMPT_QUERY = "UNWIND $rows AS row MERGE (p:Prompt {id: row.id}) SET p += row.props"
+RELATIONSHIP_QUERY = ("UNWIND $pairs AS pair MATCH (p:Prompt {{id: pair[0]}}) "
+                      "{target} (n:{label} {{name: pair[1]}}) MERGE (p)-[:{relationship}]->(n)")
+
+
+def relationship_query(relationship, label):
+    target = 'MATCH' if label in PREMERGED_LABELS else 'MERGE'
+    return RELATIONSHIP_QUERY.format(target=target, label=label, relationship=relationship)
+
+
+# 1. RECORDS
+def load_records(path):
+    """Records of a JSONL file (blank lines, as in data/data.json, are skipped)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def field_values(record, field):
+    """A record field as a list of names (scalars become one-item lists, missing values none)"""
+    value = record.get(field)
+    if value is None or value == "":
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def prompt_rows(records):
+    return [{'id': record['run_id'],
+             'props': {key: record[key] for key in PROMPT_PROPERTIES if record.get(key) is not None}}
+            for record in records]
+
+
+def relationship_pairs(records, field):
+    """[run_id, name] pairs sorted by name, so every batch locks target nodes in the same order"""
+    pairs = {(name, record['run_id']) for record in records for name in field_values(record, field)}
+    return [[run_id, name] for name, run_id in sorted(pairs)]
+
+
+# 2. INGESTION
+def add_counters(totals, result):
+    counters = result.consume().counters
+    totals['nodes'] += counters.nodes_created
+    totals['relationships'] += counters.relationships_created
+
+
+def create_constraints(session):
+    session.run(CONSTRAINT_QUERY.format(name='prompt_id', label='Prompt', key='id')).consume()
+    for _, label, _ in RELATIONSHIPS:
+        session.run(CONSTRAINT_QUERY.format(name=f'{label.lower()}_name', label=label, key='name')).consume()
+
+
+def premerge_dimensions(tx, records):
+    totals = {'nodes': 0, 'relationships': 0}
+    for _, label, field in RELATIONSHIPS:
+        if label in PREMERGED_LABELS:
+            names = sorted({name for record in records for name in field_values(record, field)})
+            add_counters(totals, tx.run(PREMERGE_QUERY.format(label=label), names=names))
+    return totals
+
+
+def write_batch(tx, records):
+    """Prompt nodes and all their relationships for one batch of records"""
+    totals = {'nodes': 0, 'relationships': 0}
+    add_counters(totals, tx.run(PROMPT_QUERY, rows=prompt_rows(records)))
+    for relationship, label, field in RELATIONSHIPS:
+        pairs = relationship_pairs(records, field)
+        if pairs:
+            add_counters(totals, tx.run(relationship_query(relationship, label), pairs=pairs))
+    return totals
+
+
+def ingest(driver, records, batch_size=1_000, workers=4, database=None):
+    """
+    Write `records` to the graph; returns records, batches, nodes and
+    relationships created, and seconds.
+    """
+    start = time.perf_counter()
+    with driver.session(database=database) as session:
+        create_constraints(session)
+        totals = session.execute_write(premerge_dimensions, records)
+
+    batches = queue.Queue()
+    for offset in range(0, len(records), batch_size):
+        batches.put(records[offset:offset + batch_size])
+    lock = threading.Lock()
+
+    def worker():
+        with driver.session(database=database) as session:
+            while True:
+                try:
+                    batch = batches.get_nowait()
+                except queue.Empty:
+                    return
+                written = session.execute_write(write_batch, batch)
+                with lock:
+                    totals['nodes'] += written['nodes']
+                    totals['relationships'] += written['relationships']
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker) for _ in range(workers)]:
+            future.result()
+    totals.update(records=len(records), batches=-(-len(records) // batch_size),
+                  seconds=time.perf_counter() - start)
+    return totals
+
+
+# 3. RECORDING STAND-IN
+class RecordingDriver:
+    """
+    In-memory stand-in for a neo4j Driver that understands this module's
+    statements. Each run() sleeps `latency` (the round trip) plus `per_row`
+    per UNWIND row, records (query, parameters) and applies the write.
+    """
+
+    def __init__(self, latency=0.001, per_row=0.000005):
+        self.latency = latency
+        self.per_row = per_row
+        self.queries = []
+        self.transactions = 0
+        self.nodes = set()
+        self.relationships = set()
+        self._lock = threading.Lock()
+        self._statements = {PROMPT_QUERY: ('prompt', None, None), LEGACY_QUERY: ('legacy', None, None)}
+        for relationship, label, _ in RELATIONSHIPS:
+            self._statements[PREMERGE_QUERY.format(label=label)] = ('premerge', label, None)
+            self._statements[relationship_query(relationship, label)] = ('relationship', label, relationship)
+
+    def session(self, database=None):
+        return RecordingSession(self)
+
+    def close(self):
+        pass
+
+    def run(self, query, parameters):
+        rows = parameters.get('rows') or parameters.get('pairs') or parameters.get('names') or [parameters]
+        time.sleep(self.latency + self.per_row * len(rows))
+        with self._lock:
+            self.queries.append((query, parameters))
+            nodes, relationships = len(self.nodes), len(self.relationships)
+            if not query.startswith('CREATE CONSTRAINT'):
+                self._apply(query, parameters)
+            counters = SimpleNamespace(nodes_created=len(self.nodes) - nodes,
+                                       relationships_created=len(self.relationships) - relationships)
+        return RecordingResult(counters)
+
+    def _apply(self, query, parameters):
+        kind, label, relationship = self._statements[query]
+        if kind == 'premerge':
+            self.nodes.update((label, name) for name in parameters['names'])
+        elif kind == 'prompt':
+            self.nodes.update(('Prompt', row['id']) for row in parameters['rows'])
+        elif kind == 'relationship':
+            for run_id, name in parameters['pairs']:
+                if label not in PREMERGED_LABELS:
+                    self.nodes.add((label, name))
+                if ('Prompt', run_id) in self.nodes and (label, name) in self.nodes:
+                    self.relationships.add((relationship, run_id, name))
+        else:
+            self.nodes.add(('Prompt', parameters['run_id']))
+            for relationship, label, field in RELATIONSHIPS:
+                for name in field_values(parameters, field):
+                    self.nodes.add((label, name))
+                    self.relationships.add((relationship, parameters['run_id'], name))
+
+
+class RecordingSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, parameters=None, **kwargs):
+        return self.driver.run(query, {**(parameters or {}), **kwargs})
+
+    def execute_write(self, work, *args, **kwargs):
+        with self.driver._lock:
+            self.driver.transactions += 1
+        return work(self, *args, **kwargs)
+
+
+class RecordingResult:
+    def __init__(self, counters):
+        self.counters = counters
+
+    def consume(self):
+        return SimpleNamespace(counters=self.counters)
+
+
+# 4. BENCHMARK
+# The per-record statement from README1.md Step 4, kept as the baseline
+LEGACY_QUERY = """
+    MERGE (p:Prompt {id:$run_id})
+    SET p.prompt=$prompt, p.response=$response, p.embedding=$embedding
+    WITH p
+    UNWIND $topics AS t
+        MERGE (topic:Topic {name:t})
+        MERGE (p)-[:HAS_TOPIC]->(topic)
+    UNWIND $themes AS th
+        MERGE (theme:Theme {name:th})
+        MERGE (p)-[:HAS_THEME]->(theme)
+    UNWIND $mentions AS m
+        MERGE (mention:Mention {name:m})
+        MERGE (p)-[:MENTIONS]->(mention)
+    UNWIND $citations AS c
+        MERGE (citation:Citation {name:c})
+        MERGE (p)-[:CITED_IN]->(citation)
+    MERGE (region:Region {name:$region})
+    MERGE (p)-[:IN_REGION]->(region)
+    MERGE (model:Model {name:$model})
+    MERGE (p)-[:GENERATED_BY]->(model)
+    """
+
+
+def create_graph(tx, record):
+    result = tx.run(LEGACY_QUERY, {'embedding': None, **record})
+    totals = {'nodes': 0, 'relationships': 0}
+    add_counters(totals, result)
+    return totals
+
+
+def ingest_per_record(driver, records, database=None):
+    """The README loop: one transaction per record"""
+    start = time.perf_counter()
+    totals = {'nodes': 0, 'relationships': 0}
+    with driver.session(database=database) as session:
+        for record in records:
+            written = session.execute_write(create_graph, record)
+            totals['nodes'] += written['nodes']
+            totals['relationships'] += written['relationships']
+    totals.update(records=len(records), batches=len(records), seconds=time.perf_counter() - start)
+    return totals
+
+
+def scaled_records(records, count):
+    """`count` records cycling through `records`, with unique run ids"""
+    return [{**records[i % len(records)], 'run_id': f"{records[i % len(records)]['run_id']}-{i // len(records)}"}
+            for i in range(count)]
+
+
+def print_stats(label, stats):
+    seconds = stats['seconds']
+    print(f"{label:<26}{stats['batches']:>8,}{seconds:>9.2f}{stats['records'] / seconds:>12,.0f}"
+          f"{stats['nodes'] / seconds:>11,.0f}{stats['relationships'] / seconds:>11,.0f}")
+
+
+def benchmark(records, batch_sizes, workers, per_record_limit, latency):
+    print(f"{len(records):,} records, recording driver with {latency * 1000:.1f} ms per round trip")
+    print(f"\n{'Mode':<26}{'Txns':>8}{'Seconds':>9}{'Records/s':>12}{'Nodes/s':>11}{'Rels/s':>11}")
+    baseline = records[:per_record_limit]
+    print_stats(f"per record ({len(baseline):,})", ingest_per_record(RecordingDriver(latency), baseline))
+    for batch_size in batch_sizes:
+        for worker_count in workers:
+            driver = RecordingDriver(latency)
+            stats = ingest(driver, records, batch_size, worker_count)
+            print_stats(f"UNWIND {batch_size:,} x {worker_count} workers", stats)
+    print(f"\nGraph: {len(driver.nodes):,} nodes, {len(driver.relationships):,} relationships")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batched ingestion of the prompt records into Neo4j")
+    parser.add_argument('--input', default='data/apple_prompt_response_1000_realistic.jsonl')
+    parser.add_argument('--uri', default='bolt://localhost:7687')
+    parser.add_argument('--user', default='neo4j')
+    parser.add_argument('--password', default=os.environ.get('NEO4J_PASSWORD', 'password'))
+    parser.add_argument('--database', default=None)
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1_000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[4])
+    parser.add_argument('--fake', action='store_true', help="write to an in-memory RecordingDriver")
+    parser.add_argument('--latency', type=float, default=0.001, help="--fake round-trip seconds")
+    parser.add_argument('--records', type=int, default=None, help="cycle the input up to N records")
+    parser.add_argument('--benchmark', action='store_true', help="compare per-record and batched ingestion (--fake)")
+    parser.add_argument('--per-record-limit', type=int, default=2_000)
+    args = parser.parse_args()
+
+    records = load_records(args.input)
+    if args.records:
+        records = scaled_records(records, args.records)
+
+    if args.benchmark:
+        benchmark(records, args.batch_size, args.workers, args.per_record_limit, args.latency)
+    else:
+        if args.fake:
+            driver = RecordingDriver(args.latency)
+        else:
+            from neo4j import GraphDatabase
+
+            driver = GraphDatabase.driver(args.uri, auth=(args.user, args.password))
+        try:
+            stats = ingest(driver, records, args.batch_size[0], args.workers[0], args.database)
+        finally:
+            driver.close()
+        print(f"✅ Ingested {stats['records']:,} records in {stats['batches']:,} batches, {stats['seconds']:.2f}s: "
+              f"{stats['nodes']:,} nodes ({stats['nodes'] / stats['seconds']:,.0f}/s), "
+              f"{stats['relationships']:,} relationships ({stats['relationships'] / stats['seconds']:,.0f}/s)")
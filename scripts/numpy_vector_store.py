@@ -0,0 +1,194 @@
+"""
+Quantized in-process vector store built on NumPy only.
+
+Unit-normalised embeddings are kept in one contiguous array:
+  - float32: exact, 4 bytes per dimension
+  - float16: 2 bytes per dimension
+  - int8:    1 byte per dimension plus one float32 scale per vector
+             (x is stored as round(x / scale), scale = max|x| / 127)
+The arrays are saved as .npy and memory-mapped on load.
+
+search scans the store in blocks of rows: one matrix product per block, with
+argpartition keeping the running top candidates. With `rescore` it fetches
+rescore * k candidates and re-ranks them exactly against float32 vectors; the
+factor given at build time is saved with the store and used by default.
+Distances are squared L2 between unit vectors (2 - 2 * cosine), the same
+numbers an IndexFlatL2 over normalised vectors returns. retrieval_bundle.py
+can therefore use this store in place of a FAISS index.
+
+Run this file directly to compare memory, recall and latency of the codecs:
+    python scripts/numpy_vector_store.py --records 200000 --dim 384
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+
+DTYPES = ('float32', 'float16', 'int8')
+BLOCK_ROWS = 16_384
+
+CODES_FILE = 'codes.npy'
+SCALES_FILE = 'scales.npy'
+META_FILE = 'store.json'
+
+
+def normalize_rows(vectors):
+    """float32 C-contiguous copy with unit-length rows (zero rows stay zero)"""
+    vectors = np.array(vectors, dtype=np.float32, order='C', ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class NumpyVectorStore:
+    """Flat store of quantized unit vectors, searched by blocked inner products"""
+
+    supports_mask = True
+
+    def __init__(self, codes, scales=None, rescore_vectors=None, rescore=None, block_rows=BLOCK_ROWS):
+        self.codes = codes
+        self.scales = scales
+        self.rescore_vectors = rescore_vectors
+        self.rescore = rescore
+        self.block_rows = block_rows
+
+    @property
+    def ntotal(self):
+        return len(self.codes)
+
+    @property
+    def dtype(self):
+        return self.codes.dtype.name
+
+    @property
+    def bytes_per_vector(self):
+        return self.codes.shape[1] * self.codes.itemsize + (4 if self.scales is not None else 0)
+
+    @classmethod
+    def build(cls, embeddings, dtype='int8', rescore=None):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+        vectors = normalize_rows(embeddings)
+        if dtype != 'int8':
+            return cls(vectors.astype(dtype), rescore=rescore)
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return cls(codes, scales.astype(np.float32), rescore=rescore)
+
+    def save(self, store_dir):
+        os.makedirs(store_dir, exist_ok=True)
+        np.save(os.path.join(store_dir, CODES_FILE), self.codes)
+        if self.scales is not None:
+            np.save(os.path.join(store_dir, SCALES_FILE), self.scales)
+        with open(os.path.join(store_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump({'dtype': self.dtype, 'count': self.ntotal, 'dim': int(self.codes.shape[1]),
+                       'rescore': self.rescore}, f)
+
+    @classmethod
+    def load(cls, store_dir, mmap=True, rescore_vectors=None):
+        mode = 'r' if mmap else None
+        with open(os.path.join(store_dir, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        codes = np.load(os.path.join(store_dir, CODES_FILE), mmap_mode=mode)
+        scales_path = os.path.join(store_dir, SCALES_FILE)
+        scales = np.load(scales_path, mmap_mode=mode) if os.path.exists(scales_path) else None
+        return cls(codes, scales, rescore_vectors, meta.get('rescore'))
+
+    def _block_scores(self, start, stop, queries):
+        """Approximate inner products, shape (queries, rows in block)"""
+        block = np.asarray(self.codes[start:stop], dtype=np.float32)
+        scores = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales[start:stop]
+        return scores
+
+    def search(self, queries, k=5, mask=None, rescore=None):
+        """
+        (distances, row ids) of the k nearest rows for each query, nearest first.
+        `mask` (bool per row) limits the scan to matching rows; `rescore`
+        (default: the store's own) re-ranks rescore * k candidates against the
+        float32 vectors, 0 turns it off. Missing results have id -1 and distance inf.
+        """
+        queries = normalize_rows(queries)
+        rescore = self.rescore if rescore is None else rescore
+        fetch = k * rescore if rescore and self.rescore_vectors is not None else k
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+
+        for start in range(0, self.ntotal, self.block_rows):
+            stop = min(start + self.block_rows, self.ntotal)
+            scores = self._block_scores(start, stop, queries)
+            ids = np.arange(start, stop, dtype=np.int64)
+            if mask is not None:
+                keep = mask[start:stop]
+                if not keep.any():
+                    continue
+                scores, ids = scores[:, keep], ids[keep]
+            scores = np.concatenate([best_scores, scores], axis=1)
+            ids = np.concatenate([best_ids, np.broadcast_to(ids, (len(queries), len(ids)))], axis=1)
+            if scores.shape[1] > fetch:
+                top = np.argpartition(-scores, fetch - 1, axis=1)[:, :fetch]
+                scores, ids = np.take_along_axis(scores, top, axis=1), np.take_along_axis(ids, top, axis=1)
+            best_scores, best_ids = scores, ids
+
+        if fetch > k:
+            best_scores = self._rescore(queries, best_ids)
+
+        order = np.argsort(-best_scores, axis=1)[:, :k]
+        found = best_ids.shape[1]
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        row_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        distances[:, :min(k, found)] = 2 - 2 * np.take_along_axis(best_scores, order, axis=1)
+        row_ids[:, :min(k, found)] = np.take_along_axis(best_ids, order, axis=1)
+        return distances, row_ids
+
+    def _rescore(self, queries, candidate_ids):
+        """Exact float32 inner products of each query with its candidates"""
+        scores = np.empty(candidate_ids.shape, dtype=np.float32)
+        for i, (query, ids) in enumerate(zip(queries, candidate_ids)):
+            order = np.argsort(ids)
+            vectors = np.asarray(self.rescore_vectors[ids[order]], dtype=np.float32)
+            scores[i, order] = vectors @ query
+        return scores
+
+
+# BENCHMARK
+def benchmark(count, dim, k, query_count, rescore):
+    rng = np.random.default_rng(3)
+    centers = rng.standard_normal((256, dim)).astype(np.float32)  # clustered, like build_faiss_index.py
+    embeddings = normalize_rows(centers[rng.integers(256, size=count)]
+                                + 0.6 * rng.standard_normal((count, dim)).astype(np.float32))
+    queries = normalize_rows(embeddings[rng.choice(count, query_count, replace=False)]
+                             + 0.1 * rng.standard_normal((query_count, dim)).astype(np.float32))
+    exact = NumpyVectorStore.build(embeddings, 'float32')
+    _, truth = exact.search(queries, k)
+    print(f"{count:,} vectors x {dim} dims, {query_count} queries, k={k}")
+    print(f"\n{'Store':<22}{'Bytes/vec':>10}{'Memory MB':>11}{'vs f32':>8}{'Recall@k':>10}{'ms/query':>10}")
+
+    runs = [(dtype, 0) for dtype in DTYPES] + [('float16', rescore), ('int8', rescore)]
+    for dtype, rescore_factor in runs:
+        store = exact if dtype == 'float32' else NumpyVectorStore.build(embeddings, dtype)
+        store.rescore_vectors = embeddings
+        start = time.perf_counter()
+        _, found = store.search(queries, k, rescore=rescore_factor)
+        per_query = (time.perf_counter() - start) / query_count * 1000
+        recall = sum(len(np.intersect1d(f, t)) for f, t in zip(found, truth)) / truth.size
+        label = dtype + (f" + rescore x{rescore_factor}" if rescore_factor else "")
+        print(f"{label:<22}{store.bytes_per_vector:>10}{store.bytes_per_vector * count / 1e6:>11.1f}"
+              f"{exact.bytes_per_vector / store.bytes_per_vector:>7.1f}x{recall:>10.3f}{per_query:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the quantized NumPy vector store")
+    parser.add_argument('--records', type=int, default=200_000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--rescore', type=int, default=4, help="candidates per result for the rescoring runs")
+    args = parser.parse_args()
+
+    benchmark(args.records, args.dim, args.k, args.queries, args.rescore)
@@ -0,0 +1,243 @@
+"""
+Asyncio query service with dynamic micro-batching around retrieve_top_k.
+
+retrieve_top_k in copy_of_aigurukul.py encodes one query and searches one row
+per call. QueryService keeps the encoder and index warm in a long-lived
+process and answers concurrent requests in micro-batches:
+  - query() puts the request on a queue and awaits its future
+  - the batcher takes the first waiting request, then keeps collecting until
+    it has `max_batch_size` requests or `max_wait_ms` have passed
+  - each batch is encoded in one call and searched with one index.search
+    (on a worker thread, so the event loop keeps accepting requests), and the
+    rows are fanned back out to the waiting futures
+While a batch runs, new requests queue up and form the next batch.
+
+`encode` maps a list of texts to a 2-d array; `search` maps (vectors, k) to
+(distances, ids), e.g. RetrievalBundle.search or a FAISS index's search.
+QueryService.from_bundle returns retrieve_top_k-style dicts instead.
+
+    python scripts/query_service.py --concurrency 1 8 32 128
+    python scripts/query_service.py --model all-MiniLM-L6-v2 --index faiss
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class QueryService:
+    """Micro-batching front end for an encoder and a vector index"""
+
+    def __init__(self, encode, search, max_batch_size=32, max_wait_ms=2.0, postprocess=None):
+        self.encode = encode
+        self.search = search
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.postprocess = postprocess  # (distances row, ids row) -> result, default the two rows
+        self.batches = 0
+        self.queries = 0
+        self._queue = None
+        self._batcher = None
+        self._executor = None
+        self._waiting = set()  # futures of queries not answered yet, queued or in a running batch
+        self._stopped = False
+
+    @classmethod
+    def from_bundle(cls, bundle, encode, columns=None, **options):
+        """Service over a RetrievalBundle whose results match bundle.retrieve_top_k"""
+        def postprocess(distances, ids):
+            found = ids >= 0
+            results = bundle.rows(ids[found], columns)
+            for result, row_id, distance in zip(results, ids[found], distances[found]):
+                result['row_id'] = int(row_id)
+                result['distance'] = float(distance)
+            return results
+        return cls(encode, bundle.search, postprocess=postprocess, **options)
+
+    async def start(self):
+        self._stopped = False
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='query-batch')
+        self._batcher = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        """Stop batching; queries still waiting fail with RuntimeError"""
+        self._stopped = True
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        for future in self._waiting:
+            if not future.done():
+                future.set_exception(RuntimeError("query service stopped"))
+        self._waiting.clear()
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def query(self, text, k=5):
+        """Top-k results for one query text"""
+        if self._stopped:
+            raise RuntimeError("query service stopped")
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.add(future)
+        try:
+            await self._queue.put((text, k, future))
+            return await future
+        finally:
+            self._waiting.discard(future)
+
+    async def query_batch(self, texts, k=5):
+        """Top-k results for each text; the texts join whatever batches are forming"""
+        return await asyncio.gather(*(self.query(text, k) for text in texts))
+
+    async def _collect(self):
+        """The next micro-batch: the first waiting request plus those arriving within max_wait"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _answer(self, texts, k):
+        vectors = np.asarray(self.encode(texts), dtype=np.float32)
+        return self.search(vectors, k)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            k = max(item[1] for item in batch)
+            try:
+                distances, ids = await loop.run_in_executor(self._executor, self._answer,
+                                                            [item[0] for item in batch], k)
+            except Exception as error:
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            for row, (_, item_k, future) in enumerate(batch):
+                if future.done():  # the caller gave up waiting
+                    continue
+                row_distances, row_ids = distances[row, :item_k], ids[row, :item_k]
+                try:
+                    result = self.postprocess(row_distances, row_ids) if self.postprocess else (row_distances, row_ids)
+                except Exception as error:  # fail this query only; the batcher keeps serving the rest
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+
+# BENCHMARK
+def simulated_encoder(dim, per_call_ms, per_item_ms):
+    """
+    Stand-in for a sentence encoder on CPU/GPU: a fixed cost per call plus a
+    smaller cost per text (sleeping releases the GIL, as torch kernels do)
+    """
+    def encode(texts):
+        time.sleep((per_call_ms + per_item_ms * len(texts)) / 1000)
+        return np.stack([np.random.default_rng(abs(hash(text))).standard_normal(dim) for text in texts])
+    return encode
+
+
+def benchmark_index(kind, count, dim):
+    """(search function, description) over `count` random unit vectors"""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    if kind == 'faiss':
+        import faiss
+
+        index = faiss.IndexFlatL2(dim)
+        index.add(vectors)
+
+        def search(queries, k):
+            queries = np.ascontiguousarray(queries, dtype=np.float32)
+            faiss.normalize_L2(queries)
+            return index.search(queries, k)
+        return search, f"FAISS IndexFlatL2 over {count:,} x {dim}"
+
+    from numpy_vector_store import NumpyVectorStore
+
+    store = NumpyVectorStore.build(vectors, 'float32')
+    return store.search, f"NumpyVectorStore(float32) over {count:,} x {dim}"
+
+
+async def load_test(service, texts, concurrency, k):
+    """Latencies of `texts` sent by `concurrency` clients issuing one query at a time"""
+    latencies = []
+    pending = iter(texts)
+
+    async def client():
+        for text in pending:
+            start = time.perf_counter()
+            await service.query(text, k)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start, np.array(latencies) * 1000
+
+
+async def benchmark(encode, search, description, query_count, concurrencies, max_batch_size, max_wait_ms, k):
+    texts = [f"Why does iPhone have issue related to topic {i}?" for i in range(query_count)]
+    print(f"{description}, {query_count} queries per run, k={k}")
+    print(f"\n{'Clients':>8}  {'Service':<24}{'QPS':>9}{'p50 ms':>9}{'p99 ms':>9}{'Mean batch':>12}")
+    for concurrency in concurrencies:
+        for label, batch_size in (("one query per call", 1), (f"micro-batch <= {max_batch_size}", max_batch_size)):
+            async with QueryService(encode, search, batch_size, max_wait_ms) as service:
+                seconds, latencies = await load_test(service, texts, concurrency, k)
+                mean_batch = service.queries / max(service.batches, 1)
+            print(f"{concurrency:>8}  {label:<24}{query_count / seconds:>9,.0f}{np.percentile(latencies, 50):>9.2f}"
+                  f"{np.percentile(latencies, 99):>9.2f}{mean_batch:>12.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the micro-batching query service")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--queries', type=int, default=1_000)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--index', choices=['numpy', 'faiss'], default='numpy')
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--model', default=None, help="SentenceTransformer model (default: simulated encoder)")
+    parser.add_argument('--dim', type=int, default=384, help="dimension of the simulated encoder")
+    parser.add_argument('--encode-call-ms', type=float, default=5.0, help="simulated cost per encode call")
+    parser.add_argument('--encode-item-ms', type=float, default=0.3, help="simulated cost per encoded text")
+    args = parser.parse_args()
+
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(args.model)
+        dim = model.get_sentence_embedding_dimension()
+
+        def encode(texts):
+            return model.encode(texts, convert_to_numpy=True)
+    else:
+        encode, dim = simulated_encoder(args.dim, args.encode_call_ms, args.encode_item_ms), args.dim
+    search, description = benchmark_index(args.index, args.records, dim)
+    asyncio.run(benchmark(encode, search, description, args.queries, args.concurrency, args.max_batch_size,
+                          args.max_wait_ms, args.k))
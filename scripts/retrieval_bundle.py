@@ -0,0 +1,341 @@
+"""
+Persisted retrieval bundle for the QA RAG step (STEP 4-5 of copy_of_aigurukul.py).
+
+A bundle directory holds everything a query process needs, aligned by row id
+(row i of every file is the same record):
+  - index.faiss      FAISS index over the normalised embeddings, or
+    index.npstore/   a quantized NumpyVectorStore (--index-type numpy-int8 ...)
+  - embeddings.npy   float32 normalised embeddings, memory-mapped on load
+  - metadata.arrow   Arrow IPC table of the records, memory-mapped on load
+  - filters.pkl      posting lists of the metadata filter fields, if the records have any
+  - manifest.json    model name, dimension, row count, index type and files
+
+load_bundle memory-maps all three data files (FAISS with IO_FLAG_MMAP for IVF
+indexes and IO_FLAG_MMAP_IFC for flat codes), so a query process starts
+without reading or re-encoding the corpus, and several processes share the
+same page cache. Bundles with a NumpyVectorStore never import faiss; their
+store rescores its candidates against embeddings.npy.
+
+    python scripts/retrieval_bundle.py build --records qa_records.jsonl --embeddings qa_embeddings.npy
+    python scripts/retrieval_bundle.py benchmark --bundle qa_bundle
+    python scripts/retrieval_bundle.py check
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+import numpy as np
+
+from metadata_filter import FILTER_FIELDS, FilteredSearch, MetadataIndex
+from numpy_vector_store import DTYPES, NumpyVectorStore, normalize_rows
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentation import from_env, stage  # noqa: E402
+
+
+MANIFEST_FILE = 'manifest.json'
+INDEX_FILE = 'index.faiss'
+STORE_DIR = 'index.npstore'
+EMBEDDINGS_FILE = 'embeddings.npy'
+METADATA_FILE = 'metadata.arrow'
+FILTERS_FILE = 'filters.pkl'
+
+# Columns left out of the metadata table (the embedding input is question + answer)
+DROPPED_COLUMNS = ['text_for_embedding']
+
+# The FAISS types of build_faiss_index.py (imported only when one is used) and the NumPy stores
+FAISS_INDEX_TYPES = ['flat', 'ivf', 'ivfpq', 'hnsw']
+NUMPY_INDEX_TYPES = [f'numpy-{dtype}' for dtype in DTYPES]
+INDEX_TYPES = FAISS_INDEX_TYPES + NUMPY_INDEX_TYPES
+
+
+# 1. SAVE
+def is_missing(value):
+    return value is None or isinstance(value, float) and value != value
+
+
+def metadata_table(records):
+    """
+    Arrow table of a records DataFrame. Columns of string lists (topics, tags...)
+    stay lists, with missing values as nulls; other mixed-type columns are
+    stored as strings.
+    """
+    import pyarrow as pa
+
+    records = records.drop(columns=[c for c in DROPPED_COLUMNS if c in records.columns])
+    columns = {}
+    for name in records.columns:
+        values = records[name]
+        is_string_list = values.map(lambda v: is_missing(v)
+                                    or isinstance(v, list) and all(isinstance(i, str) for i in v))
+        if values.dtype == object and not is_string_list.all():
+            values = values.map(lambda v: v if v is None or isinstance(v, str) else json.dumps(v))
+        columns[name] = pa.array(values, from_pandas=True)
+    return pa.table(columns)
+
+
+def save_bundle(bundle_dir, embeddings, records, model, index_type='flat', **index_options):
+    """Normalise `embeddings`, build the index and write the bundle; returns the manifest"""
+    import pyarrow as pa
+
+    if len(embeddings) != len(records):
+        raise ValueError(f"{len(embeddings)} embeddings for {len(records)} records")
+    os.makedirs(bundle_dir, exist_ok=True)
+    embeddings = normalize_rows(embeddings)
+    if index_type in NUMPY_INDEX_TYPES:
+        with stage('index_build', items=len(embeddings)):
+            index = NumpyVectorStore.build(embeddings, index_type.split('-', 1)[1], index_options.get('rescore'))
+        with stage('save'):
+            index.save(os.path.join(bundle_dir, STORE_DIR))
+        index_file, index_name = STORE_DIR, f"NumpyVectorStore({index.dtype})"
+    else:
+        import faiss
+        from build_faiss_index import build_index, set_search_params
+
+        options = {key: value for key, value in index_options.items() if key not in ('nprobe', 'ef_search', 'rescore')}
+        with stage('index_build', items=len(embeddings)):
+            index = build_index(embeddings, index_type, **options)
+        set_search_params(index, index_options.get('nprobe'), index_options.get('ef_search'))
+        with stage('save'):
+            faiss.write_index(index, os.path.join(bundle_dir, INDEX_FILE))
+        index_file, index_name = INDEX_FILE, index.__class__.__name__
+
+    with stage('save', items=len(embeddings)):
+        np.save(os.path.join(bundle_dir, EMBEDDINGS_FILE), embeddings)
+        table = metadata_table(records)
+        with pa.OSFile(os.path.join(bundle_dir, METADATA_FILE), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    files = {'index': index_file, 'embeddings': EMBEDDINGS_FILE, 'metadata': METADATA_FILE}
+    if any(field in table.column_names for field in FILTER_FIELDS):
+        MetadataIndex.from_table(table).save(os.path.join(bundle_dir, FILTERS_FILE))
+        files['filters'] = FILTERS_FILE
+
+    manifest = {
+        'model': model,
+        'dim': int(embeddings.shape[1]),
+        'count': int(len(embeddings)),
+        'metric': 'l2 on normalised vectors (cosine ranking)',
+        'index_type': index_type,
+        'index': index_name,
+        'files': files,
+        'metadata_columns': table.column_names,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    # The manifest goes last, so a bundle with a manifest is complete
+    with open(os.path.join(bundle_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# 2. LOAD AND QUERY
+class RetrievalBundle:
+    """Memory-mapped index, embeddings and metadata of a saved bundle"""
+
+    def __init__(self, bundle_dir, mmap=True):
+        import pyarrow as pa
+
+        with open(os.path.join(bundle_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        files = self.manifest['files']
+        self.model = self.manifest['model']
+        self.dim = self.manifest['dim']
+
+        self.embeddings = np.load(os.path.join(bundle_dir, files['embeddings']), mmap_mode='r' if mmap else None)
+        index_path = os.path.join(bundle_dir, files['index'])
+        if self.manifest['index_type'] in NUMPY_INDEX_TYPES:
+            self.index = NumpyVectorStore.load(index_path, mmap, rescore_vectors=self.embeddings)
+        else:
+            self.index = read_faiss_index(index_path, self.manifest['index_type'], mmap)
+
+        self._metadata_source = pa.memory_map(os.path.join(bundle_dir, files['metadata']))
+        self.metadata = pa.ipc.open_file(self._metadata_source).read_all()
+
+        if not (self.index.ntotal == len(self.embeddings) == self.metadata.num_rows == self.manifest['count']):
+            raise ValueError(f"bundle {bundle_dir} files are not aligned with its manifest")
+
+        self._filters_path = os.path.join(bundle_dir, files['filters']) if 'filters' in files else None
+        self._filtered_search = None
+
+    @property
+    def filtered_search(self):
+        """FilteredSearch over this bundle, loading the metadata posting lists on first use"""
+        if self._filtered_search is None:
+            if self._filters_path is None:
+                raise ValueError("this bundle has no metadata filter fields")
+            self._filtered_search = FilteredSearch(self.index, self.embeddings, MetadataIndex.load(self._filters_path))
+        return self._filtered_search
+
+    def __len__(self):
+        return self.manifest['count']
+
+    def search(self, query_vectors, k=5, where=None):
+        """
+        (distances, row ids) for a batch of query vectors, normalised here.
+        `where` restricts the search to rows matching a metadata filter.
+        """
+        query_vectors = normalize_rows(query_vectors)
+        if query_vectors.shape[1] != self.dim:
+            raise ValueError(f"bundle holds {self.dim}-dim {self.model} vectors, got {query_vectors.shape[1]}")
+        with stage('search', items=len(query_vectors)):
+            if where:
+                return self.filtered_search.search(query_vectors, k, where)[:2]
+            return self.index.search(query_vectors, k)
+
+    def rows(self, row_ids, columns=None):
+        """Metadata records for the given row ids (missing ids, -1, are skipped)"""
+        row_ids = [int(i) for i in row_ids if i >= 0]
+        if not row_ids:  # take([]) would see a null-typed array and raise
+            return []
+        table = self.metadata.select(columns) if columns else self.metadata
+        return table.take(row_ids).to_pylist()
+
+    def retrieve_top_k(self, query_vector, k=5, columns=None, where=None):
+        """Top-k records for one query vector, each with its row_id and distance"""
+        distances, row_ids = self.search(query_vector, k, where)
+        found = row_ids[0] >= 0
+        results = self.rows(row_ids[0][found], columns)
+        for result, row_id, distance in zip(results, row_ids[0][found], distances[0][found]):
+            result['row_id'] = int(row_id)
+            result['distance'] = float(distance)
+        return results
+
+    def close(self):
+        self._metadata_source.close()
+
+
+def read_faiss_index(index_path, index_type, mmap):
+    """FAISS index memory-mapped when its type allows it, read into memory otherwise"""
+    import faiss
+
+    if mmap:
+        flag = faiss.IO_FLAG_MMAP if index_type in ('ivf', 'ivfpq') else faiss.IO_FLAG_MMAP_IFC
+        try:
+            return faiss.read_index(index_path, flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            pass  # this index type can't be mapped; read it normally
+    return faiss.read_index(index_path)
+
+
+def load_bundle(bundle_dir, mmap=True):
+    return RetrievalBundle(bundle_dir, mmap)
+
+
+# 3. STARTUP BENCHMARK
+STARTUP_PROBE = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {scripts_dir!r})
+from retrieval_bundle import load_bundle
+bundle = load_bundle({bundle_dir!r}, mmap={mmap!r})
+opened = time.perf_counter()
+bundle.retrieve_top_k(bundle.embeddings[len(bundle) // 2], 5)
+print(opened - start, time.perf_counter() - start)
+"""
+
+
+def drop_page_cache(bundle_dir):
+    """Ask the kernel to forget the cached pages of the bundle files (no root needed)"""
+    for root, _, names in os.walk(bundle_dir):
+        for name in names:
+            fd = os.open(os.path.join(root, name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+
+
+def startup_seconds(bundle_dir, mmap, cold):
+    """(seconds to open, seconds to first answer) in a fresh Python process"""
+    if cold:
+        drop_page_cache(bundle_dir)
+    code = STARTUP_PROBE.format(scripts_dir=os.path.dirname(os.path.abspath(__file__)),
+                                bundle_dir=bundle_dir, mmap=mmap)
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    opened, answered = map(float, output.split())
+    return opened, answered
+
+
+def benchmark(bundle_dir, repeats):
+    bundle = load_bundle(bundle_dir)
+    print(f"Bundle {bundle_dir}: {len(bundle):,} x {bundle.dim} ({bundle.model}, {bundle.manifest['index']})")
+    bundle.close()
+    print(f"\n{'Start':<8}{'Loader':<14}{'Open s':>9}{'First answer s':>16}")
+    for mmap in (True, False):
+        for cold in (True, False):
+            runs = [startup_seconds(bundle_dir, mmap, cold) for _ in range(repeats)]
+            opened, answered = np.median(runs, axis=0)
+            print(f"{'cold' if cold else 'warm':<8}{'memory-mapped' if mmap else 'full read':<14}"
+                  f"{opened:>9.3f}{answered:>16.3f}")
+    print("\nTimes include importing faiss (FAISS bundles) and pyarrow; "
+          "cold runs drop the bundle's pages from the page cache first.")
+
+
+# 4. SELF-CHECK
+def check():
+    """Build a tiny bundle in a temporary directory and assert the query edge cases"""
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    records = pd.DataFrame({'text': [f"record {i}" for i in range(8)], 'region': ['EU', 'India'] * 4,
+                            'tags': [['apple', 'battery'], None] * 4})
+    embeddings = rng.standard_normal((len(records), 16)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as bundle_dir:
+        save_bundle(bundle_dir, embeddings, records, 'check')
+        bundle = load_bundle(bundle_dir, mmap=False)
+        try:
+            assert bundle.rows([]) == [] and bundle.rows([-1, -1]) == []
+            assert bundle.rows([1], ['text']) == [{'text': 'record 1'}]
+            assert [r['row_id'] for r in bundle.retrieve_top_k(embeddings[3], 1)] == [3]
+            assert bundle.retrieve_top_k(embeddings[0], 3, where={'region': 'Mars'}) == []
+            assert bundle.retrieve_top_k(embeddings[0], 3, where={'$or': []}) == []
+            found = bundle.retrieve_top_k(embeddings[0], 8, where={'tags': {'$all': ['apple', 'battery']}})
+            assert sorted(r['row_id'] for r in found) == [0, 2, 4, 6]
+        finally:
+            bundle.close()
+    print("✅ Retrieval bundle checks passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build, query or benchmark a persisted retrieval bundle")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="write a bundle from embed_qa.py output")
+    build.add_argument('--records', default='qa_records.jsonl')
+    build.add_argument('--embeddings', default='qa_embeddings.npy')
+    build.add_argument('--model', default='all-MiniLM-L6-v2', help="model that produced the embeddings")
+    build.add_argument('--bundle', default='qa_bundle')
+    build.add_argument('--index-type', choices=INDEX_TYPES, default='flat')
+    build.add_argument('--nlist', type=int, default=None)
+    build.add_argument('--nprobe', type=int, default=8)
+    build.add_argument('--hnsw-m', type=int, default=32)
+    build.add_argument('--ef-search', type=int, default=64)
+    build.add_argument('--rescore', type=int, default=4,
+                       help="numpy-* stores: candidates per result rescored in float32 (0 = off)")
+
+    bench = commands.add_parser('benchmark', help="cold and warm startup timings")
+    bench.add_argument('--bundle', default='qa_bundle')
+    bench.add_argument('--repeats', type=int, default=3)
+    commands.add_parser('check', help="assert query edge cases on a tiny temporary bundle")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        import pandas as pd
+
+        from_env('bundle_qa')  # per-stage metrics when PIPELINE_METRICS is set
+        with stage('load'):
+            records = pd.read_json(args.records, lines=True, dtype=False, convert_dates=False)
+            embeddings = np.load(args.embeddings)
+        manifest = save_bundle(args.bundle, embeddings, records, args.model, args.index_type,
+                               nlist=args.nlist, nprobe=args.nprobe, hnsw_m=args.hnsw_m, ef_search=args.ef_search,
+                               rescore=args.rescore)
+        print(f"✅ Saved {manifest['count']:,} rows ({manifest['index']}) to {args.bundle}")
+    elif args.command == 'benchmark':
+        benchmark(args.bundle, args.repeats)
+    else:
+        check()
@@ -0,0 +1,268 @@
+"""
+Semantic answer cache in front of retrieval and generation.
+
+Query traffic is mostly paraphrases of a few questions, yet every
+retrieve_top_k call in copy_of_aigurukul.py re-encodes the query, searches the
+index and rebuilds the RAG prompt. SemanticCache sits in front of all three:
+  - exact layer: an LRU of normalised query strings -> their embedding and
+    entry, so a repeated string skips the encoder as well
+  - semantic layer: the embeddings of answered queries in one float32 matrix;
+    a new query whose cosine similarity with a cached one is >= `threshold`
+    gets that entry's stored value (retrieval results, answer...)
+Entries expire after `ttl_seconds`; past `max_entries` the least recently used
+entry is evicted. The cache remembers the index version it was filled
+against (bundle_version of a RetrievalBundle); a different version clears it.
+stats() reports hit rates and the compute time the hits saved.
+
+    python scripts/semantic_cache.py --queries 2000 --threshold 0.9
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_cache import normalize_text  # noqa: E402
+
+
+def bundle_version(bundle):
+    """Identity of a RetrievalBundle's contents: a rebuilt bundle gets a new one"""
+    manifest = bundle.manifest
+    return f"{manifest['created_at']}:{manifest['count']}:{manifest['index_type']}:{manifest['model']}"
+
+
+class SemanticCache:
+    """Exact-string LRU plus cosine-threshold lookup of previously answered queries"""
+
+    def __init__(self, encode, threshold=0.92, max_entries=10_000, ttl_seconds=3_600, exact_size=4_096,
+                 index_version=None, clock=time.monotonic):
+        self.encode = encode  # list of texts -> 2-d array of embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.exact_size = exact_size
+        self.index_version = index_version
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.counters = dict(lookups=0, exact_hits=0, semantic_hits=0, misses=0, encoder_calls=0,
+                             evictions=0, expirations=0, invalidations=0)
+        self.saved_seconds = 0.0
+        self._epoch = 0  # bumped by clear(), so values computed before it are not stored after it
+        self.clear()
+
+    def clear(self):
+        self._epoch += 1
+        self._exact = OrderedDict()   # normalised query -> (embedding, slot or None, slot generation)
+        self._vectors = None          # (max_entries, dim) unit vectors
+        self._values = [None] * self.max_entries
+        self._costs = np.zeros(self.max_entries)
+        self._created = np.zeros(self.max_entries)
+        self._last_used = np.zeros(self.max_entries)
+        self._live = np.zeros(self.max_entries, dtype=bool)
+        self._generations = np.zeros(self.max_entries, dtype=np.int64)  # bumped each time a slot is refilled
+
+    def check_version(self, index_version):
+        """Clear the cache if it was filled against another index version"""
+        with self._lock:
+            if index_version != self.index_version:
+                if self._live.any() or self._exact:
+                    self.counters['invalidations'] += 1
+                self.clear()
+                self.index_version = index_version
+
+    def _embedding(self, key):
+        """Embedding of a normalised query, from the exact layer or the encoder"""
+        cached = self._exact.get(key)
+        if cached is not None:
+            self._exact.move_to_end(key)
+            return cached
+        self.counters['encoder_calls'] += 1
+        vector = np.asarray(self.encode([key])[0], dtype=np.float32)
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        self._remember(key, vector, None)
+        return vector, None, 0
+
+    def _remember(self, key, vector, slot):
+        self._exact[key] = (vector, slot, 0 if slot is None else int(self._generations[slot]))
+        self._exact.move_to_end(key)
+        while len(self._exact) > self.exact_size:
+            self._exact.popitem(last=False)
+
+    def _expire(self, now):
+        expired = self._live & (now - self._created > self.ttl_seconds)
+        if expired.any():
+            self.counters['expirations'] += int(expired.sum())
+            self._live &= ~expired
+            for slot in np.flatnonzero(expired):
+                self._values[slot] = None
+
+    def lookup(self, query):
+        """(value or None, best similarity, normalised query, embedding) for one query"""
+        key = normalize_text(query)
+        now = self.clock()
+        self.counters['lookups'] += 1
+        self._expire(now)
+        vector, slot, generation = self._embedding(key)
+        if slot is not None and self._live[slot] and self._generations[slot] == generation:
+            self.counters['exact_hits'] += 1
+            return self._hit(slot, now), 1.0, key, vector
+
+        similarity = -1.0
+        if self._vectors is not None and self._live.any():
+            scores = np.where(self._live, self._vectors @ vector, -np.inf)
+            slot = int(np.argmax(scores))
+            similarity = float(scores[slot])
+            if similarity >= self.threshold:
+                self.counters['semantic_hits'] += 1
+                self._remember(key, vector, slot)
+                return self._hit(slot, now), similarity, key, vector
+        self.counters['misses'] += 1
+        return None, similarity, key, vector
+
+    def _hit(self, slot, now):
+        self._last_used[slot] = now
+        self.saved_seconds += self._costs[slot]
+        return self._values[slot]
+
+    def store(self, key, vector, value, cost_seconds=0.0):
+        """Cache `value` for a normalised query and its embedding (as returned by lookup)"""
+        if self._vectors is None:
+            self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+        free = np.flatnonzero(~self._live)
+        if len(free):
+            slot = int(free[0])
+        else:
+            slot = int(np.argmin(self._last_used))
+            self.counters['evictions'] += 1
+        now = self.clock()
+        self._vectors[slot] = vector
+        self._values[slot] = value
+        self._costs[slot] = cost_seconds
+        self._created[slot] = self._last_used[slot] = now
+        self._live[slot] = True
+        self._generations[slot] += 1
+        self._remember(key, vector, slot)
+
+    def get_or_compute(self, query, compute, index_version=None):
+        """
+        Cached value for `query`, or compute(query, embedding) stored for the
+        next paraphrase. Pass the current `index_version` to drop entries
+        computed against an older index.
+        """
+        if index_version is not None:
+            self.check_version(index_version)
+        with self._lock:
+            value, _, key, vector = self.lookup(query)
+            epoch = self._epoch
+        if value is not None:
+            return value
+        start = time.perf_counter()
+        value = compute(query, vector)
+        cost = time.perf_counter() - start
+        with self._lock:
+            if self._epoch == epoch:  # else the cache was cleared for a new index while computing
+                self.store(key, vector, value, cost)
+        return value
+
+    def stats(self):
+        counters = dict(self.counters)
+        lookups = max(counters['lookups'], 1)
+        counters.update(
+            entries=int(self._live.sum()),
+            hit_rate=(counters['exact_hits'] + counters['semantic_hits']) / lookups,
+            exact_hit_rate=counters['exact_hits'] / lookups,
+            semantic_hit_rate=counters['semantic_hits'] / lookups,
+            saved_seconds=self.saved_seconds,
+        )
+        return counters
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"Semantic cache: {s['lookups']:,} lookups, hit rate {s['hit_rate']:.1%} "
+              f"(exact {s['exact_hit_rate']:.1%}, semantic {s['semantic_hit_rate']:.1%}), "
+              f"{s['encoder_calls']:,} encoder calls, {s['entries']:,} entries, {s['evictions']:,} evictions, "
+              f"{s['expirations']:,} expired, {s['invalidations']:,} invalidations, "
+              f"{s['saved_seconds']:.2f}s of compute saved")
+
+
+# BENCHMARK
+INTENTS = ["battery drain", "fast charging", "overheating", "privacy settings", "dual SIM", "storage full",
+           "screen flicker", "face id", "wifi drops", "camera blur"]
+TEMPLATES = ["Why does iPhone have issue related to {}?", "why does my iPhone have {} issues",
+             "iPhone {} problem", "How do I fix {} on my iPhone?", "what causes {} on iPhone"]
+PREFIXES = ["", "", "hi, ", "quick question: ", "Hello! "]
+SUFFIXES = ["", "", " please", " thanks", " (iOS 17)"]
+
+
+def hashed_encoder(dim=256, latency=0.002):
+    """
+    Stand-in sentence encoder: hashed word unigrams and bigrams, plus the
+    per-call latency of a small transformer on CPU
+    """
+    def encode(texts):
+        time.sleep(latency * len(texts))
+        vectors = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = [w.strip('?.,!') for w in text.lower().split()]
+            for feature in words + [' '.join(pair) for pair in zip(words, words[1:])]:
+                vectors[row, hash(feature) % dim] += 1.0
+        return vectors
+    return encode
+
+
+def synthetic_traffic(count, seed=0):
+    """Queries over a few intents with Zipf popularity, each phrased by a random template, prefix and suffix"""
+    rng = np.random.default_rng(seed)
+    popularity = 1 / np.arange(1, len(INTENTS) + 1)
+    intents = rng.choice(len(INTENTS), size=count, p=popularity / popularity.sum())
+    phrasings = rng.integers(len(TEMPLATES), size=(count, 3))
+    return [(PREFIXES[p] + TEMPLATES[t].format(INTENTS[i]) + SUFFIXES[x], i)
+            for i, (t, p, x) in zip(intents, phrasings)]
+
+
+def benchmark(query_count, threshold, max_entries, ttl, generation_seconds):
+    encode = hashed_encoder()
+    traffic = synthetic_traffic(query_count)
+    intent_of = dict(traffic)
+
+    def answer(query, vector):
+        """Retrieval + generation stand-in: a fixed delay, answering the query's true intent"""
+        time.sleep(generation_seconds)
+        return {'intent': intent_of[query], 'answer': f"Answer for {query}"}
+
+    start = time.perf_counter()
+    for query, _ in traffic:
+        vector = encode([query])[0]
+        answer(query, vector)
+    uncached = time.perf_counter() - start
+
+    cache = SemanticCache(encode, threshold, max_entries, ttl)
+    wrong = 0
+    start = time.perf_counter()
+    for i, (query, intent) in enumerate(traffic):
+        version = 'v1' if i < len(traffic) // 2 else 'v2'  # the index is rebuilt halfway through
+        result = cache.get_or_compute(query, answer, index_version=version)
+        wrong += result['intent'] != intent
+    cached = time.perf_counter() - start
+
+    print(f"{query_count:,} queries over {len(INTENTS)} intents x {len(TEMPLATES)} phrasings, "
+          f"threshold {threshold}, {generation_seconds * 1000:.0f} ms per retrieval + generation")
+    cache.print_stats()
+    print(f"Mean latency: {uncached / query_count * 1000:.2f} ms uncached -> {cached / query_count * 1000:.2f} ms "
+          f"cached; {wrong} hits answered a different intent (false positives)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the semantic answer cache on paraphrased traffic")
+    parser.add_argument('--queries', type=int, default=2_000)
+    parser.add_argument('--threshold', type=float, default=0.9)
+    parser.add_argument('--max-entries', type=int, default=1_000)
+    parser.add_argument('--ttl', type=float, default=3_600, help="seconds an entry stays valid")
+    parser.add_argument('--generation-ms', type=float, default=5, help="simulated retrieval + generation time")
+    args = parser.parse_args()
+
+    benchmark(args.queries, args.threshold, args.max_entries, args.ttl, args.generation_ms / 1000)
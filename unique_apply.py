@@ -0,0 +1,88 @@
+"""
+Deduplicate-then-broadcast helpers for the product name scripts.
+
+The Amazon dump repeats the same product name on thousands of review rows, so
+the scripts factorize the key columns, run the expensive functions once per
+distinct key and broadcast the results back through the integer codes.
+
+Results can also be kept in a memo file between runs. The memo records a
+fingerprint of the code that produced it and is ignored once that code changes.
+"""
+import hashlib
+import inspect
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+
+# Memos already read by this process, keyed by path
+_LOADED_MEMOS = {}
+
+
+def factorize_pairs(first, second):
+    """
+    Integer code per row for each (first, second) pair, with missing values
+    treated as a value of their own.
+    Returns (codes, unique first values, unique second values).
+    """
+    first_codes, first_uniques = pd.factorize(first, use_na_sentinel=False)
+    second_codes, second_uniques = pd.factorize(second, use_na_sentinel=False)
+
+    width = max(len(second_uniques), 1)
+    codes, pair_keys = pd.factorize(first_codes.astype(np.int64) * width + second_codes)
+
+    first_uniques = np.asarray(first_uniques, dtype=object)[pair_keys // width]
+    second_uniques = np.asarray(second_uniques, dtype=object)[pair_keys % width]
+    return codes, first_uniques, second_uniques
+
+
+def memo_key(value):
+    """Hashable memo key for a cell value (NaN and None become None)"""
+    return None if pd.isna(value) else value
+
+
+def source_fingerprint(*objects):
+    """Hash of the source code of the given functions or modules"""
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_memo(path, fingerprint):
+    """Results memoised by an earlier run, or {} if missing or made by other code"""
+    if path in _LOADED_MEMOS:
+        return _LOADED_MEMOS[path]
+
+    memo = {}
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            stored = pickle.load(f)
+        if stored.get('fingerprint') == fingerprint:
+            memo = stored['entries']
+        else:
+            print(f"  Ignoring memo {path}: it was built by a different version of the rules")
+
+    _LOADED_MEMOS[path] = memo
+    return memo
+
+
+def save_memo(memo, path, fingerprint):
+    """Write the memo atomically so an interrupted run never leaves half a file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'fingerprint': fingerprint, 'entries': memo}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def print_dedup_report(records, unique, memo_hits, compute_seconds):
+    """Unique-to-total ratio and the time saved by not recomputing repeated keys"""
+    computed = unique - memo_hits
+    print(f"\nDistinct keys:              {unique:,} of {records:,} records ({unique / max(records, 1):.2%})")
+    if memo_hits:
+        print(f"Memo hits:                  {memo_hits:,} (computed {computed:,} new keys)")
+    if computed:
+        saved = compute_seconds / computed * (records - computed)
+        print(f"Estimated time saved:       {saved:.1f}s ({compute_seconds:.1f}s spent on {computed:,} keys)")